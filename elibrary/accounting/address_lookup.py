@@ -0,0 +1,55 @@
+import time
+from bisect import bisect_left, insort
+from threading import Lock
+
+from .models import CitiesList, StreetsList
+
+REFRESH_INTERVAL = 5 * 60    # other processes' changes are seen after this time
+
+
+class NameIndex:
+    """
+    In-process sorted array of (lowercase name, name, id) for prefix search of city/street names.
+    It is read from DB once and then updated by signals, full reload is done only by timer.
+    """
+
+    def __init__(self, model, field_name):
+        self.model = model
+        self.field_name = field_name
+        self._entries = None
+        self._loaded_at = 0.0
+        self._lock = Lock()
+
+    def _load(self):
+        names = self.model.objects.values_list(self.field_name, 'pk').iterator()
+        self._entries = sorted((name.lower(), name, pk) for name, pk in names)
+        self._loaded_at = time.monotonic()
+
+    def search(self, prefix, limit=10):
+        """Up to 'limit' (id, name) pairs with names starting with the prefix, case insensitive."""
+        prefix = prefix.strip().lower()
+        with self._lock:
+            if self._entries is None or time.monotonic() - self._loaded_at > REFRESH_INTERVAL:
+                self._load()
+            entries = self._entries
+            found = []
+            for position in range(bisect_left(entries, (prefix,)), len(entries)):
+                key, name, pk = entries[position]
+                if not key.startswith(prefix) or len(found) == limit:
+                    break
+                found.append((pk, name))
+        return found
+
+    def added(self, instance):
+        with self._lock:
+            if self._entries is not None:
+                name = getattr(instance, self.field_name)
+                insort(self._entries, (name.lower(), name, instance.pk))
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = None
+
+
+ADDRESS_INDEXES = {'city': NameIndex(CitiesList, 'city_name'),
+                   'street': NameIndex(StreetsList, 'street_name')}
@@ -1,51 +1,161 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ERROR_FLAG, IGNORED_PARAMS, PAGE_VAR, SEARCH_VAR
+from django.db.models import Q
+
 from .models import *
+from .pagination import EstimatedCountPaginator
+
+
+def is_filtered(request):
+    """Changelist request with search or list filters (ordering, page etc. don't filter)."""
+    return bool(request.GET.get(SEARCH_VAR)) or \
+        any(name not in IGNORED_PARAMS + (PAGE_VAR, ERROR_FLAG) for name in request.GET)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    # no full COUNT(*) of the table for the changelist pages
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        try:
+            page_number = int(request.GET.get(PAGE_VAR, 0)) + 1    # 'p' is zero based
+        except ValueError:
+            page_number = 1
+        return self.paginator(queryset, per_page, orphans, allow_empty_first_page,
+                              filtered=is_filtered(request), page_number=page_number)
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        changelist = (getattr(response, 'context_data', None) or {}).get('cl')
+        if changelist is not None and changelist.paginator.count_is_lower_bound:
+            self.message_user(request, 'More than ' + str(changelist.result_count) + ' rows match, only the pages '
+                                       'up to the next one are counted. Narrow the search to see the total.',
+                              messages.WARNING)
+        return response
+
+
+class PrefixSearchMixin:
+    """
+    Admin search (also autocomplete of the related fields) by the prefix of indexed columns.
+    Django search is 'icontains' on every field, a full table scan on every key press;
+    "col >= 'Tur' AND col < 'Tur\\uffff'" is an index range read on every DB backend.
+    Range is case sensitive, so every word is also searched capitalized: "tur" finds "Turing".
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        for word in search_term.split():
+            condition = Q()
+            for variant in {word, word.capitalize()}:
+                for field in self.search_fields:
+                    condition |= Q(**{field + '__gte': variant, field + '__lt': variant + '\uffff'})
+            queryset = queryset.filter(condition)
+        return queryset, False
 
 
 @admin.register(Author)
-class AuthorAdmin(admin.ModelAdmin):
+class AuthorAdmin(PrefixSearchMixin, LargeTableAdmin):
     list_display = ['author_name', 'author_surname']
     ordering = ['author_name']
+    search_fields = ['author_surname', 'author_name']    # author_surname_idx, author_name_idx
+
+
+class ArticleInline(admin.StackedInline):
+    model = Article
+    can_delete = False    # work is deleted together with its extension
+
+
+class ScienceBookInline(admin.StackedInline):
+    model = ScienceBook
+    can_delete = False
+
+
+class FictionBookInline(admin.StackedInline):
+    model = FictionBook
+    can_delete = False
+
+
+@admin.register(Work)
+class WorkAdmin(PrefixSearchMixin, LargeTableAdmin):
+    list_display = ['title', 'work_type', 'publishing_year']
+    list_filter = ['work_type']
+    ordering = ['title']
+    search_fields = ['title']    # work_title_idx
+    # select with search instead of all authors in the page
+    autocomplete_fields = ['work_author']
+    inlines = [ArticleInline, ScienceBookInline, FictionBookInline]
+
+    def get_inline_instances(self, request, obj=None):
+        inline_instances = super().get_inline_instances(request, obj)
+        if obj is None:
+            return inline_instances
+        # existing work has only one type specific part
+        return [inline for inline in inline_instances if inline.model is WORK_EXTENSIONS[obj.work_type]]
+
+
+class WorkExtensionAdmin(PrefixSearchMixin, LargeTableAdmin):
+    ordering = ['work__title']
+    search_fields = ['work__title']
+    list_select_related = ['work']    # title and year are in the work table
+    raw_id_fields = ['work']    # title, year and authors are edited on the work page
 
 
 @admin.register(ScienceBook)
-class ScienceBookAdmin(admin.ModelAdmin):
+class ScienceBookAdmin(WorkExtensionAdmin):
     list_display = ['title', 'publisher', 'edition', 'publishing_year', 'isbn']
-    ordering = ['title']
-    filter_horizontal = ['work_author']    # two-sided areas for multiple choice (for ManyToMany)
 
 
 @admin.register(FictionBook)
-class FictionBookAdmin(admin.ModelAdmin):
+class FictionBookAdmin(WorkExtensionAdmin):
     list_display = ['title']
-    ordering = ['title']
-    filter_horizontal = ['work_author']
 
 
 @admin.register(Article)
-class ArticleAdmin(admin.ModelAdmin):
+class ArticleAdmin(WorkExtensionAdmin):
     list_display = ['title', 'journal', 'impact_factor',
                     'volume', 'article_number', 'pages', 'publishing_year', 'doi']
-    ordering = ['title']
-    filter_horizontal = ['work_author']
 
 
 @admin.register(LibraryUserInfo)
-class LibraryUserInfoAdmin(admin.ModelAdmin):
+class LibraryUserInfoAdmin(PrefixSearchMixin, LargeTableAdmin):
     list_display = ['library_user', 'phone_number']
     ordering = ['library_user']
+    search_fields = ['library_user__username']    # unique index of auth_user
+    list_select_related = ['library_user']
+    raw_id_fields = ['library_user']
 
 
 @admin.register(CitiesList)
-class CitiesListAdmin(admin.ModelAdmin):
+class CitiesListAdmin(PrefixSearchMixin, admin.ModelAdmin):
     list_display = ['city_name']
+    search_fields = ['city_name']    # unique index
 
 
 @admin.register(StreetsList)
-class StreetsListAdmin(admin.ModelAdmin):
+class StreetsListAdmin(PrefixSearchMixin, admin.ModelAdmin):
     list_display = ['street_name']
+    search_fields = ['street_name']
 
 
 @admin.register(LibraryUserAddress)
-class LibraryUserAddressAdmin(admin.ModelAdmin):
-    list_display = ['building_number', 'apartment_number']
+class LibraryUserAddressAdmin(PrefixSearchMixin, LargeTableAdmin):
+    list_display = ['library_user', 'city_name', 'street_name', 'building_number', 'apartment_number']
+    search_fields = ['library_user__library_user__username']
+    # LibraryUserInfo.__str__ reads the auth user
+    list_select_related = ['library_user__library_user', 'city_name', 'street_name']
+    raw_id_fields = ['library_user']
+    autocomplete_fields = ['city_name', 'street_name']
+
+
+@admin.register(MailOutbox)
+class MailOutboxAdmin(LargeTableAdmin):
+    list_display = ['subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+
+
+@admin.register(Hold)
+class HoldAdmin(LargeTableAdmin):
+    list_display = ['work', 'library_user', 'priority', 'status', 'created_at', 'expires_at']
+    list_filter = ['status', 'priority']
+    list_select_related = ['work', 'library_user']
+    raw_id_fields = ['work', 'library_user', 'library_unit']
@@ -0,0 +1,77 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connections
+
+END_OF_CONTENT = object()
+
+
+class BoundedThreadPoolApplication:
+    """
+    ASGI application wrapper. Django 3.0 has no async views: ASGIHandler runs every view (and its ORM queries)
+    by sync_to_async in the default executor of the event loop, so the event loop itself only reads requests
+    and writes responses. This wrapper gives the loop an executor of fixed size: it limits concurrently running
+    views and open DB connections per process, slow clients wait in the loop without taking a thread.
+    """
+
+    def __init__(self, application, max_threads):
+        self.application = application
+        self.max_threads = max_threads
+        self._loop = None
+
+    async def __call__(self, scope, receive, send):
+        loop = asyncio.get_event_loop()
+        if loop is not self._loop:    # new loop of the server (or of the benchmark run)
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=self.max_threads,
+                                                         thread_name_prefix='django-view'))
+            self._loop = loop
+        await self.application(scope, receive, send)
+
+
+def response_headers(response):
+    # the same encoding as ASGIHandler.send_response()
+    headers = []
+    for header, value in response.items():
+        if isinstance(header, str):
+            header = header.encode('ascii')
+        if isinstance(value, str):
+            value = value.encode('latin1')
+        headers.append((bytes(header), bytes(value)))
+    for cookie in response.cookies.values():
+        headers.append((b'Set-Cookie', cookie.output(header='').encode('ascii').strip()))
+    return headers
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """
+    Django 3.0 ASGIHandler iterates StreamingHttpResponse in the event loop, so the lazy ORM queries
+    of the streamed content (catalog export) raise SynchronousOnlyOperation after the first line.
+    Here the content is iterated in a thread of its own response: DB cursor of the export and the
+    queries between its chunks use one connection, the loop only sends the chunks.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            await super().send_response(response, send)
+            return
+        await send({'type': 'http.response.start', 'status': response.status_code,
+                    'headers': response_headers(response)})
+        loop = asyncio.get_event_loop()
+        parts = iter(response)
+
+        def finish():
+            response.close()    # request_finished
+            connections.close_all()    # connections of the thread, it ends with the response
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='django-stream') as stream_thread:
+            try:
+                while True:
+                    part = await loop.run_in_executor(stream_thread, next, parts, END_OF_CONTENT)
+                    if part is END_OF_CONTENT:
+                        break
+                    for chunk, last in self.chunk_bytes(part):
+                        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                await send({'type': 'http.response.body'})
+            finally:
+                await loop.run_in_executor(stream_thread, finish)
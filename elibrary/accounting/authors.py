@@ -0,0 +1,74 @@
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .catalog_changes import units_changed, work_units
+from .models import Author, Work
+
+
+def author_ids_by_name(name_pairs):
+    """
+    (name, surname) -> author id map for the pairs, missing authors are created.
+    Constant number of queries: one lookup, one bulk insert and one lookup of the inserted rows
+    (SQLite doesn't return ids of the bulk inserted rows).
+    """
+    name_pairs = set(name_pairs)
+    if not name_pairs:
+        return {}
+
+    def lookup(pairs):
+        condition = reduce(or_, (Q(author_name=name, author_surname=surname) for name, surname in pairs))
+        return {(name, surname): pk for name, surname, pk in
+                Author.objects.filter(condition).order_by('pk').values_list('author_name', 'author_surname', 'pk')}
+
+    author_ids = lookup(name_pairs)
+    missing = name_pairs - set(author_ids)
+    if missing:
+        Author.objects.bulk_create([Author(author_name=name, author_surname=surname) for name, surname in missing])
+        author_ids.update(lookup(missing))
+    return author_ids
+
+
+def update_work_authors(work, current_authors, rows):
+    """
+    Applies edited author rows (cleaned data of AuthorFormSet) to the work.
+    Rows with id change that author only (not namesakes), rows without id add an author
+    (an existing one with the same name is reused), deleted or missing rows remove the author from the work.
+    Queries don't depend on the number of authors: one bulk_update, one delete and one insert in the through table.
+    """
+    current = {author.pk: author for author in current_authors}
+    kept_ids = set()
+    changed_authors = []
+    new_names = []
+    for row in rows:
+        if not row or row.get('DELETE'):
+            continue
+        name_pair = (row['author_name'], row['author_surname'])
+        author = current.get(row.get('id'))
+        if author is None:
+            new_names.append(name_pair)    # ids of other works' authors are not accepted from the form
+        else:
+            kept_ids.add(author.pk)
+            if (author.author_name, author.author_surname) != name_pair:
+                author.author_name, author.author_surname = name_pair
+                changed_authors.append(author)
+
+    with transaction.atomic():
+        if changed_authors:
+            now = timezone.now()
+            for author in changed_authors:
+                author.updated_at = now    # auto_now isn't applied by bulk_update
+            Author.objects.bulk_update(changed_authors, ['author_name', 'author_surname', 'updated_at'])
+            # bulk_update doesn't send signals, all works of the renamed authors are refreshed here
+            changed_ids = [author.pk for author in changed_authors]
+            units_changed(work_units(Work.objects.filter(work_author__in=changed_ids).distinct()))
+        added_ids = set(author_ids_by_name(new_names).values()) - kept_ids
+        removed_ids = set(current) - kept_ids - added_ids
+        # through table changes send m2m_changed, so search index and cache of this work are refreshed by signals
+        if removed_ids:
+            work.work_author.remove(*removed_ids)
+        if added_ids:
+            work.work_author.add(*added_ids)
@@ -0,0 +1,4 @@
+"""
+Benchmarks of the accounting views and ORM hot paths.
+Run with 'manage.py run_benchmarks', data is generated in a throwaway test database.
+"""
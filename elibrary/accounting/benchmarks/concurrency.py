@@ -0,0 +1,115 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import Client
+from django.urls import reverse
+
+from ..asgi import BoundedThreadPoolApplication, StreamingASGIHandler
+from .data import BENCHMARK_PASSWORD
+from .runner import percentile
+
+
+def read_paths(generator, count):
+    """Mix of the read views: listing, unit details and profile pages."""
+    paths = []
+    for number in range(count):
+        unit_id = number % generator.units_per_type + 1
+        paths.append([reverse('common_info', args=['articles']),
+                      reverse('detailed_info', args=['science_book_details', unit_id]),
+                      reverse('profile_details')][number % 3])
+    return paths
+
+
+def session_cookie():
+    client = Client()
+    client.login(username='user1', password=BENCHMARK_PASSWORD)
+    return settings.SESSION_COOKIE_NAME + '=' + client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+def wsgi_request(handler, path, cookie):
+    environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET', 'HTTP_HOST': 'testserver', 'HTTP_COOKIE': cookie}
+    setup_testing_defaults(environ)
+    statuses = []
+    body = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        b''.join(body)
+    finally:
+        body.close()    # request_finished: DB connection of the thread is closed, like under WSGI server
+    return int(statuses[0].split()[0])
+
+
+def asgi_scope(path, cookie):
+    return {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80)}
+
+
+async def asgi_request(application, path, cookie):
+    scope = asgi_scope(path, cookie)
+    statuses = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    await application(scope, receive, send)
+    return statuses[0]
+
+
+def summary(results, wall_time, concurrency):
+    timings = [timing for status, timing in results]
+    return {'requests': len(results),
+            'concurrency': concurrency,
+            'errors': sum(1 for status, timing in results if status >= 400),
+            'throughput_rps': round(len(results) / wall_time, 1),
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 3),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 3)}
+
+
+def run_wsgi(paths, cookie, concurrency):
+    """Thread per concurrent client, like threaded WSGI server."""
+    handler = WSGIHandler()
+
+    def timed_request(path):
+        start = time.perf_counter()
+        return wsgi_request(handler, path, cookie), time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed_request, paths))
+    return summary(results, time.perf_counter() - start, concurrency)
+
+
+def run_asgi(paths, cookie, concurrency, threads):
+    """Concurrent clients are coroutines of one event loop, views run in 'threads' threads."""
+    application = BoundedThreadPoolApplication(StreamingASGIHandler(), threads)
+
+    async def run_clients():
+        clients = asyncio.Semaphore(concurrency)
+
+        async def timed_request(path):
+            async with clients:
+                start = time.perf_counter()
+                return await asgi_request(application, path, cookie), time.perf_counter() - start
+
+        return await asyncio.gather(*[timed_request(path) for path in paths])
+
+    start = time.perf_counter()
+    results = asyncio.run(run_clients())
+    return summary(results, time.perf_counter() - start, concurrency)
+
+
+def compare_servers(generator, requests=300, concurrency=20, threads=None):
+    """The same read requests through WSGI and ASGI handlers with the same number of concurrent clients."""
+    paths = read_paths(generator, requests)
+    cookie = session_cookie()
+    return {'wsgi': run_wsgi(paths, cookie, concurrency),
+            'asgi': run_asgi(paths, cookie, concurrency, threads or settings.ASGI_THREADS)}
@@ -0,0 +1,109 @@
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from accounting import bibliography, search, stats
+from accounting.models import (Author, Work, Article, ScienceBook, FictionBook, LibraryUnit, UnitStatus,
+                               LibraryUserInfo, LibraryUserAddress, CitiesList, StreetsList)
+
+BENCHMARK_PASSWORD = 'benchmark_password!1'
+NAMES = ['Ada', 'Alan', 'Grace', 'Edsger', 'Donald', 'Barbara', 'Niklaus', 'John', 'Frances', 'Ken']
+WORDS = ['analysis', 'engine', 'theory', 'systems', 'language', 'memory', 'network', 'graph', 'logic', 'design',
+         'parallel', 'storage', 'compiler', 'protocol', 'algebra', 'history', 'river', 'winter', 'garden', 'night']
+
+
+class CatalogGenerator:
+    """
+    Deterministic synthetic catalog: the same seed and sizes give the same rows.
+    Rows are inserted with bulk_create and explicit ids, so generation must run on an empty database.
+    """
+
+    def __init__(self, authors=200, units_per_type=200, authors_per_unit=3, users=20, loans_per_user=2,
+                 cities=10, streets=50, seed=1):
+        self.authors = authors
+        self.units_per_type = units_per_type
+        self.authors_per_unit = authors_per_unit
+        self.users = users
+        self.loans_per_user = loans_per_user
+        self.cities = cities
+        self.streets = streets
+        self.random = random.Random(seed)
+
+    def title(self):
+        return ' '.join(self.random.choice(WORDS) for _ in range(self.random.randint(2, 5))).capitalize()
+
+    def year(self):
+        return datetime.date(self.random.randint(1950, 2020), 1, 1)
+
+    def generate(self):
+        Author.objects.bulk_create([Author(pk=pk, author_name=self.random.choice(NAMES),
+                                           author_surname='Surname' + str(pk))
+                                    for pk in range(1, self.authors + 1)], batch_size=500)
+        unit_ids = range(1, self.units_per_type + 1)
+        # works are numbered by type: articles first, then science books, then fiction books
+        work_ids = {work_type: range(offset * self.units_per_type + 1, (offset + 1) * self.units_per_type + 1)
+                    for offset, work_type in enumerate((Work.ARTICLE, Work.SCIENCE_BOOK, Work.FICTION_BOOK))}
+        Work.objects.bulk_create([Work(pk=pk, work_type=work_type, title=self.title(),
+                                       publishing_year=None if work_type == Work.FICTION_BOOK else self.year())
+                                  for work_type, pks in work_ids.items() for pk in pks], batch_size=500)
+        Article.objects.bulk_create([Article(pk=pk, work_id=work_id, journal='Journal of ' + self.random.choice(WORDS),
+                                             impact_factor=self.random.randint(1, 10), volume=self.random.randint(1, 50),
+                                             article_number=self.random.randint(1, 99), pages='1-10',
+                                             doi='10.1000/' + str(pk))
+                                     for pk, work_id in zip(unit_ids, work_ids[Work.ARTICLE])], batch_size=500)
+        ScienceBook.objects.bulk_create([ScienceBook(pk=pk, work_id=work_id,
+                                                     publisher=self.random.choice(WORDS).capitalize() + ' press',
+                                                     edition=self.random.randint(1, 5), isbn='978-' + str(pk))
+                                         for pk, work_id in zip(unit_ids, work_ids[Work.SCIENCE_BOOK])],
+                                        batch_size=500)
+        FictionBook.objects.bulk_create([FictionBook(pk=pk, work_id=work_id)
+                                         for pk, work_id in zip(unit_ids, work_ids[Work.FICTION_BOOK])],
+                                        batch_size=500)
+        through = Work.work_author.through
+        links = []
+        for work_id in range(1, 3 * self.units_per_type + 1):
+            for author_id in self.random.sample(range(1, self.authors + 1), min(self.authors_per_unit, self.authors)):
+                links.append(through(work_id=work_id, author_id=author_id))
+        through.objects.bulk_create(links, batch_size=500)
+        # one copy of every work, loans are taken from the article copies
+        LibraryUnit.objects.bulk_create([LibraryUnit(pk=pk, work_id=pk) for pk in range(1, 3 * self.units_per_type + 1)],
+                                        batch_size=500)
+        self.generate_users()
+        # bulk_create doesn't send signals
+        search.rebuild_index()
+        stats.rebuild_stats()
+        bibliography.rebuild_bibliographies()
+
+    def generate_users(self):
+        CitiesList.objects.bulk_create([CitiesList(pk=pk, city_name='City' + str(pk))
+                                        for pk in range(1, self.cities + 1)])
+        StreetsList.objects.bulk_create([StreetsList(pk=pk, street_name='Street' + str(pk))
+                                         for pk in range(1, self.streets + 1)])
+        password = make_password(BENCHMARK_PASSWORD)    # hashing is slow, one hash for all users
+        user_ids = range(1, self.users + 1)
+        User.objects.bulk_create([User(pk=pk, username='user' + str(pk), email='user' + str(pk) + '@example.com',
+                                       password=password, is_staff=(pk == 1))
+                                  for pk in user_ids])
+        LibraryUserInfo.objects.bulk_create([LibraryUserInfo(pk=pk, library_user_id=pk,
+                                                             phone_number=self.random.randint(10000, 99999))
+                                             for pk in user_ids])
+        LibraryUserAddress.objects.bulk_create([LibraryUserAddress(library_user_id=pk,
+                                                                   city_name_id=self.random.randint(1, self.cities),
+                                                                   street_name_id=self.random.randint(1, self.streets),
+                                                                   building_number=self.random.randint(1, 200),
+                                                                   apartment_number=self.random.randint(1, 200))
+                                                for pk in user_ids])
+        now = timezone.now()
+        loans = []
+        issued_units = self.random.sample(range(1, self.units_per_type + 1),
+                                          min(self.users * self.loans_per_user, self.units_per_type))
+        for number, unit_id in enumerate(issued_units):
+            date_issue = now - datetime.timedelta(days=self.random.randint(0, 30))
+            loans.append(UnitStatus(library_user_id=number % self.users + 1, library_unit_id=unit_id,
+                                    date_issue=date_issue, date_return_nominal=date_issue + datetime.timedelta(days=14)))
+        UnitStatus.objects.bulk_create(loans, batch_size=500)
+        for start in range(0, len(issued_units), 500):
+            LibraryUnit.objects.filter(pk__in=issued_units[start:start + 500]).update(unit_available=False)
@@ -0,0 +1,83 @@
+import re
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .data import WORDS
+from .scenarios import ALL_SCENARIOS, Scenario
+
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+# plan lines reading the whole table: "SCAN accounting_work" on SQLite (not "SCAN ... USING INDEX"),
+# "Seq Scan on accounting_work" on PostgreSQL
+FULL_SCAN_PATTERNS = {'sqlite': re.compile(r'^SCAN (TABLE )?(?P<table>\w+)( AS \w+)?$'),
+                      'postgresql': re.compile(r'Seq Scan on (?P<table>\w+)')}
+SUBQUERY_PLAN_PREFIXES = ('CO-ROUTINE', 'MATERIALIZE')
+
+
+class SearchScenario(Scenario):
+    name = 'search'
+
+    def request(self, iteration):
+        return self.client.get(reverse('catalog_search'), {'q': WORDS[0]})
+
+
+class StatsScenario(Scenario):
+    name = 'stats'    # user1 is staff
+
+    def request(self, iteration):
+        return self.client.get(reverse('stats_dashboard'))
+
+
+HOT_PATH_SCENARIOS = ALL_SCENARIOS + [SearchScenario, StatsScenario]
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute('EXPLAIN ' + sql)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def full_scans(plan):
+    """Tables read without index by the plan lines."""
+    pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+    if pattern is None:
+        return []
+    # SQLite reads rows of the subquery ('CO-ROUTINE subquery', then 'SCAN subquery'), its tables are
+    # in its own plan lines
+    subqueries = {line.strip().split()[-1] for line in plan if line.strip().startswith(SUBQUERY_PLAN_PREFIXES)}
+    return [match.group('table') for match in (pattern.search(line.strip()) for line in plan)
+            if match and match.group('table') not in subqueries]
+
+
+def explain_scenario(scenario):
+    """Plans of the distinct statements of one scenario request: [{'sql', 'plan', 'full_scans'}]."""
+    scenario.prepare()
+    with CaptureQueriesContext(connection) as captured:
+        response = scenario.request(0)
+    if response.status_code >= 400:
+        raise RuntimeError(scenario.name + ' scenario: HTTP ' + str(response.status_code))
+    explained = []
+    seen = set()
+    for query in captured:
+        sql = query['sql']
+        if sql in seen or not sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+            continue
+        seen.add(sql)
+        plan = query_plan(sql)
+        explained.append({'sql': sql, 'plan': plan, 'full_scans': full_scans(plan)})
+    return explained
+
+
+def explain_hot_queries(generator, scenario_names=None):
+    """scenario name -> explained statements, on the already generated catalog."""
+    results = {}
+    for scenario_class in HOT_PATH_SCENARIOS:
+        if scenario_names and scenario_class.name not in scenario_names:
+            continue
+        results[scenario_class.name] = explain_scenario(scenario_class(Client(), generator))
+    return results
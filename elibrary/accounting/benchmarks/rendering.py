@@ -0,0 +1,94 @@
+import copy
+import time
+
+from django.conf import settings
+from django.template import Context, Template
+from django.template.loader import render_to_string
+from django.test.utils import override_settings
+
+from ..catalog_rows import render_rows
+from ..detail_cache import get_cache
+from ..pagination import keyset_page
+from ..search import UNIT_MODELS
+from .runner import percentile
+
+# catalog table of the article listing before the row fragments: one if/elif branch per unit type,
+# four {% url %} and Author.__str__ per row; compiled on every render as the not cached loaders do
+LEGACY_TEMPLATE = '''<table border="1" width="100%">
+    {% if all_articles is not None %}
+        <tr>
+            <th>Title</th>
+            <th>Authors</th>
+            <th>Library Unit Management</th>
+        </tr>
+        {% for current_article in all_articles %}
+            <tr>
+                <td>{{ current_article.title }}</td>
+                <td>{% for current_author in current_article.work_author.all %}
+                        {{current_author}}<br>
+                    {% endfor %}</td>
+                <td><center><a href="{% url 'detailed_info' 'article_details' current_article.id %}">Details, </a>
+                            <a href="{% url 'edit_info' 'edit_article' current_article.id %}">Edit, </a>
+                            <a href="{% url 'add_unit' 'article' %}">Add, </a>
+                            <a href="{% url 'delete_library_unit' 'delete_article' current_article.id %}">Delete</a></center></td>
+            </tr>
+        {% endfor %}
+    {% endif %}
+</table>
+<p>{% if next_cursor %}<a href="{% url 'common_info' unit_type %}?after={{ next_cursor }}">Next page</a>{% endif %}</p>'''
+
+
+def cached_loader_templates():
+    """TEMPLATES of the settings with the cached loader, as in production (DEBUG off)."""
+    templates = copy.deepcopy(settings.TEMPLATES)
+    for template in templates:
+        options = template.setdefault('OPTIONS', {})
+        loaders = options.get('loaders') or ['django.template.loaders.filesystem.Loader',
+                                             'django.template.loaders.app_directories.Loader']
+        if not isinstance(loaders[0], tuple) or loaders[0][0] != 'django.template.loaders.cached.Loader':
+            options['loaders'] = [('django.template.loaders.cached.Loader', loaders)]
+        template.pop('APP_DIRS', None)
+    return templates
+
+
+def legacy_page(page_size):
+    units, next_cursor = keyset_page(UNIT_MODELS['article'].objects.prefetch_related('work__work_author'),
+                                     page_size=page_size)
+    Template(LEGACY_TEMPLATE).render(Context({'all_articles': units, 'unit_type': 'articles',
+                                              'next_cursor': next_cursor}))
+    return len(units)
+
+
+def fragment_page(page_size):
+    units, next_cursor = keyset_page(UNIT_MODELS['article'].objects.all(), page_size=page_size)
+    render_to_string('common_info_view.html', {'rows': render_rows('article', units), 'unit_type': 'articles',
+                                               'next_cursor': next_cursor})
+    return len(units)
+
+
+def measure(render_page, page_size, iterations, clear_cache):
+    timings = []
+    rows = 0
+    for iteration in range(iterations):
+        if clear_cache:
+            get_cache().clear()
+        start = time.perf_counter()
+        rows += render_page(page_size)
+        timings.append(time.perf_counter() - start)
+    return {'rows_per_second': round(rows / sum(timings), 1),
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 3),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 3)}
+
+
+def compare_rendering(page_size=100, iterations=20):
+    """
+    Rows/second of the article listing page (query, authors and rendering): 'legacy' template,
+    'cold' rows (cached loader, empty fragment cache) and 'warm' rows (all rows cached).
+    The catalog cache is cleared, so it must run on the benchmark environment only.
+    """
+    results = {'legacy': measure(legacy_page, page_size, iterations, clear_cache=True)}
+    with override_settings(TEMPLATES=cached_loader_templates()):
+        results['cold'] = measure(fragment_page, page_size, iterations, clear_cache=True)
+        results['warm'] = measure(fragment_page, page_size, iterations, clear_cache=False)
+    get_cache().clear()
+    return results
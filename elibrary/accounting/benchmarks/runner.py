@@ -0,0 +1,77 @@
+import json
+import platform
+import time
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .scenarios import ALL_SCENARIOS
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of not empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def run_scenario(scenario, iterations):
+    scenario.prepare()
+    timings = []
+    queries = []
+    for iteration in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = scenario.request(iteration)
+            timings.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            raise RuntimeError(scenario.name + ' scenario: HTTP ' + str(response.status_code))
+        queries.append(len(captured))
+    return {'iterations': iterations,
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 3),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+            'mean_ms': round(sum(timings) / iterations * 1000, 3),
+            'queries': max(queries)}
+
+
+def run_benchmarks(generator, iterations=20, scenario_names=None):
+    """Runs scenarios on the already generated catalog, returns JSON-serializable results."""
+    results = {'meta': {'python': platform.python_version(),
+                        'database': connection.vendor,
+                        'authors': generator.authors,
+                        'units_per_type': generator.units_per_type,
+                        'users': generator.users},
+               'scenarios': {}}
+    for scenario_class in ALL_SCENARIOS:
+        if scenario_names and scenario_class.name not in scenario_names:
+            continue
+        scenario = scenario_class(Client(), generator)
+        results['scenarios'][scenario.name] = run_scenario(scenario, iterations)
+    return results
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    Regressions against the baseline results: p95 latency grown more than 'threshold' part
+    or more queries than in the baseline. Returns list of messages, empty if there are no regressions.
+    """
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+            regressions.append(name + ': p95 ' + str(previous['p95_ms']) + ' ms -> ' + str(current['p95_ms']) + ' ms')
+        if current['queries'] > previous['queries']:
+            regressions.append(name + ': queries ' + str(previous['queries']) + ' -> ' + str(current['queries']))
+    return regressions
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as stream:
+        return json.load(stream)
+
+
+def save_results(results, path):
+    with open(path, 'w', encoding='utf-8') as stream:
+        json.dump(results, stream, indent=2, sort_keys=True)
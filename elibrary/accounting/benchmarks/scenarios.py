@@ -0,0 +1,98 @@
+from django.urls import reverse
+
+from .data import BENCHMARK_PASSWORD
+
+
+class Scenario:
+    """
+    One timed request type. prepare() is called once before the timed iterations,
+    request(iteration) makes one request through the test client and returns the response.
+    """
+    name = None
+
+    def __init__(self, client, generator):
+        self.client = client
+        self.generator = generator
+
+    def prepare(self):
+        self.client.login(username='user1', password=BENCHMARK_PASSWORD)
+
+    def request(self, iteration):
+        raise NotImplementedError
+
+
+class ListingScenario(Scenario):
+    name = 'listing'
+
+    def request(self, iteration):
+        return self.client.get(reverse('common_info', args=['articles']))
+
+
+class DetailScenario(Scenario):
+    name = 'detail'
+
+    def request(self, iteration):
+        unit_id = iteration % self.generator.units_per_type + 1
+        return self.client.get(reverse('detailed_info', args=['science_book_details', unit_id]))
+
+
+class EditScenario(Scenario):
+    name = 'edit'
+
+    def request(self, iteration):
+        unit_id = iteration % self.generator.units_per_type + 1
+        url = reverse('edit_info', args=['edit_article', unit_id])
+        context = self.client.get(url).context
+        data = {name: value for name, value in context['form'].initial.items() if value is not None}
+        data['title'] = 'Edited title ' + str(iteration)
+        # authors formset is posted back as it was rendered, with the renamed first author
+        author_formset = context['author_formset']
+        data.update({author_formset.prefix + '-' + name: value
+                     for name, value in author_formset.management_form.initial.items()})
+        for author_form in author_formset.initial_forms:
+            data.update({author_form.prefix + '-' + name: value for name, value in author_form.initial.items()})
+        if author_formset.initial_forms:
+            data[author_formset.initial_forms[0].prefix + '-author_name'] = 'Edited ' + str(iteration)
+        return self.client.post(url, data)
+
+
+class AddScenario(Scenario):
+    name = 'add'
+
+    def request(self, iteration):
+        return self.client.post(reverse('add_unit', args=['fiction_book']),
+                                {'title': 'New book ' + str(iteration),
+                                 'author_name': 'Ada,Alan', 'author_surname': 'Lovelace,Turing'})
+
+
+class DeleteScenario(Scenario):
+    name = 'delete'
+
+    def request(self, iteration):
+        # the last units are deleted, so the other scenarios keep their data
+        unit_id = self.generator.units_per_type - iteration
+        return self.client.get(reverse('delete_library_unit', args=['delete_fiction_book', unit_id]))
+
+
+class SignupScenario(Scenario):
+    name = 'signup'
+
+    def prepare(self):
+        self.client.logout()
+
+    def request(self, iteration):
+        return self.client.post(reverse('signup'), {
+            'username': 'benchmark_signup' + str(iteration), 'email': 'signup@example.com', 'phone_number': 12345,
+            'pick_city': 'City1', 'pick_street': 'Street1', 'user_building_number': 1, 'user_apartment_number': 1,
+            'password1': BENCHMARK_PASSWORD, 'password2': BENCHMARK_PASSWORD})
+
+
+class ProfileScenario(Scenario):
+    name = 'profile'
+
+    def request(self, iteration):
+        return self.client.get(reverse('profile_details'))
+
+
+ALL_SCENARIOS = [ListingScenario, DetailScenario, EditScenario, AddScenario, DeleteScenario,
+                 SignupScenario, ProfileScenario]
@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import OperationalError, connections, transaction
+from django.test.utils import override_settings
+
+from .runner import percentile
+
+ALIAS_PREFIX = 'writers_benchmark_'    # one alias per profile: connection objects are cached by alias
+
+# 'default': Django defaults, rollback journal, deferred transactions and a new connection per request
+# (CONN_MAX_AGE = 0); 'tuned': SQLITE_PRAGMAS of the settings, immediate transactions and persistent connections
+SQLITE_PROFILES = {'default': {'engine': 'django.db.backends.sqlite3', 'options': {}, 'pragmas': {},
+                               'persistent': False},
+                   'tuned': {'engine': 'accounting.sqlite_backend', 'options': {'transaction_mode': 'IMMEDIATE'},
+                             'pragmas': None, 'persistent': True}}
+
+
+def create_tables(cursor):
+    # loan-like write: read the counter, update it, insert the history row
+    cursor.execute('CREATE TABLE unit (id INTEGER PRIMARY KEY, loans INTEGER NOT NULL)')
+    cursor.execute('CREATE TABLE loan (id INTEGER PRIMARY KEY, unit_id INTEGER NOT NULL, writer INTEGER NOT NULL, '
+                   'issued REAL NOT NULL)')
+    cursor.executemany('INSERT INTO unit (id, loans) VALUES (%s, 0)', [(unit_id,) for unit_id in range(1, 101)])
+
+
+def write_transaction(alias, writer, number):
+    unit_id = (writer * 31 + number) % 100 + 1
+    with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+        cursor.execute('SELECT loans FROM unit WHERE id = %s', [unit_id])
+        cursor.fetchone()
+        cursor.execute('UPDATE unit SET loans = loans + 1 WHERE id = %s', [unit_id])
+        cursor.execute('INSERT INTO loan (unit_id, writer, issued) VALUES (%s, %s, %s)',
+                       [unit_id, writer, time.time()])
+
+
+def read_query(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT unit_id, COUNT(*) FROM loan GROUP BY unit_id')
+        cursor.fetchall()
+
+
+def run_writer(alias, writer, transactions, persistent):
+    timings = []
+    errors = 0
+    try:
+        for number in range(transactions):
+            start = time.perf_counter()
+            try:
+                write_transaction(alias, writer, number)
+            except OperationalError:    # "database is locked"
+                errors += 1
+            else:
+                timings.append(time.perf_counter() - start)
+            if not persistent:
+                connections[alias].close()
+    finally:
+        connections[alias].close()
+    return timings, errors
+
+
+def run_reader(alias, stop, persistent):
+    reads = 0
+    try:
+        while not stop.is_set():
+            try:
+                read_query(alias)
+                reads += 1
+            except OperationalError:
+                pass
+            if not persistent:
+                connections[alias].close()
+    finally:
+        connections[alias].close()
+    return reads
+
+
+def run_profile(alias, path, profile, writers, readers, transactions):
+    connections.databases[alias] = {'ENGINE': profile['engine'], 'NAME': path, 'OPTIONS': profile['options']}
+    persistent = profile['persistent']
+    try:
+        # pragmas None: SQLITE_PRAGMAS of the settings
+        with override_settings(**({} if profile['pragmas'] is None else {'SQLITE_PRAGMAS': profile['pragmas']})):
+            with connections[alias].cursor() as cursor:
+                create_tables(cursor)
+            connections[alias].close()
+
+            stop = threading.Event()
+            with ThreadPoolExecutor(max_workers=writers + readers) as executor:
+                reader_futures = [executor.submit(run_reader, alias, stop, persistent) for reader in range(readers)]
+                start = time.perf_counter()
+                writer_futures = [executor.submit(run_writer, alias, writer, transactions, persistent)
+                                  for writer in range(writers)]
+                results = [future.result() for future in writer_futures]
+                wall_time = time.perf_counter() - start
+                stop.set()
+                reads = sum(future.result() for future in reader_futures)
+    finally:
+        del connections.databases[alias]
+
+    timings = [timing for writer_timings, errors in results for timing in writer_timings]
+    return {'writers': writers,
+            'readers': readers,
+            'committed': len(timings),
+            'errors': sum(errors for writer_timings, errors in results),
+            'throughput_tps': round(len(timings) / wall_time, 1),
+            'reads': reads,
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 3) if timings else None,
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 3) if timings else None}
+
+
+def compare_sqlite_profiles(writers=8, readers=2, transactions=100):
+    """
+    Parallel writers (and readers) on a fresh SQLite file for every profile of SQLITE_PROFILES.
+    Runs on its own temporary files, not on the test database: in-memory database has no journal modes.
+    """
+    directory = tempfile.mkdtemp(prefix='elibrary-writers-')
+    try:
+        return {name: run_profile(ALIAS_PREFIX + name, os.path.join(directory, name + '.sqlite3'), profile,
+                                  writers, readers, transactions)
+                for name, profile in SQLITE_PROFILES.items()}
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
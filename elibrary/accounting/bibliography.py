@@ -0,0 +1,71 @@
+from django.db.models import Count, Max, Q
+
+from .models import Author, AuthorBibliography, Work
+
+# Work.work_type -> AuthorBibliography counter
+TYPE_FIELDS = {Work.ARTICLE: 'articles', Work.SCIENCE_BOOK: 'science_books', Work.FICTION_BOOK: 'fiction_books'}
+SUMMARY_FIELDS = list(TYPE_FIELDS.values()) + ['works_total', 'latest_year']
+EMPTY_SUMMARY = dict({field: 0 for field in TYPE_FIELDS.values()}, works_total=0, latest_year=None)
+
+
+def summaries(author_ids):
+    """author id -> summary values of the not deleted works, one GROUP BY query over the through table."""
+    type_counts = {field: Count('pk', filter=Q(work_type=work_type)) for work_type, field in TYPE_FIELDS.items()}
+    rows = Work.objects.filter(work_author__in=author_ids).order_by().values('work_author')\
+        .annotate(works_total=Count('pk'), latest_year=Max('publishing_year'), **type_counts)
+    return {row.pop('work_author'): row for row in rows}
+
+
+def work_author_ids(work_ids):
+    return set(Work.work_author.through.objects.filter(work_id__in=work_ids).values_list('author_id', flat=True))
+
+
+def refresh_authors(author_ids):
+    """
+    Recomputes bibliography summaries of the authors. Number of queries doesn't depend on the number
+    of authors: one aggregate, one read of the current rows, one bulk update and one bulk insert.
+    Recomputing (not +1/-1 counters) keeps latest_year right when the latest work is removed.
+    """
+    author_ids = set(author_ids)
+    if not author_ids:
+        return
+    values_by_author = summaries(author_ids)
+    current = {bibliography.author_id: bibliography
+               for bibliography in AuthorBibliography.objects.filter(author_id__in=author_ids)}
+    changed = []
+    for author_id, bibliography in current.items():
+        values = values_by_author.get(author_id, EMPTY_SUMMARY)
+        if any(getattr(bibliography, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(bibliography, field, value)
+            changed.append(bibliography)
+    if changed:
+        AuthorBibliography.objects.bulk_update(changed, SUMMARY_FIELDS)
+    missing = author_ids - set(current)
+    if missing:
+        # authors deleted in this transaction have no row; concurrent refresh could insert the same rows
+        AuthorBibliography.objects.bulk_create(
+            [AuthorBibliography(author_id=author_id, **values_by_author.get(author_id, EMPTY_SUMMARY))
+             for author_id in Author.objects.filter(pk__in=missing).values_list('pk', flat=True)],
+            ignore_conflicts=True)
+
+
+def refresh_works(work_ids):
+    """refresh_authors() for all authors of the works."""
+    refresh_authors(work_author_ids(work_ids))
+
+
+def rebuild_bibliographies(batch_size=1000):
+    """Recomputes summaries of all authors, one aggregate query and one bulk insert per batch of authors."""
+    AuthorBibliography.objects.all().delete()
+    last_id = 0
+    while True:
+        author_ids = list(Author.objects.filter(pk__gt=last_id).order_by('pk')
+                          .values_list('pk', flat=True)[:batch_size])
+        if not author_ids:
+            return
+        values_by_author = summaries(author_ids)
+        AuthorBibliography.objects.bulk_create([
+            AuthorBibliography(author_id=author_id, **values_by_author.get(author_id, EMPTY_SUMMARY))
+            for author_id in author_ids])
+        last_id = author_ids[-1]
@@ -0,0 +1,36 @@
+from collections import defaultdict
+
+from . import conditional, detail_cache, search
+from .models import WORK_EXTENSION_ACCESSORS
+
+EXTENSION_ID_FIELDS = [accessor + '__id' for accessor in WORK_EXTENSION_ACCESSORS.values()]
+
+
+def work_units(works):
+    """(unit_type, unit_id) pairs of the Work queryset, extension ids are read by one query with joins."""
+    units = []
+    for values in works.values_list('work_type', *EXTENSION_ID_FIELDS):
+        unit_ids = [unit_id for unit_id in values[1:] if unit_id is not None]
+        if unit_ids:    # work without extension is being created or deleted
+            units.append((values[0], unit_ids[0]))
+    return units
+
+
+def unit_changed(unit_type, unit_id):
+    """The unit row itself was saved: search index and cached details are refreshed."""
+    search.update_unit(unit_type, unit_id)
+    detail_cache.invalidate_details(unit_type, unit_id)
+
+
+def units_changed(units):
+    """
+    The work or authors of the (unit_type, unit_id) units were changed: their updated_at is moved,
+    search index is updated with one batch per unit type and cached details are dropped.
+    """
+    conditional.touch_units(units)
+    unit_ids = defaultdict(list)
+    for unit_type, unit_id in units:
+        unit_ids[unit_type].append(unit_id)
+        detail_cache.invalidate_details(unit_type, unit_id)
+    for unit_type, ids in unit_ids.items():
+        search.update_units(unit_type, ids)
@@ -0,0 +1,238 @@
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
+from django.db import connection, transaction
+from django.db.models import Max
+
+from . import bibliography, search
+from .models import Author, Work
+from .search import UNIT_MODELS
+
+AUTHOR_SEPARATOR = ','    # several authors are separated like in the library unit add form
+
+
+def unit_fields(unit_model):
+    """
+    Stored fields of the unit except id and updated_at (not editable): common Work fields of the type,
+    then the type specific ones.
+    """
+    return [Work._meta.get_field(field_name) for field_name in unit_model.work_fields] + \
+        [field for field in unit_model._meta.concrete_fields
+         if field.editable and not field.primary_key and field.name != 'work']
+
+
+def clean_value(field, value):
+    """
+    Converted and validated value: a bad value is reported before it fails the DB constraints of the batch.
+    SQLite backend gives no range validators to positive fields, their CHECK constraint is validated here.
+    """
+    value = field.clean(value, None)
+    if field.get_internal_type().startswith('Positive'):
+        MinValueValidator(0)(value)
+    return value
+
+
+def detect_format(path, file_format=None):
+    if file_format:
+        return file_format
+    return 'jsonl' if path.endswith(('.jsonl', '.json', '.ndjson')) else 'csv'
+
+
+def read_records(stream, file_format):
+    """
+    Yields (line number, record dict) pairs from CSV or JSON Lines text stream, one line at a time.
+    Malformed JSON line is yielded as ValidationError, so it is skipped like invalid values of the record.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as error:
+                    yield line_number, ValidationError('Malformed JSON: ' + error.msg + '.')
+
+
+def split_authors(record):
+    """(name, surname) pairs from 'author_name'/'author_surname' values: comma separated strings or lists."""
+    names = record.get('author_name') or []
+    surnames = record.get('author_surname') or []
+    if isinstance(names, str):
+        names = names.split(AUTHOR_SEPARATOR)
+    if isinstance(surnames, str):
+        surnames = surnames.split(AUTHOR_SEPARATOR)
+    if len(names) != len(surnames):
+        raise ValidationError('Numbers of author names and surnames are different.')
+    return [(name.strip(), surname.strip()) for name, surname in zip(names, surnames) if name.strip()]
+
+
+class CatalogImporter:
+    """
+    Creates library units from the records stream in batches: one bulk insert for new authors, one for works,
+    one per unit type and one for the work authors table for each batch, instead of several queries per record.
+    Authors are deduplicated against (name, surname) -> id map, which is read from DB once per run.
+    """
+
+    def __init__(self, batch_size=1000, default_unit_type=None, update_search_index=True):
+        self.batch_size = batch_size
+        self.default_unit_type = default_unit_type
+        self.update_search_index = update_search_index
+        self.author_ids = {(name, surname): pk for name, surname, pk in
+                           Author.objects.values_list('author_name', 'author_surname', 'pk').iterator()}
+        self.created_units = defaultdict(int)
+        self.created_authors = 0
+        self.errors = []    # (line number, message)
+        self._next_ids = {}
+
+    def import_records(self, records):
+        records = iter(records)
+        batch = list(islice(records, self.batch_size))
+        while batch:
+            self._import_batch(batch)
+            batch = list(islice(records, self.batch_size))
+
+    def _prepare(self, record):
+        if isinstance(record, ValidationError):
+            raise record    # line which can't be parsed
+        if not isinstance(record, dict):
+            raise ValidationError('Record must be an object.')
+        unit_type = record.get('unit_type') or self.default_unit_type
+        if unit_type not in UNIT_MODELS:
+            raise ValidationError('Unknown unit type "' + str(unit_type) + '".')
+        unit_model = UNIT_MODELS[unit_type]
+        work_values = {}
+        unit_values = {}
+        for field in unit_fields(unit_model):
+            value = record.get(field.name)
+            if value in (None, ''):
+                if field.has_default():
+                    continue
+                raise ValidationError('Field "' + field.name + '" is required.')
+            values = work_values if field.model is Work else unit_values
+            values[field.name] = clean_value(field, value)
+        work = Work(work_type=unit_model.work_type, **work_values)
+        return unit_type, unit_model(work=work, **unit_values), split_authors(record)
+
+    def _bulk_create(self, model, objects):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # SQLite doesn't return ids of the inserted rows, so ids are given here:
+            # through table rows need them. Import must not run in parallel with other inserts.
+            next_id = self._next_ids.get(model)
+            if next_id is None:
+                # base manager: ids of the soft deleted works and their extensions are taken as well
+                next_id = (model._base_manager.aggregate(max_id=Max('pk'))['max_id'] or 0) + 1
+            for obj in objects:
+                obj.pk = next_id
+                next_id += 1
+            self._next_ids[model] = next_id
+        return model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def _import_batch(self, batch):
+        prepared = defaultdict(list)    # unit_type -> [(unit, authors)]
+        for line_number, record in batch:
+            try:
+                unit_type, unit, authors = self._prepare(record)
+            except ValidationError as error:
+                self.errors.append((line_number, ' '.join(error.messages)))
+                continue
+            prepared[unit_type].append((unit, authors))
+
+        with transaction.atomic():
+            new_authors = {}
+            for rows in prepared.values():
+                for unit, authors in rows:
+                    for author_key in authors:
+                        if author_key not in self.author_ids and author_key not in new_authors:
+                            new_authors[author_key] = Author(author_name=author_key[0], author_surname=author_key[1])
+            for author in self._bulk_create(Author, list(new_authors.values())):
+                self.author_ids[(author.author_name, author.author_surname)] = author.pk
+            self.created_authors += len(new_authors)
+
+            self._bulk_create(Work, [unit.work for rows in prepared.values() for unit, authors in rows])
+            through = Work.work_author.through
+            links = []
+            for rows in prepared.values():
+                for unit, authors in rows:
+                    unit.work_id = unit.work.pk
+                    # dict keeps order and drops the same author mentioned twice
+                    for author_id in dict.fromkeys(self.author_ids[author_key] for author_key in authors):
+                        links.append(through(work_id=unit.work_id, author_id=author_id))
+            through.objects.bulk_create(links, batch_size=self.batch_size)
+            # bulk_create doesn't send m2m_changed, summaries of the batch authors are refreshed at once
+            bibliography.refresh_authors(link.author_id for link in links)
+
+            for unit_type, rows in prepared.items():
+                self._bulk_create(UNIT_MODELS[unit_type], [unit for unit, authors in rows])
+                if self.update_search_index:
+                    # bulk_create doesn't send signals, index is updated here
+                    search.index_units(unit_type, [(unit.pk, search.unit_document(unit, authors))
+                                                   for unit, authors in rows])
+                self.created_units[unit_type] += len(rows)
+
+
+class EchoBuffer:
+    """File-like object for csv.writer: returns the written line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def export_columns(unit_types):
+    """Union of the columns of the unit types, so one CSV header fits all exported rows."""
+    columns = ['unit_type', 'id']
+    for unit_type in unit_types:
+        for field in unit_fields(UNIT_MODELS[unit_type]):
+            if field.name not in columns:
+                columns.append(field.name)
+    return columns + ['author_name', 'author_surname']
+
+
+def export_rows(unit_type, chunk_size=2000):
+    """
+    Yields row dicts of all units of one type in id order.
+    Units are read by DB cursor iterator in chunks, authors are read with one query per chunk:
+    chunk covers continuous unit id range, so work authors are filtered by range of the joined unit id,
+    not by long IN list. Memory use depends only on chunk size.
+    """
+    unit_model = UNIT_MODELS[unit_type]
+    fields = unit_fields(unit_model)
+    field_names = [field.name for field in fields]
+    lookups = [('work__' + field.name if field.model is Work else field.name) for field in fields]
+    unit_id_lookup = 'work__' + unit_model._meta.model_name + '__id'
+    units = unit_model.objects.order_by('pk').values_list('pk', *lookups).iterator(chunk_size=chunk_size)
+    chunk = list(islice(units, chunk_size))
+    while chunk:
+        authors = defaultdict(list)
+        for unit_id, name, surname in Work.work_author.through.objects\
+                .filter(**{unit_id_lookup + '__gte': chunk[0][0], unit_id_lookup + '__lte': chunk[-1][0]})\
+                .order_by('pk')\
+                .values_list(unit_id_lookup, 'author__author_name', 'author__author_surname'):
+            authors[unit_id].append((name, surname))
+        for values in chunk:
+            row = {'unit_type': unit_type, 'id': values[0]}
+            row.update(zip(field_names, values[1:]))
+            row['author_name'] = AUTHOR_SEPARATOR.join(name for name, surname in authors[values[0]])
+            row['author_surname'] = AUTHOR_SEPARATOR.join(surname for name, surname in authors[values[0]])
+            yield row
+        chunk = list(islice(units, chunk_size))
+
+
+def export_lines(unit_types, file_format, chunk_size=2000):
+    """Yields exported catalog as text lines (CSV with header or JSON Lines)."""
+    if file_format == 'csv':
+        writer = csv.DictWriter(EchoBuffer(), fieldnames=export_columns(unit_types))
+        yield writer.writeheader()
+        for unit_type in unit_types:
+            for row in export_rows(unit_type, chunk_size):
+                yield writer.writerow(row)
+    else:
+        for unit_type in unit_types:
+            for row in export_rows(unit_type, chunk_size):
+                yield json.dumps(row, default=str) + '\n'
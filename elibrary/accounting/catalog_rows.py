@@ -0,0 +1,42 @@
+from django.db.models import prefetch_related_objects
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+
+from .detail_cache import get_rows, set_rows
+
+ROW_TEMPLATE = 'common_info_row.html'
+# 'common_info' url unit_type -> unit type name used by search index, signals and the other urls
+LIST_UNIT_TYPES = {'articles': 'article', 'science_books': 'science_book', 'fiction_books': 'fiction_book'}
+
+
+def id_url_prefix(url_name, url_unit_type):
+    # '/accounting/article_details/0/' -> '/accounting/article_details/', row adds '<id>/'
+    url = reverse(url_name, args=[url_unit_type, 0])
+    return url[:-len('0/')]
+
+
+def row_urls(unit_type):
+    """Links of the table rows, reversed once per page instead of four times per row."""
+    return {'details': id_url_prefix('detailed_info', unit_type + '_details'),
+            'edit': id_url_prefix('edit_info', 'edit_' + unit_type),
+            'add': reverse('add_unit', args=[unit_type]),
+            'delete': id_url_prefix('delete_library_unit', 'delete_' + unit_type)}
+
+
+def render_rows(unit_type, units):
+    """
+    Rendered catalog table rows of the units (Article, ScienceBook or FictionBook page).
+    Cached rows (keyed by unit id and updated_at) are read with one cache request, authors are loaded
+    and rows are rendered only for the missing ones.
+    """
+    rows = get_rows(unit_type, units)
+    missing = [unit for unit in units if unit.pk not in rows]
+    if missing:
+        prefetch_related_objects(missing, 'work__work_author')    # one query for the missing rows
+        template = get_template(ROW_TEMPLATE)    # compiled once by the cached loader
+        urls = row_urls(unit_type)
+        rendered = {unit.pk: template.render({'unit': unit, 'urls': urls}) for unit in missing}
+        set_rows(unit_type, missing, rendered)
+        rows.update(rendered)
+    return [mark_safe(rows[unit.pk]) for unit in units]
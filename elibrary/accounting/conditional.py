@@ -0,0 +1,73 @@
+import hashlib
+from collections import defaultdict
+
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .catalog_rows import LIST_UNIT_TYPES
+from .detail_cache import DETAIL_UNIT_TYPES, get_details
+from .models import WORK_EXTENSIONS
+from .pagination import get_cursor, get_page_size
+
+
+def touch_units(units, now=None):
+    """
+    Moves updated_at of the (unit_type, unit_id) units which rows weren't saved themselves:
+    their work, authors or author names were changed. One UPDATE per unit type.
+    """
+    now = now or timezone.now()
+    unit_ids = defaultdict(list)
+    for unit_type, unit_id in units:
+        unit_ids[unit_type].append(unit_id)
+    for unit_type, ids in unit_ids.items():
+        WORK_EXTENSIONS[unit_type]._base_manager.filter(pk__in=ids).update(updated_at=now)
+
+
+def make_etag(*parts):
+    return hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def request_version(request, key, compute):
+    # ETag and Last-Modified functions of the condition decorator share one query
+    versions = request.__dict__.setdefault('_catalog_versions', {})
+    if key not in versions:
+        versions[key] = compute()
+    return versions[key]
+
+
+def unit_updated_at(request, unit_type, unit_number):
+    """
+    updated_at of the not deleted unit of the details page or None: from the cached page (it is dropped
+    by signals together with updated_at change) or one primary key lookup.
+    """
+    if unit_type not in DETAIL_UNIT_TYPES:
+        return None
+
+    def load():
+        cached = get_details(DETAIL_UNIT_TYPES[unit_type], unit_number)
+        if cached is not None:
+            return cached[0]
+        return WORK_EXTENSIONS[DETAIL_UNIT_TYPES[unit_type]].objects.filter(pk=unit_number)\
+            .values_list('updated_at', flat=True).first()
+
+    return request_version(request, (unit_type, unit_number), load)
+
+
+def unit_etag(request, unit_type, unit_number):
+    updated_at = unit_updated_at(request, unit_type, unit_number)
+    return None if updated_at is None else make_etag(unit_type, unit_number, updated_at.isoformat())
+
+
+def page_etag(request, unit_type):
+    """
+    ETag of the catalog table page: number of rows, last id and the latest updated_at of the keyset page
+    (with the row telling that the next page exists), one aggregate over the primary key range.
+    Deleted rows change the page rows, so no Last-Modified is sent for it.
+    """
+    if unit_type not in LIST_UNIT_TYPES:
+        return None
+    after = get_cursor(request)
+    page_size = get_page_size(request)
+    page = WORK_EXTENSIONS[LIST_UNIT_TYPES[unit_type]].objects.filter(pk__gt=after).order_by('pk')[:page_size + 1]
+    version = page.aggregate(rows=Count('pk'), last_id=Max('pk'), updated_at=Max('updated_at'))
+    return make_etag(unit_type, after, page_size, version['rows'], version['last_id'], version['updated_at'])
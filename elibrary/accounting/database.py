@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db import connections
+
+
+def pragma_statements(pragmas):
+    return ['PRAGMA ' + name + ' = ' + str(value) for name, value in pragmas.items()]
+
+
+def apply_sqlite_pragmas(connection):
+    """Sets SQLITE_PRAGMAS on the new SQLite connection, other backends are not changed."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(getattr(settings, 'SQLITE_PRAGMAS', {})):
+            cursor.execute(statement)
+
+
+def check_connections():
+    """
+    Closes persistent connections which were broken since the previous request (DB restart, idle timeout
+    of the pooler), so the request opens a new one instead of failing on the first query.
+    Django closes only connections with errors seen by the previous request.
+    """
+    if not getattr(settings, 'DATABASE_HEALTH_CHECKS', False):
+        return
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block or not connection.settings_dict['CONN_MAX_AGE']:
+            continue
+        if not connection.is_usable():
+            connection.close()
@@ -0,0 +1,185 @@
+import re
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from django.db import transaction
+from django.db.models import Case, When, Value
+
+from . import bibliography
+from .catalog_changes import units_changed, work_units
+from .deletion import raw_delete
+from .models import Author, AuthorBibliography, Work
+
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_BATCH_SIZE = 500    # merges per transaction
+INITIAL_SIMILARITY = 0.9    # "J." and "John"
+
+SOUNDEX_CODES = {letter: str(code) for code, letters in
+                 enumerate(['aeiouyhw', 'bfpv', 'cgjkqsxz', 'dt', 'l', 'mn', 'r']) for letter in letters}
+
+
+def normalize(text):
+    """Lower case words without accents and punctuation: 'Jöhn-Paul  O.' -> 'john paul o'."""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return ' '.join(re.findall(r'[^\W_]+', text))
+
+
+def soundex(word):
+    """American Soundex code of the word: 'smith' and 'smyth' -> 'S530'."""
+    letters = [letter for letter in word if letter in SOUNDEX_CODES]
+    if not letters:
+        return ''
+    digits = []
+    previous = SOUNDEX_CODES[letters[0]]
+    for letter in letters[1:]:
+        code = SOUNDEX_CODES[letter]
+        if code != '0' and code != previous:
+            digits.append(code)
+        if letter not in 'hw':    # h and w don't separate the same codes, vowels do
+            previous = code
+    return (letters[0].upper() + ''.join(digits) + '000')[:4]
+
+
+def block_key(name, surname):
+    """
+    Candidates are compared only inside the block: phonetic key of the surname and the first letter
+    of the name, so 'J. Smith', 'John Smith' and 'john smyth' are in one block.
+    """
+    return soundex(surname.replace(' ', '')), name[:1]
+
+
+def is_initials(name):
+    return all(len(word) == 1 for word in name.split())
+
+
+def name_similarity(first, second):
+    if first == second:
+        return 1.0
+    if is_initials(first) or is_initials(second):
+        first_initials = ''.join(word[0] for word in first.split())
+        second_initials = ''.join(word[0] for word in second.split())
+        return INITIAL_SIMILARITY if first_initials == second_initials else 0.0
+    return SequenceMatcher(None, first, second).ratio()
+
+
+def similarity(first, second):
+    """Score of two (normalized name, normalized surname) pairs from 0 to 1."""
+    return (SequenceMatcher(None, first[1], second[1]).ratio() + name_similarity(first[0], second[0])) / 2
+
+
+class AuthorRecord:
+    __slots__ = ('pk', 'name', 'surname', 'capitalized')
+
+    def __init__(self, pk, name, surname):
+        self.pk = pk
+        self.capitalized = name[:1].isupper() and surname[:1].isupper()
+        self.name = normalize(name)
+        self.surname = normalize(surname)
+
+    @property
+    def key(self):
+        return self.name, self.surname
+
+    @property
+    def preference(self):
+        # the most complete spelling is kept: full name over initials, capitalized, then the oldest row
+        return -len(self.name), not self.capitalized, self.pk
+
+
+def author_blocks(batch_size=5000):
+    """Block key -> AuthorRecord list, one pass over the author table (only ids and names are kept)."""
+    blocks = defaultdict(list)
+    for pk, name, surname in Author.objects.order_by().values_list('pk', 'author_name', 'author_surname')\
+            .iterator(chunk_size=batch_size):
+        record = AuthorRecord(pk, name, surname)
+        if record.surname:
+            blocks[block_key(record.name, record.surname)].append(record)
+    return blocks
+
+
+def cluster_block(records, threshold):
+    """
+    Groups the block records around the preferred spellings. A record similar to several groups
+    equally ('J. Smith' to 'John Smith' and 'Jane Smith') is ambiguous and stays alone.
+    Returns [(kept record, [duplicate records])].
+    """
+    clusters = []
+    for record in sorted(records, key=lambda record: record.preference):
+        scores = sorted(((similarity(kept.key, record.key), index) for index, (kept, duplicates) in enumerate(clusters)),
+                        reverse=True)
+        scores = [(score, index) for score, index in scores if score >= threshold]
+        if not scores or (len(scores) > 1 and scores[0][0] == scores[1][0]):
+            clusters.append((record, []))
+        else:
+            clusters[scores[0][1]][1].append(record)
+    return [(kept, duplicates) for kept, duplicates in clusters if duplicates]
+
+
+def merge_plan(threshold=DEFAULT_THRESHOLD):
+    """[(kept author id, [duplicate author ids])] for all authors, comparisons are made only inside blocks."""
+    plan = []
+    for records in author_blocks().values():
+        if len(records) > 1:
+            plan.extend((kept.pk, [duplicate.pk for duplicate in duplicates])
+                        for kept, duplicates in cluster_block(records, threshold))
+    plan.sort()
+    return plan
+
+
+def author_names(plan, batch_size=DEFAULT_BATCH_SIZE):
+    """author id -> 'name surname' of all authors of the plan, one query per batch of ids."""
+    author_ids = [author_id for kept_id, duplicate_ids in plan for author_id in [kept_id] + duplicate_ids]
+    names = {}
+    for start in range(0, len(author_ids), batch_size):
+        for pk, name, surname in Author.objects.filter(pk__in=author_ids[start:start + batch_size])\
+                .values_list('pk', 'author_name', 'author_surname'):
+            names[pk] = name + ' ' + surname
+    return names
+
+
+def apply_merges(merges):
+    """
+    Moves works of the duplicates to the kept authors and deletes the duplicates, one transaction.
+    Through table is rewritten by one DELETE (links the kept author already has) and one UPDATE ... CASE.
+    """
+    target = {duplicate_id: kept_id for kept_id, duplicate_ids in merges for duplicate_id in duplicate_ids}
+    kept_ids = {kept_id for kept_id, duplicate_ids in merges}
+    through = Work.work_author.through
+    with transaction.atomic():
+        links = list(through.objects.filter(author_id__in=set(target) | kept_ids).order_by('pk')
+                     .values_list('pk', 'work_id', 'author_id'))
+        kept_links = {(work_id, author_id) for pk, work_id, author_id in links if author_id in kept_ids}
+        delete_ids = []
+        update_ids = []
+        for pk, work_id, author_id in links:
+            if author_id not in target:
+                continue
+            link = (work_id, target[author_id])
+            if link in kept_links:
+                delete_ids.append(pk)    # the work has the kept author already
+            else:
+                kept_links.add(link)
+                update_ids.append(pk)
+        if delete_ids:
+            raw_delete(through.objects.filter(pk__in=delete_ids))
+        if update_ids:
+            through.objects.filter(pk__in=update_ids).update(author_id=Case(
+                *[When(author_id=duplicate_id, then=Value(kept_id)) for duplicate_id, kept_id in target.items()]))
+        raw_delete(AuthorBibliography.objects.filter(author_id__in=target))
+        raw_delete(Author.objects.filter(pk__in=target))
+        bibliography.refresh_authors(kept_ids)
+        # search documents and cached details contain author names
+        changed_work_ids = {work_id for pk, work_id, author_id in links if author_id in target}
+        units_changed(work_units(Work.objects.filter(pk__in=changed_work_ids)))
+
+
+def apply_plan(plan, batch_size=DEFAULT_BATCH_SIZE):
+    """Applies the merge plan by batches of merges, returns the number of deleted duplicates."""
+    merged = 0
+    for start in range(0, len(plan), batch_size):
+        batch = plan[start:start + batch_size]
+        apply_merges(batch)
+        merged += sum(len(duplicate_ids) for kept_id, duplicate_ids in batch)
+    return merged
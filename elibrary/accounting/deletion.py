@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.utils import timezone
+
+from . import bibliography, detail_cache, search
+from .models import Author, AuthorBibliography, Work, LibraryUnit, UnitStatus, Hold, WorkStats, WORK_EXTENSIONS
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+class DeletionError(Exception):
+    """Work can't be deleted: its copies are issued."""
+
+
+def active_loans(work_ids):
+    return UnitStatus.objects.filter(library_unit__work_id__in=work_ids, date_return_actual__isnull=True)
+
+
+def soft_delete_unit(unit, now=None):
+    """
+    Marks the work of the unit (Article, ScienceBook or FictionBook) as deleted: it disappears from the catalog
+    pages, search and hold queues at once, its copies can't be issued any more, the rows are removed later
+    by 'purge_deleted' command. Work with issued copies isn't deleted: DeletionError.
+    Constant number of queries, however long the loan history of the work is.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        # copies are taken off the shelf first: issue of a copy committed concurrently is seen by the check below
+        LibraryUnit.objects.filter(work_id=unit.work_id).update(unit_available=False)
+        if active_loans([unit.work_id]).exists():
+            raise DeletionError('Library unit "' + unit.title + '" has issued copies, it can be deleted '
+                                'when they are returned.')
+        Work.objects.filter(pk=unit.work_id).update(deleted_at=now)
+        Hold.objects.filter(work_id=unit.work_id, status__in=Hold.ACTIVE_STATUSES).update(status=Hold.STATUS_CANCELLED)
+        search.remove_unit(unit.work_type, unit.pk)
+        detail_cache.invalidate_details(unit.work_type, unit.pk)
+        bibliography.refresh_works([unit.work_id])    # queryset update() sends no signals
+
+
+def raw_delete(queryset):
+    # one DELETE statement: no objects are loaded, no cascade collection in Python and no signals
+    # (the same fast delete is used by Django's collector), dependent rows must be deleted before
+    return queryset._raw_delete(queryset.db)
+
+
+def purge_loans(work_ids, chunk_size):
+    """Deletes loan history of the works' copies, one transaction per chunk. Returns deleted loans number."""
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            loan_ids = list(UnitStatus.objects.filter(library_unit__work_id__in=work_ids).order_by()
+                            .values_list('pk', flat=True)[:chunk_size])
+            if not loan_ids:
+                return deleted
+            deleted += raw_delete(UnitStatus.objects.filter(pk__in=loan_ids))
+
+
+def purge_works(work_ids):
+    """Deletes soft deleted works with their copies, holds, counters and extensions. Returns orphaned authors."""
+    through = Work.work_author.through
+    author_ids = set(through.objects.filter(work_id__in=work_ids).values_list('author_id', flat=True))
+    raw_delete(Hold.objects.filter(work_id__in=work_ids))
+    raw_delete(LibraryUnit.objects.filter(work_id__in=work_ids))
+    raw_delete(WorkStats.objects.filter(work_id__in=work_ids))
+    raw_delete(through.objects.filter(work_id__in=work_ids))
+    for extension_model in WORK_EXTENSIONS.values():
+        raw_delete(extension_model._base_manager.filter(work_id__in=work_ids))
+    raw_delete(Work.all_objects.filter(pk__in=work_ids))
+    # authors of the purged works without other works
+    orphan_ids = list(Author.objects.filter(pk__in=author_ids, works__isnull=True).values_list('pk', flat=True))
+    raw_delete(AuthorBibliography.objects.filter(author_id__in=orphan_ids))
+    return raw_delete(Author.objects.filter(pk__in=orphan_ids))
+
+
+def purge_deleted(deleted_before=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Hard deletes works soft deleted before 'deleted_before' (all of them by default), their loan history
+    and orphaned authors. Works are taken by chunks of the oldest tombstones (work_deleted_idx),
+    every statement deletes up to the chunk of rows, transactions stay short.
+    Works with active loans (issued before soft delete refused them) are kept: the loan is the only record
+    of who holds the copy.
+    Returns (works, loans, authors, kept works) numbers.
+    """
+    tombstones = Work.all_objects.filter(deleted_at__isnull=False)
+    if deleted_before is not None:
+        tombstones = tombstones.filter(deleted_at__lt=deleted_before)
+    kept_ids = set(active_loans(tombstones.values('pk')).values_list('library_unit__work_id', flat=True))
+    tombstones = tombstones.exclude(pk__in=kept_ids)
+    works = loans = authors = 0
+    while True:
+        work_ids = list(tombstones.order_by('deleted_at', 'pk').values_list('pk', flat=True)[:chunk_size])
+        if not work_ids:
+            return works, loans, authors, len(kept_ids)
+        loans += purge_loans(work_ids, chunk_size)
+        with transaction.atomic():
+            authors += purge_works(work_ids)
+        works += len(work_ids)
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+DEFAULT_TIMEOUT = 60 * 60 * 24    # invalidation is done by signals, timeout only limits stale entries lifetime
+# 'detailed_info' url unit_type -> unit type name used by search index and signals
+DETAIL_UNIT_TYPES = {'article_details': 'article',
+                     'science_book_details': 'science_book',
+                     'fiction_book_details': 'fiction_book'}
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def details_key(unit_type, unit_id):
+    return 'unit_details:' + unit_type + ':' + str(unit_id)
+
+
+def get_details(unit_type, unit_id):
+    """(unit updated_at, rendered library unit details page) or None."""
+    return get_cache().get(details_key(unit_type, unit_id))
+
+
+def set_details(unit_type, unit_id, updated_at, content):
+    get_cache().set(details_key(unit_type, unit_id), (updated_at, content),
+                    getattr(settings, 'CATALOG_DETAIL_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+
+
+def row_key(unit_type, unit):
+    # a new key on every change of the unit (see catalog_changes.units_changed), old rows expire by timeout
+    return 'unit_row:' + unit_type + ':' + str(unit.pk) + ':' + unit.updated_at.isoformat()
+
+
+def get_rows(unit_type, units):
+    """unit id -> rendered row of the catalog table, cached rows only, one cache request."""
+    keys = {row_key(unit_type, unit): unit.pk for unit in units}
+    return {keys[key]: content for key, content in get_cache().get_many(keys).items()}
+
+
+def set_rows(unit_type, units, rows):
+    get_cache().set_many({row_key(unit_type, unit): rows[unit.pk] for unit in units},
+                         getattr(settings, 'CATALOG_DETAIL_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+
+
+def invalidate_details(unit_type, unit_id):
+    key = details_key(unit_type, unit_id)
+    get_cache().delete(key)
+    # reader of the other request can put old version back before this transaction is committed,
+    # so the key is deleted once more after commit
+    transaction.on_commit(lambda: get_cache().delete(key))
@@ -1,15 +1,21 @@
 from django import forms
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import UserCreationForm, PasswordResetForm
+from django.template import loader
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
 from .models import CitiesList, StreetsList, Article, FictionBook, ScienceBook
+from .mail_outbox import enqueue_mail
 
 
 class ProfileInfo(forms.Form):
     email = forms.EmailField(max_length=200, help_text='Required')
     phone_number = forms.IntegerField(max_value=99999, min_value=00000)
-    # select city from the DB
-    pick_city = forms.ModelChoiceField(CitiesList.objects.all(), required=False)
+    # select city from the DB: text input with typeahead, so the page doesn't contain all names as <option>s,
+    # the name is resolved by one unique index lookup
+    pick_city = forms.ModelChoiceField(CitiesList.objects.all(), required=False, to_field_name='city_name',
+                                       widget=forms.TextInput(attrs={'list': 'city_options',
+                                                                     'autocomplete': 'off',
+                                                                     'data-lookup': 'city'}))
     # or add new city name in DB manually
     add_city = forms.CharField(max_length=200,
                                required=False,
@@ -18,7 +24,10 @@ class ProfileInfo(forms.Form):
                                                           message='City name contains invalid symbols!',
                                                           code='invalid')])
     # select street from the DB
-    pick_street = forms.ModelChoiceField(StreetsList.objects.all(), required=False)
+    pick_street = forms.ModelChoiceField(StreetsList.objects.all(), required=False, to_field_name='street_name',
+                                         widget=forms.TextInput(attrs={'list': 'street_options',
+                                                                       'autocomplete': 'off',
+                                                                       'data-lookup': 'street'}))
     # or add new street name in DB manually
     add_street = forms.CharField(max_length=200,
                                  required=False,
@@ -62,11 +71,36 @@ class ProfileInfoEdit(ProfileInfo):
                   )
 
 
+class OutboxPasswordResetForm(PasswordResetForm):
+    # password reset email is put into the mail outbox instead of sending during the request
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email, html_email_template_name=None):
+        subject = loader.render_to_string(subject_template_name, context)
+        subject = ''.join(subject.splitlines())    # email subject *must not* contain newlines
+        body = loader.render_to_string(email_template_name, context)
+        enqueue_mail(subject, body, [to_email], from_email=from_email)
+
+
 class LibraryUnitBaseInfo(forms.Form):
     author_name = forms.CharField(max_length=100)
     author_surname = forms.CharField(max_length=100)
     title = forms.CharField(max_length=300)
 
+    def __init__(self, *args, with_authors=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not with_authors:    # authors are edited by AuthorFormSet
+            del self.fields['author_name']
+            del self.fields['author_surname']
+
+
+class AuthorForm(forms.Form):
+    id = forms.IntegerField(required=False, widget=forms.HiddenInput)    # empty for the new author
+    author_name = forms.CharField(max_length=100)
+    author_surname = forms.CharField(max_length=100)
+
+
+AuthorFormSet = forms.formset_factory(AuthorForm, extra=1, can_delete=True)
+
 
 class ArticleInfo(LibraryUnitBaseInfo):
     journal = forms.CharField(max_length=300)
@@ -94,3 +128,12 @@ class ScienceBookInfo(LibraryUnitBaseInfo):
 
     class Meta:
         model = ScienceBook
+
+
+class CatalogSearchForm(forms.Form):
+    q = forms.CharField(max_length=200, label='Search')
+    unit_type = forms.ChoiceField(choices=[('', 'All'),
+                                           ('article', 'Articles'),
+                                           ('science_book', 'Science books'),
+                                           ('fiction_book', 'Fiction books')],
+                                  required=False)
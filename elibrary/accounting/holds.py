@@ -0,0 +1,135 @@
+import datetime
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import stats
+from .mail_outbox import enqueue_mail
+from .models import Hold, LibraryUnit, Work, WorkStats
+
+DEFAULT_HOLD_DAYS = 90      # waiting hold is dropped after this time
+DEFAULT_PICKUP_DAYS = 3     # assigned copy waits for the patron this time
+
+
+class HoldError(Exception):
+    """Hold operation can't be done: the user already has an active hold of the work, hold is not active etc."""
+
+
+def hold_period():
+    return datetime.timedelta(days=getattr(settings, 'LIBRARY_HOLD_DAYS', DEFAULT_HOLD_DAYS))
+
+
+def pickup_period():
+    return datetime.timedelta(days=getattr(settings, 'LIBRARY_HOLD_PICKUP_DAYS', DEFAULT_PICKUP_DAYS))
+
+
+def place_hold(work_id, library_user, priority=Hold.PRIORITY_NORMAL, now=None):
+    """Puts the user to the work queue, available copy is assigned at once. Returns Hold."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        if not Work.objects.filter(pk=work_id).exists():    # soft deleted works are not queued
+            raise HoldError('Work ' + str(work_id) + ' is deleted.')
+        try:
+            with transaction.atomic():
+                hold = Hold.objects.create(work_id=work_id, library_user=library_user, priority=priority,
+                                           created_at=now, expires_at=now + hold_period())
+        except IntegrityError:
+            raise HoldError('User ' + str(library_user) + ' already has an active hold of work ' + str(work_id) + '.')
+        available_id = LibraryUnit.objects.filter(work_id=work_id, unit_available=True)\
+            .values_list('pk', flat=True).first()
+        if available_id is not None:
+            assign_copy(available_id, work_id, now)
+            hold.refresh_from_db()
+        return hold
+
+
+def next_waiting_hold(work_id):
+    """Head of the work queue, one hold_queue_idx seek: priority class first, then first come first served."""
+    return Hold.objects.select_for_update(of=('self',)).select_related('library_user', 'work')\
+        .filter(work_id=work_id, status=Hold.STATUS_WAITING).order_by('priority', 'created_at', 'pk').first()
+
+
+def assign_copy(library_unit_id, work_id, now=None):
+    """
+    Reserves the available copy for the first waiting hold of the work, returns the hold or None.
+    Called in the transaction which made the copy available (return, expired or cancelled hold, new copy),
+    so the copy is never seen on the shelf by other patrons while the queue is not empty.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        hold = next_waiting_hold(work_id)
+        if hold is None:
+            return None
+        # conditional update, like in loans.issue_unit(): the copy can't be taken twice
+        if not LibraryUnit.objects.filter(pk=library_unit_id, unit_available=True).update(unit_available=False):
+            return None
+        stats.increment(WorkStats, {'work_id': work_id}, copies_available=-1)
+        hold.status = Hold.STATUS_READY
+        hold.library_unit_id = library_unit_id
+        hold.ready_at = now
+        hold.expires_at = now + pickup_period()
+        hold.save(update_fields=['status', 'library_unit', 'ready_at', 'expires_at'])
+        if hold.library_user.email:
+            enqueue_mail('Reserved library unit is ready.',
+                         'Reserved "' + str(hold.work) + '" waits for you until ' + str(hold.expires_at) + '.',
+                         [hold.library_user.email])
+        return hold
+
+
+def take_ready_hold(library_unit_id, library_user):
+    """
+    Marks the ready hold of the copy for this user as fulfilled and puts the copy back to available,
+    so it can be issued by loans.issue_unit(). Returns False if the user has no such hold.
+    """
+    with transaction.atomic():
+        hold = Hold.objects.select_for_update()\
+            .filter(library_unit_id=library_unit_id, library_user=library_user, status=Hold.STATUS_READY).first()
+        if hold is None:
+            return False
+        hold.status = Hold.STATUS_FULFILLED
+        hold.save(update_fields=['status'])
+        release_copy(hold, reassign=False)
+        return True
+
+
+def release_copy(hold, reassign=True, now=None):
+    """Returns the copy reserved by the closed hold to the shelf or to the next hold in the queue."""
+    LibraryUnit.objects.filter(pk=hold.library_unit_id).update(unit_available=True)
+    stats.increment(WorkStats, {'work_id': hold.work_id}, copies_available=1)
+    if reassign:
+        assign_copy(hold.library_unit_id, hold.work_id, now)
+
+
+def cancel_hold(hold_id, now=None):
+    with transaction.atomic():
+        hold = Hold.objects.select_for_update().filter(pk=hold_id, status__in=Hold.ACTIVE_STATUSES).first()
+        if hold is None:
+            raise HoldError('Hold ' + str(hold_id) + ' is not active.')
+        hold.status = Hold.STATUS_CANCELLED
+        hold.save(update_fields=['status'])
+        if hold.library_unit_id:
+            release_copy(hold, now=now)
+        return hold
+
+
+def expire_holds(now=None, batch_size=500):
+    """
+    Closes waiting and ready holds with passed expires_at, copies of the ready ones go to the next holds.
+    Reads only expired rows by hold_expiry_idx range, one short transaction per batch. Returns expired count.
+    """
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        with transaction.atomic():
+            batch = list(Hold.objects.select_for_update()
+                         .filter(status__in=Hold.ACTIVE_STATUSES, expires_at__lt=now)
+                         .order_by('expires_at')[:batch_size])
+            if not batch:
+                return expired
+            Hold.objects.filter(pk__in=[hold.pk for hold in batch]).update(status=Hold.STATUS_EXPIRED)
+            for hold in batch:
+                if hold.status == Hold.STATUS_READY and hold.library_unit_id:
+                    release_copy(hold, now=now)
+            expired += len(batch)
+
@@ -0,0 +1,87 @@
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import holds, stats
+from .models import LibraryUnit, UnitStatus
+
+DEFAULT_LOAN_DAYS = 14
+
+
+class LoanError(Exception):
+    """Loan operation can't be done: unit is already issued, loan is already closed etc."""
+
+
+def loan_period(loan_days=None):
+    if loan_days is None:
+        loan_days = getattr(settings, 'LIBRARY_LOAN_DAYS', DEFAULT_LOAN_DAYS)
+    return datetime.timedelta(days=loan_days)
+
+
+def issue_unit(library_unit_id, library_user, loan_days=None, now=None):
+    """Issues available library unit to the user, returns new UnitStatus (loan) record."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        # row lock for the databases that support it (PostgreSQL, MySQL)
+        library_unit = LibraryUnit.objects.select_for_update(of=('self',)).select_related('work')\
+            .get(pk=library_unit_id)
+        if library_unit.work.deleted_at is not None:
+            raise LoanError('Library unit ' + str(library_unit.pk) + ' belongs to a deleted work.')
+        # conditional update is the real guard against double issue: only one of concurrent
+        # transactions changes the row, SQLite (no row locks) is covered as well
+        issued = LibraryUnit.objects.filter(pk=library_unit.pk, unit_available=True).update(unit_available=False)
+        if not issued and holds.take_ready_hold(library_unit.pk, library_user):
+            # copy reserved for this user: hold is fulfilled by the issue
+            issued = LibraryUnit.objects.filter(pk=library_unit.pk, unit_available=True).update(unit_available=False)
+        if not issued:
+            raise LoanError('Library unit ' + str(library_unit.pk) + ' is already issued.')
+        library_unit.unit_available = False
+        loan = UnitStatus.objects.create(library_user=library_user,
+                                         library_unit=library_unit,
+                                         date_issue=now,
+                                         date_return_nominal=now + loan_period(loan_days))
+        stats.loan_issued(loan, library_unit.work_id)
+        return loan
+
+
+def return_unit(library_unit_id, now=None):
+    """Closes the active loan of the library unit and makes unit available, returns closed UnitStatus."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        loan = UnitStatus.objects.select_for_update().filter(library_unit_id=library_unit_id,
+                                                             date_return_actual__isnull=True).first()
+        if loan is None:
+            raise LoanError('Library unit ' + str(library_unit_id) + ' is not issued.')
+        loan.date_return_actual = now
+        loan.save(update_fields=['date_return_actual'])
+        LibraryUnit.objects.filter(pk=library_unit_id).update(unit_available=True)
+        work_id = LibraryUnit.objects.values_list('work_id', flat=True).get(pk=library_unit_id)
+        stats.loan_returned(loan, work_id)
+        # returned copy goes to the first patron in the work queue, if there is one
+        holds.assign_copy(library_unit_id, work_id, now)
+        return loan
+
+
+def renew_loan(loan_id, loan_days=None, now=None):
+    """Moves nominal return date of the active loan for one more loan period, returns renewed UnitStatus."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        loan = UnitStatus.objects.select_for_update().filter(pk=loan_id, date_return_actual__isnull=True).first()
+        if loan is None:
+            raise LoanError('Loan ' + str(loan_id) + ' is not active.')
+        # overdue loan is renewed from today, not from the missed return date
+        loan.date_return_nominal = max(loan.date_return_nominal, now) + loan_period(loan_days)
+        loan.save(update_fields=['date_return_nominal'])
+        return loan
+
+
+def current_loans(library_user):
+    """Not returned units of the user, (library_user, date_return_actual) index range."""
+    return UnitStatus.objects.filter(library_user=library_user, date_return_actual__isnull=True)
+
+
+def overdue_loans(now=None):
+    """Not returned units with missed return date, date_return_nominal index range."""
+    return UnitStatus.objects.filter(date_return_nominal__lt=now or timezone.now(), date_return_actual__isnull=True)
@@ -0,0 +1,94 @@
+import datetime
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import MailOutbox
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_DELAY = 60              # seconds before the first retry, doubled for each next one
+MAX_RETRY_DELAY = 60 * 60
+CLAIM_LEASE = 10 * 60         # message taken by crashed worker is retried after this time
+
+
+def enqueue_mail(subject, body, to, from_email=None):
+    """Stores email for the background sending, request doesn't wait for SMTP server."""
+    return MailOutbox.objects.create(subject=subject, body=body, to=','.join(to), from_email=from_email or '')
+
+
+def enqueue_many(messages):
+    """Stores (subject, body, to) messages with one bulk insert."""
+    MailOutbox.objects.bulk_create([MailOutbox(subject=subject, body=body, to=','.join(to))
+                                    for subject, body, to in messages])
+
+
+def retry_delay(attempts):
+    return datetime.timedelta(seconds=min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY))
+
+
+def claim_batch(batch_size, now=None):
+    """
+    Takes up to batch_size due messages for this worker. Conditional update by ids is the claim:
+    the same message can't be taken by two workers, no row locks are needed.
+    """
+    now = now or timezone.now()
+    due_ids = list(MailOutbox.objects.filter(status=MailOutbox.STATUS_QUEUED, next_attempt_at__lte=now)
+                   .order_by('next_attempt_at').values_list('pk', flat=True)[:batch_size])
+    if not due_ids:
+        return []
+    token = uuid.uuid4().hex
+    MailOutbox.objects.filter(pk__in=due_ids, status=MailOutbox.STATUS_QUEUED, next_attempt_at__lte=now)\
+        .update(claim_token=token, next_attempt_at=now + datetime.timedelta(seconds=CLAIM_LEASE))
+    return list(MailOutbox.objects.filter(claim_token=token))
+
+
+def send_batch(batch_size=50, now=None):
+    """Sends one batch of due messages over one SMTP connection, returns number of sent messages."""
+    messages = claim_batch(batch_size, now)
+    if not messages:
+        return 0
+    max_attempts = getattr(settings, 'MAIL_OUTBOX_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    sent = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        logger.warning('Mail server connection failed: %s', error)
+        for message in messages:
+            mark_failed_attempt(message, error, max_attempts)
+        return 0
+    try:
+        for message in messages:
+            email = EmailMessage(message.subject, message.body, message.from_email or None,
+                                 message.to.split(','), connection=connection)
+            try:
+                email.send()
+            except Exception as error:
+                mark_failed_attempt(message, error, max_attempts)
+            else:
+                message.status = MailOutbox.STATUS_SENT
+                message.sent_at = timezone.now()
+                message.attempts += 1
+                message.claim_token = ''
+                message.save(update_fields=['status', 'sent_at', 'attempts', 'claim_token'])
+                sent += 1
+    finally:
+        connection.close()
+    return sent
+
+
+def mark_failed_attempt(message, error, max_attempts):
+    message.attempts += 1
+    message.last_error = str(error)
+    message.claim_token = ''
+    if message.attempts >= max_attempts:
+        message.status = MailOutbox.STATUS_FAILED
+        logger.error('Mail %s to %s is not sent after %s attempts: %s', message.pk, message.to, message.attempts, error)
+    else:
+        message.next_attempt_at = timezone.now() + retry_delay(message.attempts)
+    message.save(update_fields=['attempts', 'last_error', 'claim_token', 'status', 'next_attempt_at'])
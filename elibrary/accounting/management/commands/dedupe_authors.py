@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from accounting.dedupe import DEFAULT_BATCH_SIZE, DEFAULT_THRESHOLD, apply_plan, author_names, merge_plan
+
+
+class Command(BaseCommand):
+    help = ('Finds duplicate authors (similar names inside blocks of the same surname sound) and merges them: '
+            'works of the duplicates are moved to the kept author, the duplicates are deleted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help='Minimal similarity (0..1) of the names to merge the authors.')
+        parser.add_argument('--output', help='Write the merge plan to this JSON file for review.')
+        parser.add_argument('--plan', help='Apply the reviewed merge plan from this JSON file instead of searching.')
+        parser.add_argument('--apply', action='store_true', help='Merge the authors (only the plan is shown by default).')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Merges per transaction.')
+
+    def handle(self, *args, **options):
+        if options['plan']:
+            with open(options['plan']) as plan_file:
+                plan = [(merge['keep'], merge['merge']) for merge in json.load(plan_file)]
+        else:
+            plan = merge_plan(options['threshold'])
+        self.stdout.write(str(len(plan)) + ' authors have ' + str(sum(len(ids) for keep, ids in plan)) + ' duplicates.')
+        if options['output'] or not options['apply']:
+            names = author_names(plan, options['batch_size'])
+            if options['output']:
+                with open(options['output'], 'w') as output:
+                    json.dump([self.plan_entry(keep, ids, names) for keep, ids in plan], output, indent=1,
+                              ensure_ascii=False)
+            else:
+                for keep, ids in plan:
+                    entry = self.plan_entry(keep, ids, names)
+                    self.stdout.write(entry['name'] + ' <- ' + '; '.join(entry['duplicates']))
+        if options['apply']:
+            merged = apply_plan(plan, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(str(merged) + ' duplicate authors merged.'))
+
+    @staticmethod
+    def plan_entry(keep, ids, names):
+        return {'keep': keep, 'merge': ids, 'name': names.get(keep, ''),
+                'duplicates': [names.get(author_id, '') for author_id in ids]}
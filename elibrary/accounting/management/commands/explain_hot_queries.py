@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, \
+    teardown_test_environment
+
+from accounting.benchmarks.data import CatalogGenerator
+from accounting.benchmarks.explain import HOT_PATH_SCENARIOS, explain_hot_queries
+
+
+class Command(BaseCommand):
+    help = ('Generates synthetic catalog in a throwaway test database, runs the views of the benchmark scenarios '
+            'and prints EXPLAIN of their queries. Queries reading a whole table are flagged.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--units', type=int, default=1000, help='Units per type.')
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--scenario', action='append', choices=[scenario.name for scenario in HOT_PATH_SCENARIOS],
+                            help='Explain only this scenario, can be repeated.')
+        parser.add_argument('--all', action='store_true', help='Print plans of the index driven queries as well.')
+        parser.add_argument('--fail-on-scan', action='store_true', help='Exit with error if full scans are found.')
+
+    def handle(self, *args, **options):
+        generator = CatalogGenerator(authors=options['authors'], units_per_type=options['units'],
+                                     users=options['users'])
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            generator.generate()
+            results = explain_hot_queries(generator, scenario_names=options['scenario'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        flagged = 0
+        for name, explained in results.items():
+            scans = [query for query in explained if query['full_scans']]
+            flagged += len(scans)
+            self.stdout.write(self.style.MIGRATE_HEADING(name + ': ' + str(len(explained)) + ' queries, ' +
+                                                         str(len(scans)) + ' with full scans'))
+            for query in explained:
+                if not query['full_scans'] and not options['all']:
+                    continue
+                if query['full_scans']:
+                    self.stdout.write(self.style.WARNING('  FULL SCAN of ' + ', '.join(query['full_scans'])))
+                self.stdout.write('  ' + query['sql'])
+                for line in query['plan']:
+                    self.stdout.write('    ' + line)
+        if flagged and options['fail_on_scan']:
+            raise CommandError(str(flagged) + ' queries read whole tables.')
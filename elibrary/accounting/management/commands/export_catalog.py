@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from accounting.catalog_io import export_lines
+from accounting.search import UNIT_MODELS
+
+
+class Command(BaseCommand):
+    help = 'Exports catalog units with their authors to CSV or JSON Lines, rows are written while they are read.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--unit-type', choices=list(UNIT_MODELS), help='All unit types by default.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--output', help='Output file path, stdout by default.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        unit_types = [options['unit_type']] if options['unit_type'] else list(UNIT_MODELS)
+        lines = export_lines(unit_types, options['format'], chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as stream:
+                stream.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
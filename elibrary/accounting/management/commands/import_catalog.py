@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.catalog_io import CatalogImporter, detect_format, read_records
+from accounting.search import UNIT_MODELS
+
+
+class Command(BaseCommand):
+    help = ('Imports articles, science books and fiction books from CSV or JSON Lines files. '
+            'Columns are the unit model fields plus comma separated "author_name" and "author_surname", '
+            'optional "unit_type" column overrides --unit-type.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Detected by file extension by default.')
+        parser.add_argument('--unit-type', choices=list(UNIT_MODELS))
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--skip-search-index', action='store_true',
+                            help='Do not update search index (run rebuild_search_index afterwards).')
+
+    def handle(self, *args, **options):
+        importer = CatalogImporter(batch_size=options['batch_size'],
+                                   default_unit_type=options['unit_type'],
+                                   update_search_index=not options['skip_search_index'])
+        for path in options['paths']:
+            file_format = detect_format(path, options['format'])
+            try:
+                with open(path, newline='', encoding='utf-8') as stream:
+                    importer.import_records(read_records(stream, file_format))
+            except (OSError, ValueError) as error:
+                raise CommandError(path + ': ' + str(error))
+
+        for line_number, message in importer.errors:
+            self.stderr.write('Line ' + str(line_number) + ' skipped: ' + message)
+        for unit_type, count in sorted(importer.created_units.items()):
+            self.stdout.write(unit_type + ': ' + str(count) + ' created')
+        self.stdout.write(self.style.SUCCESS(str(importer.created_authors) + ' new authors, '
+                                             + str(len(importer.errors)) + ' records skipped.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounting import holds
+
+
+class Command(BaseCommand):
+    help = 'Expires waiting and not picked up holds, their copies are assigned to the next holds in the queues.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        expired = holds.expire_holds(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(str(expired) + ' holds expired.'))
@@ -0,0 +1,25 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounting.deletion import DEFAULT_CHUNK_SIZE, purge_deleted
+
+
+class Command(BaseCommand):
+    help = ('Hard deletes soft deleted library units with their copies, loan history and orphaned authors '
+            'by chunked bulk deletes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=float, default=0,
+                            help='Purge only units deleted more than this number of hours ago.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        deleted_before = timezone.now() - datetime.timedelta(hours=options['older_than'])
+        works, loans, authors, kept = purge_deleted(deleted_before, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(str(works) + ' units, ' + str(loans) + ' loans and ' + str(authors) +
+                                             ' orphaned authors purged.'))
+        if kept:
+            self.stdout.write(self.style.WARNING(str(kept) + ' deleted units have issued copies and are kept '
+                                                             'until they are returned.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounting import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds catalog search index from Article, ScienceBook and FictionBook tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        search.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from accounting import bibliography, stats
+
+
+class Command(BaseCommand):
+    help = ('Recomputes work, daily and user loan statistics from LibraryUnit and UnitStatus tables '
+            'and author bibliography summaries from the works.')
+
+    def handle(self, *args, **options):
+        stats.rebuild_stats()
+        bibliography.rebuild_bibliographies()
+        self.stdout.write(self.style.SUCCESS('Statistics rebuilt.'))
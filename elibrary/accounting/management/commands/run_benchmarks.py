@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, \
+    teardown_test_environment
+
+from accounting.benchmarks.concurrency import compare_servers
+from accounting.benchmarks.data import CatalogGenerator
+from accounting.benchmarks.rendering import compare_rendering
+from accounting.benchmarks.runner import run_benchmarks, compare, load_results, save_results
+from accounting.benchmarks.scenarios import ALL_SCENARIOS
+from accounting.benchmarks.writers import compare_sqlite_profiles
+
+
+class Command(BaseCommand):
+    help = ('Generates synthetic catalog in a throwaway test database and measures p50/p95 latency '
+            'and queries of the accounting views. Results can be compared with a saved baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--units', type=int, default=1000, help='Units per type.')
+        parser.add_argument('--authors-per-unit', type=int, default=3)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--scenario', action='append', choices=[scenario.name for scenario in ALL_SCENARIOS],
+                            help='Run only this scenario, can be repeated.')
+        parser.add_argument('--output', help='Save results JSON to this file.')
+        parser.add_argument('--baseline', help='Compare with the results JSON saved before.')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Allowed p95 growth, 0.2 is 20%%.')
+        parser.add_argument('--concurrency', type=int, default=0,
+                            help='Also run read views load with this number of concurrent clients '
+                                 'through WSGI and ASGI handlers.')
+        parser.add_argument('--requests', type=int, default=300, help='Requests of the WSGI/ASGI load run.')
+        parser.add_argument('--asgi-threads', type=int, help='View threads of ASGI run, ASGI_THREADS by default.')
+        parser.add_argument('--writers', type=int, default=0,
+                            help='Also compare default and tuned SQLite settings with this number of parallel '
+                                 'writers.')
+        parser.add_argument('--readers', type=int, default=2, help='Readers running together with the writers.')
+        parser.add_argument('--writer-transactions', type=int, default=100, help='Transactions per writer.')
+        parser.add_argument('--render-rows', type=int, default=0,
+                            help='Also measure rows/second of the catalog table rendering with pages of this size: '
+                                 'legacy template, cold and warm row fragments.')
+
+    def handle(self, *args, **options):
+        generator = CatalogGenerator(authors=options['authors'], units_per_type=options['units'],
+                                     authors_per_unit=options['authors_per_unit'], users=options['users'],
+                                     seed=options['seed'])
+        if options['iterations'] > generator.units_per_type:
+            raise CommandError('--iterations must not be greater than --units.')
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            generator.generate()
+            results = run_benchmarks(generator, iterations=options['iterations'],
+                                     scenario_names=options['scenario'])
+            if options['concurrency']:
+                results['servers'] = compare_servers(generator, requests=options['requests'],
+                                                     concurrency=options['concurrency'],
+                                                     threads=options['asgi_threads'])
+            if options['writers']:
+                results['sqlite_writers'] = compare_sqlite_profiles(writers=options['writers'],
+                                                                    readers=options['readers'],
+                                                                    transactions=options['writer_transactions'])
+            if options['render_rows']:
+                results['rendering'] = compare_rendering(page_size=options['render_rows'],
+                                                         iterations=options['iterations'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        for name, result in results['scenarios'].items():
+            self.stdout.write('{:<10} p50 {:>9.3f} ms  p95 {:>9.3f} ms  queries {}'.format(
+                name, result['p50_ms'], result['p95_ms'], result['queries']))
+        for name, result in results.get('servers', {}).items():
+            self.stdout.write('{:<10} {:>8.1f} req/s  p50 {:>9.3f} ms  p95 {:>9.3f} ms  errors {}'.format(
+                name, result['throughput_rps'], result['p50_ms'], result['p95_ms'], result['errors']))
+        for name, result in results.get('sqlite_writers', {}).items():
+            self.stdout.write('sqlite {:<8} {:>8.1f} tx/s  p95 {} ms  committed {}  errors {}'.format(
+                name, result['throughput_tps'], result['p95_ms'], result['committed'], result['errors']))
+        for name, result in results.get('rendering', {}).items():
+            self.stdout.write('render {:<8} {:>10.1f} rows/s  p50 {:>9.3f} ms  p95 {:>9.3f} ms'.format(
+                name, result['rows_per_second'], result['p50_ms'], result['p95_ms']))
+        if options['output']:
+            save_results(results, options['output'])
+        if options['baseline']:
+            regressions = compare(results, load_results(options['baseline']), options['threshold'])
+            if regressions:
+                raise CommandError('Regressions against baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline.'))
@@ -0,0 +1,36 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from accounting.mail_outbox import send_batch
+
+
+def worker_batch(batch_size):
+    try:
+        return send_batch(batch_size)
+    finally:
+        connection.close()    # every pool thread has its own DB connection
+
+
+class Command(BaseCommand):
+    help = 'Sends queued emails from the mail outbox: every worker thread sends batches over one SMTP connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when outbox is empty.')
+        parser.add_argument('--once', action='store_true', help='Send all due messages and exit (for cron).')
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                batches = [pool.submit(worker_batch, options['batch_size']) for _ in range(options['workers'])]
+                sent = sum(batch.result() for batch in batches)
+                if sent:
+                    self.stdout.write(str(sent) + ' messages sent.')
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['interval'])
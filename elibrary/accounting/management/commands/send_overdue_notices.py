@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from accounting.overdue_notices import send_overdue_notices
+
+
+class Command(BaseCommand):
+    help = 'Queues one overdue notice per user into the mail outbox, already notified loans are skipped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        users, loans, skipped = send_overdue_notices(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS('Notices queued for ' + str(users) + ' users (' + str(loans) +
+                                             ' loans).'))
+        if skipped:
+            self.stdout.write(self.style.WARNING(str(skipped) + ' overdue loans of users without email are '
+                                                                'not notified.'))
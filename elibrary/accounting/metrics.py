@@ -0,0 +1,95 @@
+import contextvars
+import math
+import time
+from bisect import bisect_left
+from threading import Lock
+
+# collector of the current request, template backend adds render time to it
+current_request_metrics = contextvars.ContextVar('current_request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        """connection.execute_wrapper() function: counts queries and their time."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+
+
+class Histogram:
+    """Histogram with one series per view name, exposed in Prometheus text format."""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._series = {}    # view name -> [count per bucket (not cumulative), sum of values]
+        self._lock = Lock()
+
+    def observe(self, view_name, value):
+        with self._lock:
+            series = self._series.get(view_name)
+            if series is None:
+                series = self._series[view_name] = [[0] * len(self.buckets), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def expose(self):
+        lines = ['# HELP ' + self.name + ' ' + self.documentation,
+                 '# TYPE ' + self.name + ' histogram']
+        with self._lock:
+            series_items = sorted((view_name, list(counts), total) for view_name, (counts, total)
+                                  in self._series.items())
+        for view_name, counts, total in series_items:
+            label = 'view="' + view_name.replace('\\', '\\\\').replace('"', '\\"') + '"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                bound_text = '+Inf' if bound == math.inf else repr(float(bound))
+                lines.append(self.name + '_bucket{' + label + ',le="' + bound_text + '"} ' + str(cumulative))
+            lines.append(self.name + '_sum{' + label + '} ' + repr(total))
+            lines.append(self.name + '_count{' + label + '} ' + str(cumulative))
+        return '\n'.join(lines) + '\n'
+
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_TIME = Histogram('elibrary_request_duration_seconds', 'Request wall time.', TIME_BUCKETS)
+DB_QUERIES = Histogram('elibrary_request_db_queries', 'DB queries per request.',
+                       (1, 2, 5, 10, 20, 50, 100, 200, 500))
+DB_TIME = Histogram('elibrary_request_db_duration_seconds', 'Total SQL time per request.', TIME_BUCKETS)
+TEMPLATE_TIME = Histogram('elibrary_request_template_duration_seconds', 'Template render time per request.',
+                          TIME_BUCKETS)
+RESPONSE_SIZE = Histogram('elibrary_response_size_bytes', 'Response body size (not streaming responses).',
+                          (1000, 5000, 10000, 50000, 100000, 500000, 1000000, 5000000))
+ALL_HISTOGRAMS = (REQUEST_TIME, DB_QUERIES, DB_TIME, TEMPLATE_TIME, RESPONSE_SIZE)
+
+
+def record_request(view_name, wall_time, request_metrics, response_size=None):
+    REQUEST_TIME.observe(view_name, wall_time)
+    DB_QUERIES.observe(view_name, request_metrics.queries)
+    DB_TIME.observe(view_name, request_metrics.sql_time)
+    TEMPLATE_TIME.observe(view_name, request_metrics.template_time)
+    if response_size is not None:
+        RESPONSE_SIZE.observe(view_name, response_size)
+
+
+def expose_all():
+    return ''.join(histogram.expose() for histogram in ALL_HISTOGRAMS)
+
+
+def reset_all():
+    for histogram in ALL_HISTOGRAMS:
+        histogram.reset()
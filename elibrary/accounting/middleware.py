@@ -0,0 +1,41 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .metrics import RequestMetrics, current_request_metrics, record_request
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures wall time, DB queries number and time, template render time and response size of every request.
+    Values are collected into histograms by view name (see metrics view) and too "chatty" requests are logged.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = RequestMetrics()
+        token = current_request_metrics.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(request_metrics.sql_wrapper):
+                response = self.get_response(request)
+        finally:
+            current_request_metrics.reset(token)
+        wall_time = time.perf_counter() - start
+
+        view_name = request.resolver_match.view_name if request.resolver_match else 'unresolved'
+        # body of the streaming response isn't produced yet, its size is unknown
+        response_size = None if response.streaming else len(response.content)
+        record_request(view_name, wall_time, request_metrics, response_size)
+
+        query_budget = getattr(settings, 'REQUEST_QUERY_BUDGET', None)
+        if query_budget is not None and request_metrics.queries > query_budget:
+            logger.warning('%s %s (%s): %s DB queries, budget is %s',
+                           request.method, request.path, view_name, request_metrics.queries, query_budget)
+        return response
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+SEARCH_TABLE = 'accounting_search_index'
+ROWID_STEP = 4
+UNIT_TYPE_CODES = (('Article', 0), ('ScienceBook', 1), ('FictionBook', 2))
+
+
+def fts5_supported(cursor):
+    try:
+        cursor.execute('CREATE VIRTUAL TABLE temp.accounting_fts5_check USING fts5(content)')
+        cursor.execute('DROP TABLE temp.accounting_fts5_check')
+    except Exception:
+        return False
+    return True
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return    # in-memory index is used for the other databases
+    with connection.cursor() as cursor:
+        if not fts5_supported(cursor):
+            return
+        cursor.execute("CREATE VIRTUAL TABLE " + SEARCH_TABLE + " USING fts5("
+                       "title, authors, source, identifier, "
+                       "tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+        for model_name, type_code in UNIT_TYPE_CODES:
+            unit_model = apps.get_model('accounting', model_name)
+            for unit in unit_model.objects.prefetch_related('work_author'):
+                authors = ' '.join(author.author_name + ' ' + author.author_surname
+                                   for author in unit.work_author.all())
+                cursor.execute('INSERT INTO ' + SEARCH_TABLE + ' (rowid, title, authors, source, identifier) '
+                               'VALUES (%s, %s, %s, %s, %s)',
+                               [unit.pk * ROWID_STEP + type_code, unit.title, authors,
+                                getattr(unit, 'journal', '') or getattr(unit, 'publisher', ''),
+                                getattr(unit, 'doi', '') or getattr(unit, 'isbn', '')])
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS ' + SEARCH_TABLE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0005_auto_20200604_1639'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
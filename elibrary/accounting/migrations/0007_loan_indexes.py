@@ -0,0 +1,26 @@
+# Generated by Django 3.0.12 on 2026-10-18 13:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='unitstatus',
+            name='date_return_actual',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='unitstatus',
+            index=models.Index(fields=['library_user', 'date_return_actual'], name='unit_status_user_return_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unitstatus',
+            index=models.Index(fields=['date_return_nominal'], name='unit_status_nominal_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.0.12 on 2026-10-18 13:38
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    # the same city/street could be added several times before names became unique:
+    # addresses are moved to the first row with the name and the other rows are deleted
+    address_model = apps.get_model('accounting', 'LibraryUserAddress')
+    for model_name, field_name in (('CitiesList', 'city_name'), ('StreetsList', 'street_name')):
+        model = apps.get_model('accounting', model_name)
+        duplicates = model.objects.values(field_name).annotate(rows=Count('pk'), first_id=Min('pk'))\
+            .filter(rows__gt=1)
+        for duplicate in duplicates:
+            extra_rows = model.objects.filter(**{field_name: duplicate[field_name]}).exclude(pk=duplicate['first_id'])
+            address_model.objects.filter(**{field_name + '__in': extra_rows}).update(**{field_name: duplicate['first_id']})
+            extra_rows.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0008_mail_outbox'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='citieslist',
+            name='city_name',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='streetslist',
+            name='street_name',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+    ]
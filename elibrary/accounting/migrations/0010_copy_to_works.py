@@ -0,0 +1,117 @@
+from django.core.management.color import no_style
+from django.db import migrations
+from django.db.migrations.exceptions import IrreversibleError
+from django.db.models import Count
+
+BATCH_SIZE = 1000
+# model name, Work.work_type
+EXTENSIONS = (('Article', 'article'), ('ScienceBook', 'science_book'), ('FictionBook', 'fiction_book'))
+
+
+def copy_to_works(apps, schema_editor):
+    # title, publishing year and authors of every unit are moved to the new Work row,
+    # unit keeps its id, so urls and search index entries stay the same
+    work_model = apps.get_model('accounting', 'Work')
+    work_through = work_model.work_author.through
+    work_ids = {}    # (model name, unit id) -> work id
+    next_work_id = 1
+    for model_name, work_type in EXTENSIONS:
+        unit_model = apps.get_model('accounting', model_name)
+        unit_through = unit_model.work_author.through
+        unit_column = unit_model._meta.model_name + '_id'
+        last_id = 0
+        while True:
+            units = list(unit_model.objects.filter(pk__gt=last_id).order_by('pk')[:BATCH_SIZE])
+            if not units:
+                break
+            works = []
+            for unit in units:
+                works.append(work_model(pk=next_work_id, work_type=work_type, title=unit.title,
+                                        publishing_year=getattr(unit, 'publishing_year', None)))
+                unit.work_id = work_ids[(model_name, unit.pk)] = next_work_id
+                next_work_id += 1
+            work_model.objects.bulk_create(works)
+            unit_model.objects.bulk_update(units, ['work'])
+            links = unit_through.objects.filter(**{unit_column + '__gte': units[0].pk,
+                                                   unit_column + '__lte': units[-1].pk})\
+                .values_list(unit_column, 'author_id')
+            work_through.objects.bulk_create([work_through(work_id=work_ids[(model_name, unit_id)], author_id=author_id)
+                                              for unit_id, author_id in links])
+            last_id = units[-1].pk
+
+    # old library unit was a copy of an article, a science book and a fiction book at once:
+    # it stays the copy of the article (with its loans), the books get their own copies
+    library_unit_model = apps.get_model('accounting', 'LibraryUnit')
+    library_units = list(library_unit_model.objects.all())
+    new_copies = []
+    for library_unit in library_units:
+        copy_work_ids = [work_ids[(model_name, getattr(library_unit, work_type + '_unit_type_id'))]
+                         for model_name, work_type in EXTENSIONS
+                         if getattr(library_unit, work_type + '_unit_type_id') is not None]
+        library_unit.work_id = copy_work_ids[0]
+        new_copies.extend(library_unit_model(work_id=work_id) for work_id in copy_work_ids[1:])
+    library_unit_model.objects.bulk_update(library_units, ['work'], batch_size=BATCH_SIZE)
+    library_unit_model.objects.bulk_create(new_copies, batch_size=BATCH_SIZE)
+
+    # work ids were given explicitly, PostgreSQL sequence has to be moved after them
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [work_model]):
+            cursor.execute(sql)
+
+
+def copy_from_works(apps, schema_editor):
+    # title, publishing year and authors go back to the units, every copy is linked to the unit of its work
+    # (the old link is one to one, so a work can have one copy only);
+    # a copy of three units at once can't be rebuilt, so copies left without the unit of some type
+    # have to be removed before 0010_work is reversed
+    work_model = apps.get_model('accounting', 'Work')
+    work_through = work_model.work_author.through
+    library_unit_model = apps.get_model('accounting', 'LibraryUnit')
+    if library_unit_model.objects.values('work').annotate(copies=Count('pk')).filter(copies__gt=1).exists():
+        raise IrreversibleError('Works with several copies can not be moved back to units, '
+                                'old library unit is the only copy of its article and books.')
+    for model_name, work_type in EXTENSIONS:
+        unit_model = apps.get_model('accounting', model_name)
+        unit_through = unit_model.work_author.through
+        unit_column = unit_model._meta.model_name + '_id'
+        fields = ['title'] + (['publishing_year'] if model_name != 'FictionBook' else [])
+        last_id = 0
+        while True:
+            units = list(unit_model.objects.filter(pk__gt=last_id).select_related('work').order_by('pk')[:BATCH_SIZE])
+            if not units:
+                break
+            unit_ids = {unit.work_id: unit.pk for unit in units}
+            for unit in units:
+                for field in fields:
+                    if getattr(unit.work, field) is not None:    # new works can be without year
+                        setattr(unit, field, getattr(unit.work, field))
+            unit_model.objects.bulk_update(units, fields)
+            links = work_through.objects.filter(work_id__in=unit_ids).values_list('work_id', 'author_id')
+            unit_through.objects.bulk_create([unit_through(**{unit_column: unit_ids[work_id], 'author_id': author_id})
+                                              for work_id, author_id in links])
+            last_id = units[-1].pk
+
+        unit_field = work_type + '_unit_type'
+        unit_ids = dict(unit_model.objects.values_list('work_id', 'pk'))
+        copies = list(library_unit_model.objects.filter(work__work_type=work_type))
+        for library_unit in copies:
+            setattr(library_unit, unit_field + '_id', unit_ids[library_unit.work_id])
+        library_unit_model.objects.bulk_update(copies, [unit_field], batch_size=BATCH_SIZE)
+
+    # works are created again by copy_to_works, links are cleared first, so that deletion doesn't cascade to units
+    for model_name, work_type in EXTENSIONS:
+        apps.get_model('accounting', model_name).objects.update(work=None)
+    library_unit_model.objects.update(work=None)
+    work_model.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0010_work'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_to_works, copy_from_works),
+    ]
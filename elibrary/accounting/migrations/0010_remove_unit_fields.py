@@ -0,0 +1,96 @@
+import datetime
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0010_copy_to_works'),
+    ]
+
+    operations = [
+        # state only: the reverse adds the columns back to the filled tables with these defaults,
+        # 0010_copy_to_works copies the values of the works into them
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(model_name=model_name, name='title', field=models.CharField(default='', max_length=300))
+            for model_name in ('article', 'sciencebook', 'fictionbook')
+        ] + [
+            migrations.AlterField(model_name=model_name, name='publishing_year',
+                                  field=models.DateField(default=datetime.date(1, 1, 1)))
+            for model_name in ('article', 'sciencebook')
+        ]),
+        migrations.RemoveField(
+            model_name='libraryunit',
+            name='article_unit_type',
+        ),
+        migrations.RemoveField(
+            model_name='libraryunit',
+            name='science_book_unit_type',
+        ),
+        migrations.RemoveField(
+            model_name='libraryunit',
+            name='fiction_book_unit_type',
+        ),
+        migrations.RemoveField(
+            model_name='article',
+            name='work_author',
+        ),
+        migrations.RemoveField(
+            model_name='article',
+            name='title',
+        ),
+        migrations.RemoveField(
+            model_name='article',
+            name='publishing_year',
+        ),
+        migrations.RemoveField(
+            model_name='sciencebook',
+            name='work_author',
+        ),
+        migrations.RemoveField(
+            model_name='sciencebook',
+            name='title',
+        ),
+        migrations.RemoveField(
+            model_name='sciencebook',
+            name='publishing_year',
+        ),
+        migrations.RemoveField(
+            model_name='fictionbook',
+            name='work_author',
+        ),
+        migrations.RemoveField(
+            model_name='fictionbook',
+            name='title',
+        ),
+        migrations.AlterField(
+            model_name='article',
+            name='work',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='article', to='accounting.Work'),
+        ),
+        migrations.AlterField(
+            model_name='sciencebook',
+            name='work',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sciencebook', to='accounting.Work'),
+        ),
+        migrations.AlterField(
+            model_name='fictionbook',
+            name='work',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fictionbook', to='accounting.Work'),
+        ),
+        migrations.AlterField(
+            model_name='libraryunit',
+            name='work',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='copies', to='accounting.Work'),
+        ),
+        migrations.AddIndex(
+            model_name='work',
+            index=models.Index(fields=['publishing_year'], name='work_publishing_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='work',
+            index=models.Index(fields=['work_type', 'publishing_year'], name='work_type_year_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Work table and nullable links to it, filled by 0010_copy_to_works; the old columns are dropped by
+# 0010_remove_unit_fields. Three migrations, so that PostgreSQL has no pending foreign key checks
+# of the copied rows when the tables are altered.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0009_unique_address_names'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Work',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('work_type', models.CharField(choices=[('article', 'Article'), ('science_book', 'Science book'), ('fiction_book', 'Fiction book')], max_length=20)),
+                ('title', models.CharField(max_length=300)),
+                ('publishing_year', models.DateField(blank=True, null=True)),
+                ('work_author', models.ManyToManyField(related_name='works', to='accounting.Author')),
+            ],
+            options={
+                'verbose_name_plural': '10. Works',
+            },
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='work',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='article', to='accounting.Work'),
+        ),
+        migrations.AddField(
+            model_name='sciencebook',
+            name='work',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sciencebook', to='accounting.Work'),
+        ),
+        migrations.AddField(
+            model_name='fictionbook',
+            name='work',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fictionbook', to='accounting.Work'),
+        ),
+        migrations.AddField(
+            model_name='libraryunit',
+            name='work',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='copies', to='accounting.Work'),
+        ),
+        migrations.AlterField(
+            model_name='libraryunit',
+            name='article_unit_type',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, to='accounting.Article'),
+        ),
+        migrations.AlterField(
+            model_name='libraryunit',
+            name='science_book_unit_type',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, to='accounting.ScienceBook'),
+        ),
+        migrations.AlterField(
+            model_name='libraryunit',
+            name='fiction_book_unit_type',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, to='accounting.FictionBook'),
+        ),
+    ]
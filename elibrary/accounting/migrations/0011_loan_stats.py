@@ -0,0 +1,89 @@
+# Generated by Django 3.0.12 on 2026-10-18 13:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+
+def fill_stats(apps, schema_editor):
+    # counters of the existing copies and loans, later they are maintained by accounting.stats
+    library_unit_model = apps.get_model('accounting', 'LibraryUnit')
+    unit_status_model = apps.get_model('accounting', 'UnitStatus')
+    work_stats_model = apps.get_model('accounting', 'WorkStats')
+    daily_stats_model = apps.get_model('accounting', 'DailyLoanStats')
+    user_stats_model = apps.get_model('accounting', 'UserLoanStats')
+
+    work_stats = {}
+    for values in library_unit_model.objects.order_by().values('work')\
+            .annotate(total=Count('pk'), available=Count('pk', filter=Q(unit_available=True))):
+        work_stats[values['work']] = work_stats_model(work_id=values['work'], copies_total=values['total'],
+                                                      copies_available=values['available'])
+    for values in unit_status_model.objects.order_by().values('library_unit__work').annotate(loans=Count('pk')):
+        work_stats[values['library_unit__work']].loans_total = values['loans']
+    work_stats_model.objects.bulk_create(work_stats.values(), batch_size=1000)
+
+    daily_stats = {}
+    for values in unit_status_model.objects.annotate(day=TruncDate('date_issue')).order_by().values('day')\
+            .annotate(loans=Count('pk')):
+        daily_stats[values['day']] = daily_stats_model(day=values['day'], issued=values['loans'])
+    for values in unit_status_model.objects.filter(date_return_actual__isnull=False)\
+            .annotate(day=TruncDate('date_return_actual')).order_by().values('day').annotate(loans=Count('pk')):
+        daily_stats.setdefault(values['day'], daily_stats_model(day=values['day'])).returned = values['loans']
+    daily_stats_model.objects.bulk_create(daily_stats.values(), batch_size=1000)
+
+    user_stats_model.objects.bulk_create([
+        user_stats_model(library_user_id=values['library_user'], active_loans=values['active'],
+                         loans_total=values['loans'])
+        for values in unit_status_model.objects.order_by().values('library_user')
+        .annotate(loans=Count('pk'), active=Count('pk', filter=Q(date_return_actual__isnull=True)))],
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounting', '0010_remove_unit_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyLoanStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('issued', models.IntegerField(default=0)),
+                ('returned', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WorkStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('copies_total', models.IntegerField(default=0)),
+                ('copies_available', models.IntegerField(default=0)),
+                ('loans_total', models.IntegerField(default=0)),
+                ('work', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='accounting.Work')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserLoanStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('active_loans', models.IntegerField(default=0)),
+                ('loans_total', models.IntegerField(default=0)),
+                ('library_user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='loan_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='workstats',
+            index=models.Index(fields=['loans_total'], name='work_stats_loans_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userloanstats',
+            index=models.Index(fields=['active_loans'], name='user_stats_active_idx'),
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
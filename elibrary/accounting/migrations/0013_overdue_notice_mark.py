@@ -0,0 +1,18 @@
+# Generated by Django 3.0.12 on 2026-10-18 13:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0012_holds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='unitstatus',
+            name='last_notified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
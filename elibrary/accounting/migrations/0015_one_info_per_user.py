@@ -0,0 +1,41 @@
+# Generated by Django 3.0.12 on 2026-10-18 14:01
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+import django.db.models.deletion
+
+
+def merge_duplicate_infos(apps, schema_editor):
+    # the first info row of the user is kept (it was the one shown by the profile pages),
+    # its address is taken from the other rows if it has none, then the other rows are deleted
+    info_model = apps.get_model('accounting', 'LibraryUserInfo')
+    address_model = apps.get_model('accounting', 'LibraryUserAddress')
+    duplicates = info_model.objects.values('library_user').annotate(rows=Count('pk'), first_id=Min('pk'))\
+        .filter(rows__gt=1)
+    for duplicate in duplicates:
+        extra_ids = list(info_model.objects.filter(library_user=duplicate['library_user'])
+                         .exclude(pk=duplicate['first_id']).order_by('pk').values_list('pk', flat=True))
+        if not address_model.objects.filter(library_user_id=duplicate['first_id']).exists():
+            address = address_model.objects.filter(library_user_id__in=extra_ids).order_by('library_user_id').first()
+            if address is not None:
+                address.library_user_id = duplicate['first_id']
+                address.save(update_fields=['library_user'])
+        info_model.objects.filter(pk__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounting', '0014_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_infos, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='libraryuserinfo',
+            name='library_user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.0.12 on 2026-10-18 14:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0015_one_info_per_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='work',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='work',
+            index=models.Index(condition=models.Q(deleted_at__isnull=False), fields=['deleted_at'], name='work_deleted_idx'),
+        ),
+    ]
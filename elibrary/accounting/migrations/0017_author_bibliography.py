@@ -0,0 +1,46 @@
+# Generated by Django 3.0.12 on 2026-10-18 14:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Max, Q
+
+TYPE_FIELDS = {'article': 'articles', 'science_book': 'science_books', 'fiction_book': 'fiction_books'}
+
+
+def fill_bibliographies(apps, schema_editor):
+    # summaries of the existing authors, later they are maintained by accounting.bibliography
+    author_model = apps.get_model('accounting', 'Author')
+    work_model = apps.get_model('accounting', 'Work')
+    bibliography_model = apps.get_model('accounting', 'AuthorBibliography')
+    type_counts = {field: Count('pk', filter=Q(work_type=work_type)) for work_type, field in TYPE_FIELDS.items()}
+    summaries = {row.pop('work_author'): row for row in
+                 work_model.objects.filter(deleted_at__isnull=True, work_author__isnull=False).order_by()
+                 .values('work_author').annotate(works_total=Count('pk'), latest_year=Max('publishing_year'),
+                                                 **type_counts)}
+    bibliography_model.objects.bulk_create(
+        [bibliography_model(author_id=author_id, **summaries.get(author_id, {}))
+         for author_id in author_model.objects.values_list('pk', flat=True).iterator()],
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0016_work_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorBibliography',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('articles', models.IntegerField(default=0)),
+                ('science_books', models.IntegerField(default=0)),
+                ('fiction_books', models.IntegerField(default=0)),
+                ('works_total', models.IntegerField(default=0)),
+                ('latest_year', models.DateField(blank=True, null=True)),
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='bibliography', to='accounting.Author')),
+            ],
+        ),
+        migrations.RunPython(fill_bibliographies, migrations.RunPython.noop),
+    ]
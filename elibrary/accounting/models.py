@@ -1,11 +1,13 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class Author(models.Model):
     # one author can write several works, and one work can be written by several authors -- ManyToMany relationship
     author_name = models.CharField(max_length=100)
     author_surname = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)    # set by save() and accounting.authors bulk_update
 
     def __str__(self):
         name_surname = str(self.author_name) + " " + str(self.author_surname)
@@ -13,59 +15,171 @@ class Author(models.Model):
 
     class Meta:
         verbose_name_plural = '1. Authors'  # number is used for custom ordering in the admin page
+        indexes = [
+            # admin ordering and prefix search (also autocomplete of the work authors)
+            models.Index(fields=['author_surname', 'author_name'], name='author_surname_idx'),
+            models.Index(fields=['author_name'], name='author_name_idx'),
+        ]
 
 
-class FictionBook(models.Model):
-    work_author = models.ManyToManyField(Author,
-                                         related_name='fiction_book_authors')  # ???
+class WorkQuerySet(models.QuerySet):
+    def by_author(self, author):
+        return self.filter(work_author=author)
+
+    def recent(self):
+        # works without year go last on every DB backend
+        return self.order_by(models.F('publishing_year').desc(nulls_last=True), '-pk')
+
+
+class WorkManager(models.Manager.from_queryset(WorkQuerySet)):
+    # soft deleted works (tombstones) are hidden, rows are removed later by 'purge_deleted' command
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class Work(models.Model):
+    # common part of all library works (articles, science and fiction books): one table and one query
+    # for "all works of the author", "recent works" etc., type specific fields are in the extension tables
+    ARTICLE = 'article'
+    SCIENCE_BOOK = 'science_book'
+    FICTION_BOOK = 'fiction_book'
+    WORK_TYPE_CHOICES = [(ARTICLE, 'Article'), (SCIENCE_BOOK, 'Science book'), (FICTION_BOOK, 'Fiction book')]
+
+    work_type = models.CharField(max_length=20, choices=WORK_TYPE_CHOICES)
+    work_author = models.ManyToManyField(Author, related_name='works')
     title = models.CharField(max_length=300)
+    publishing_year = models.DateField(null=True, blank=True)    # fiction books have no publishing year
+    deleted_at = models.DateTimeField(null=True, blank=True)    # tombstone, see accounting.deletion
+
+    objects = WorkManager()
+    all_objects = WorkQuerySet.as_manager()    # with the soft deleted works
+
+    def __str__(self):
+        return self.title
+
+    @property
+    def extension(self):
+        """Type specific part of the work: Article, ScienceBook or FictionBook instance."""
+        return getattr(self, WORK_EXTENSION_ACCESSORS[self.work_type])
+
+    class Meta:
+        verbose_name_plural = '10. Works'
+        indexes = [
+            models.Index(fields=['title'], name='work_title_idx'),    # admin ordering and prefix search
+            models.Index(fields=['publishing_year'], name='work_publishing_year_idx'),
+            models.Index(fields=['work_type', 'publishing_year'], name='work_type_year_idx'),
+            # purge reads the oldest tombstones, partial index keeps only them
+            models.Index(fields=['deleted_at'], name='work_deleted_idx', condition=models.Q(deleted_at__isnull=False)),
+        ]
+
+
+class WorkExtensionManager(models.Manager):
+    # title, publishing year and authors are stored in the Work table, so it is always joined,
+    # extensions of the soft deleted works are hidden
+    def get_queryset(self):
+        return super().get_queryset().select_related('work').filter(work__deleted_at__isnull=True)
+
+
+class WorkExtension(models.Model):
+    """
+    Type specific part of the Work. Common fields are available as the properties (also as the constructor
+    arguments), they are saved to the Work table by save(). Use 'work__title' etc. in the queryset lookups.
+    """
+    work = models.OneToOneField(Work, on_delete=models.CASCADE, related_name='%(class)s')
+    work_type = None    # Work.work_type value, set in subclasses
+    work_fields = ('title', 'publishing_year')    # Work fields used by this type (forms, import/export)
+    # moved by save() and by signals when the work or its authors change (ETag of the catalog pages)
+    updated_at = models.DateTimeField(auto_now=True)
+    _work_changed = False
+
+    objects = WorkExtensionManager()
+
+    class Meta:
+        abstract = True
+
+    def get_work(self):
+        try:
+            return self.work
+        except Work.DoesNotExist:
+            self.work = Work(work_type=self.work_type)    # saved together with the extension
+            return self.work
+
+    def save(self, *args, **kwargs):
+        work = self.get_work()
+        if work.pk is None or self._work_changed:
+            work._saved_with_extension = True    # signals handle it as the extension change
+            work.save()
+            work._saved_with_extension = False
+            self.work = work
+            self._work_changed = False
+        super().save(*args, **kwargs)
+
+    @property
+    def title(self):
+        return self.get_work().title
+
+    @title.setter
+    def title(self, value):
+        self.get_work().title = value
+        self._work_changed = True
+
+    @property
+    def publishing_year(self):
+        return self.get_work().publishing_year
+
+    @publishing_year.setter
+    def publishing_year(self, value):
+        self.get_work().publishing_year = value
+        self._work_changed = True
+
+    @property
+    def work_author(self):
+        return self.get_work().work_author
 
     def __str__(self):
         return self.title
 
+
+class FictionBook(WorkExtension):
+    work_type = Work.FICTION_BOOK
+    work_fields = ('title',)
+
     class Meta:
         verbose_name_plural = '2. Fiction books'
 
 
-class ScienceBook(models.Model):
-    work_author = models.ManyToManyField(Author,
-                                         related_name='science_book_authors')  # ???
-    title = models.CharField(max_length=300)
+class ScienceBook(WorkExtension):
+    work_type = Work.SCIENCE_BOOK
     publisher = models.CharField(max_length=200)
     edition = models.PositiveSmallIntegerField(default=1)
-    publishing_year = models.DateField(auto_now=False, auto_now_add=False)
     isbn = models.CharField(max_length=200)
 
-    def __str__(self):
-        return self.title
-
     class Meta:
         verbose_name_plural = '3. Science books'
 
 
-class Article(models.Model):
-    work_author = models.ManyToManyField(Author,
-                                         related_name='article_authors')  # ???
-    title = models.CharField(max_length=300)
+class Article(WorkExtension):
+    work_type = Work.ARTICLE
     journal = models.CharField(max_length=300)
     impact_factor = models.PositiveSmallIntegerField(default=1)
     volume = models.PositiveSmallIntegerField(default=1)
     article_number = models.PositiveSmallIntegerField(default=1)
     pages = models.CharField(max_length=20)  # CharField because of range: "aaa-bbb" pages
-    publishing_year = models.DateField(auto_now=False, auto_now_add=False)
     doi = models.CharField(max_length=200)
 
-    def __str__(self):
-        return self.title
-
     class Meta:
         verbose_name_plural = '4. Articles'
 
 
+# Work.work_type -> extension model and its reverse OneToOne accessor on Work
+WORK_EXTENSIONS = {Work.ARTICLE: Article, Work.SCIENCE_BOOK: ScienceBook, Work.FICTION_BOOK: FictionBook}
+WORK_EXTENSION_ACCESSORS = {work_type: extension_model._meta.model_name
+                            for work_type, extension_model in WORK_EXTENSIONS.items()}
+
+
 class LibraryUnit(models.Model):
-    fiction_book_unit_type = models.OneToOneField(FictionBook, on_delete=models.CASCADE)
-    science_book_unit_type = models.OneToOneField(ScienceBook, on_delete=models.CASCADE)
-    article_unit_type = models.OneToOneField(Article, on_delete=models.CASCADE)
+    # one physical copy of the work
+    work = models.ForeignKey(Work, on_delete=models.CASCADE, related_name='copies')
     unit_available = models.BooleanField(default=True)
 
 
@@ -74,12 +188,104 @@ class UnitStatus(models.Model):
     library_unit = models.ForeignKey(LibraryUnit, on_delete=models.CASCADE)
     date_issue = models.DateTimeField()
     date_return_nominal = models.DateTimeField()
-    date_return_actual = models.DateTimeField()
+    date_return_actual = models.DateTimeField(null=True, blank=True)    # empty while unit is not returned
     # two different "date return" to check if user late in library unit return
+    # time of the last overdue notice, notice is sent again only after the loan renewal and new overdue
+    last_notified_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # user current loans: library_user = X and date_return_actual is null
+            models.Index(fields=['library_user', 'date_return_actual'], name='unit_status_user_return_idx'),
+            # overdue loans: date_return_nominal < now
+            models.Index(fields=['date_return_nominal'], name='unit_status_nominal_idx'),
+        ]
+
+
+class Hold(models.Model):
+    # reservation of a work: returned copy is assigned to the first waiting hold
+    # (by priority class, then by the time of the request) and kept for pickup until expires_at
+    STATUS_WAITING = 'waiting'
+    STATUS_READY = 'ready'            # copy is assigned and waits for the patron
+    STATUS_FULFILLED = 'fulfilled'    # copy is issued to the patron
+    STATUS_EXPIRED = 'expired'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = [(STATUS_WAITING, 'Waiting'), (STATUS_READY, 'Ready for pickup'), (STATUS_FULFILLED, 'Fulfilled'),
+                      (STATUS_EXPIRED, 'Expired'), (STATUS_CANCELLED, 'Cancelled')]
+    ACTIVE_STATUSES = (STATUS_WAITING, STATUS_READY)
+    PRIORITY_HIGH = 0      # course reserves, staff requests
+    PRIORITY_NORMAL = 1
+    PRIORITY_CHOICES = [(PRIORITY_HIGH, 'High'), (PRIORITY_NORMAL, 'Normal')]
+
+    work = models.ForeignKey(Work, on_delete=models.CASCADE, related_name='holds')
+    library_user = models.ForeignKey(User, on_delete=models.CASCADE)
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=PRIORITY_NORMAL)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_WAITING)
+    created_at = models.DateTimeField(default=timezone.now)
+    library_unit = models.ForeignKey(LibraryUnit, null=True, blank=True, on_delete=models.SET_NULL)
+    ready_at = models.DateTimeField(null=True, blank=True)
+    # end of the pickup period for the ready hold, end of the waiting period for the waiting one
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return str(self.library_user) + ' -> ' + str(self.work)
+
+    class Meta:
+        verbose_name_plural = '11. Holds'
+        indexes = [
+            # head of the work queue: work_id = X and status = 'waiting' order by priority, created_at
+            models.Index(fields=['work', 'status', 'priority', 'created_at'], name='hold_queue_idx'),
+            # expiry sweep: status = X and expires_at < now
+            models.Index(fields=['status', 'expires_at'], name='hold_expiry_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['work', 'library_user'], condition=models.Q(status__in=['waiting', 'ready']),
+                                    name='hold_active_unique'),
+        ]
+
+
+class WorkStats(models.Model):
+    # summary counters maintained by accounting.stats in the loan transactions, recomputed by 'rebuild_stats'
+    work = models.OneToOneField(Work, on_delete=models.CASCADE, related_name='stats')
+    copies_total = models.IntegerField(default=0)
+    copies_available = models.IntegerField(default=0)
+    loans_total = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['loans_total'], name='work_stats_loans_idx'),    # most borrowed works
+        ]
+
+
+class AuthorBibliography(models.Model):
+    # per-author summary of the not deleted works, maintained by accounting.bibliography from the signals
+    author = models.OneToOneField(Author, on_delete=models.CASCADE, related_name='bibliography')
+    articles = models.IntegerField(default=0)
+    science_books = models.IntegerField(default=0)
+    fiction_books = models.IntegerField(default=0)
+    works_total = models.IntegerField(default=0)
+    latest_year = models.DateField(null=True, blank=True)    # latest publishing year, fiction books have none
+
+
+class DailyLoanStats(models.Model):
+    day = models.DateField(unique=True)
+    issued = models.IntegerField(default=0)
+    returned = models.IntegerField(default=0)
+
+
+class UserLoanStats(models.Model):
+    library_user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='loan_stats')
+    active_loans = models.IntegerField(default=0)
+    loans_total = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['active_loans'], name='user_stats_active_idx'),
+        ]
 
 
 class LibraryUserInfo(models.Model):
-    library_user = models.ForeignKey(User, on_delete=models.CASCADE)
+    library_user = models.OneToOneField(User, on_delete=models.CASCADE)    # one info row per user
     phone_number = models.PositiveIntegerField()
 
     def __str__(self):
@@ -90,7 +296,7 @@ class LibraryUserInfo(models.Model):
 
 
 class CitiesList(models.Model):
-    city_name = models.CharField(max_length=200)
+    city_name = models.CharField(max_length=200, unique=True)
 
     def __str__(self):
         return self.city_name
@@ -100,7 +306,7 @@ class CitiesList(models.Model):
 
 
 class StreetsList(models.Model):
-    street_name = models.CharField(max_length=200)
+    street_name = models.CharField(max_length=200, unique=True)
 
     def __str__(self):
         return self.street_name
@@ -118,3 +324,33 @@ class LibraryUserAddress(models.Model):
 
     class Meta:
         verbose_name_plural = '6. Library user addresses'
+
+
+class MailOutbox(models.Model):
+    # emails are stored here by the views and sent by 'run_mail_worker' command
+    STATUS_QUEUED = 'queued'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'    # max attempts number is reached
+    STATUS_CHOICES = [(STATUS_QUEUED, 'Queued'), (STATUS_SENT, 'Sent'), (STATUS_FAILED, 'Failed')]
+
+    subject = models.CharField(max_length=300)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)    # empty for DEFAULT_FROM_EMAIL
+    to = models.TextField()    # comma separated addresses
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # the message is not taken by worker before this time: retry backoff or lease of the worker which took it
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.subject + ' -> ' + self.to
+
+    class Meta:
+        verbose_name_plural = '9. Mail outbox'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='mail_outbox_due_idx'),
+        ]
@@ -0,0 +1,66 @@
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.template import loader
+from django.utils import timezone
+
+from .mail_outbox import enqueue_many
+from .models import UnitStatus
+
+NOTICE_SUBJECT = 'Library units return date has passed.'
+
+
+def pending_notices(now):
+    """Overdue loans without notice since their current return date (renewed loan can be notified again)."""
+    return UnitStatus.objects.filter(date_return_actual__isnull=True, date_return_nominal__lt=now)\
+        .filter(Q(last_notified_at__isnull=True) | Q(last_notified_at__lt=F('date_return_nominal')))
+
+
+def user_loan_chunks(now, chunk_size=1000):
+    """
+    Yields lists of (user, loans) pairs. Loans are read in keyset chunks ordered by (user, id), which follows
+    (library_user, date_return_actual) index. Loans of the last user of a chunk are carried to the next chunk,
+    so every user is in one pair. Memory use depends only on chunk size.
+    """
+    loans = pending_notices(now).select_related('library_user', 'library_unit__work').order_by('library_user_id', 'pk')
+    last_user_id = last_id = 0
+    carried = []
+    while True:
+        chunk = list(loans.filter(Q(library_user_id__gt=last_user_id) |
+                                  Q(library_user_id=last_user_id, pk__gt=last_id))[:chunk_size])
+        if not chunk:
+            break
+        last_user_id, last_id = chunk[-1].library_user_id, chunk[-1].pk
+        groups = [list(user_loans) for user_id, user_loans in
+                  groupby(carried + chunk, key=lambda loan: loan.library_user_id)]
+        carried = groups.pop() if len(chunk) == chunk_size else []    # the user can have more loans in next chunk
+        if groups:
+            yield [(user_loans[0].library_user, user_loans) for user_loans in groups]
+    if carried:
+        yield [(carried[0].library_user, carried)]
+
+
+def send_overdue_notices(now=None, chunk_size=1000):
+    """
+    Puts one digest per user with overdue loans into the mail outbox ('run_mail_worker' sends them in batches
+    over one SMTP connection). Digests and notified marks of a chunk are saved in one transaction,
+    so a loan is never notified twice for the same return date. Loans of the users without email
+    aren't marked: they are notified when the user adds the email.
+    Returns (users, loans, skipped loans) numbers.
+    """
+    now = now or timezone.now()
+    template = loader.get_template('overdue_notice_email.html')
+    users = loans_number = skipped = 0
+    for chunk in user_loan_chunks(now, chunk_size):
+        notified = [(user, user_loans) for user, user_loans in chunk if user.email]
+        messages = [(NOTICE_SUBJECT, template.render({'user': user, 'loans': user_loans}), [user.email])
+                    for user, user_loans in notified]
+        loan_ids = [loan.pk for user, user_loans in notified for loan in user_loans]
+        with transaction.atomic():
+            enqueue_many(messages)
+            UnitStatus.objects.filter(pk__in=loan_ids).update(last_notified_at=now)
+        users += len(messages)
+        loans_number += len(loan_ids)
+        skipped += sum(len(user_loans) for user, user_loans in chunk) - len(loan_ids)
+    return users, loans_number, skipped
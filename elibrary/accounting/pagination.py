@@ -0,0 +1,102 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Reads 'page_size' from the query string, falls back to the default for the invalid values."""
+    try:
+        page_size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        page_size = default
+    return min(max(page_size, 1), maximum)
+
+
+def get_cursor(request, parameter='after'):
+    """Reads keyset cursor (last seen primary key) from the query string."""
+    try:
+        cursor = int(request.GET.get(parameter, 0))
+    except (TypeError, ValueError):
+        cursor = 0
+    return max(cursor, 0)
+
+
+def get_page_number(request):
+    """Reads 1-based 'page' number from the query string."""
+    try:
+        page = int(request.GET.get('page', 1))
+    except (TypeError, ValueError):
+        page = 1
+    return max(page, 1)
+
+
+def keyset_page(queryset, after=0, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Seek pagination by primary key: 'WHERE id > after ORDER BY id LIMIT page_size + 1'.
+    Cost of the page doesn't depend on its position in the table (no OFFSET scan).
+    One extra row is fetched only to know if the next page exists.
+    Returns (page items list, next page cursor or None).
+    """
+    rows = list(queryset.filter(pk__gt=after).order_by('pk')[:page_size + 1])
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, rows[-1].pk
+    return rows, None
+
+
+ESTIMATE_THRESHOLD = 10000        # tables with fewer rows are counted exactly
+FILTERED_COUNT_LIMIT = 10000      # filtered results are counted up to this number
+
+
+def table_row_estimate(model, using='default'):
+    """
+    Row number of the model table without COUNT(*): planner statistics on PostgreSQL,
+    the largest primary key (one index seek) on other backends, close to the row count while deletes are rare.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        return int(row[0]) if row else 0    # -1 if the table was never analyzed
+    return model._base_manager.using(using).aggregate(largest=Max('pk'))['largest'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator of the admin changelists on big tables. Full COUNT(*) reads the whole table (or index),
+    so the unfiltered list uses table_row_estimate() and the filtered one is counted only up to
+    FILTERED_COUNT_LIMIT rows (or a bit more than the requested page, so the next page is always reachable):
+    count_is_lower_bound is set then. Small tables are counted exactly. The last pages of the estimate can be empty.
+    'filtered' tells if the user filtered the list: default managers add their own WHERE (deleted_at),
+    so it can't be taken from the query.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, filtered=False,
+                 page_number=1):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.filtered = filtered
+        self.page_number = page_number
+        self.count_is_lower_bound = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):    # list, not a queryset
+            return super().count
+        if not self.filtered:
+            estimate = table_row_estimate(queryset.model, queryset.db)
+            if estimate > ESTIMATE_THRESHOLD:
+                return estimate
+            return queryset.count()
+        limit = max(FILTERED_COUNT_LIMIT, (self.page_number + 1) * self.per_page)
+        # COUNT(*) FROM (SELECT ... LIMIT n): stops after n matching rows
+        count = queryset.order_by().values('pk')[:limit + 1].count()
+        if count > limit:
+            self.count_is_lower_bound = True
+            return limit
+        return count
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+
+from .models import LibraryUserInfo
+
+DEFAULT_TIMEOUT = 60 * 60    # invalidation is done by signals, timeout only limits stale entries lifetime
+
+
+def get_cache():
+    return caches[getattr(settings, 'PROFILE_CACHE_ALIAS', 'default')]
+
+
+def profile_key(user_id):
+    return 'user_profile:' + str(user_id)
+
+
+def load_profile(user):
+    """
+    (user_info, user_address) of the user, None for the missing parts. Info, address, city and street are read
+    by one query with joins and cached per user, so the profile pages usually don't query catalog tables at all.
+    """
+    key = profile_key(user.pk)
+    profile = get_cache().get(key)
+    if profile is not None:
+        return profile
+    user_info = LibraryUserInfo.objects.select_related('libraryuseraddress__city_name',
+                                                       'libraryuseraddress__street_name')\
+        .filter(library_user=user).first()
+    user_address = None
+    if user_info is not None:
+        try:
+            user_address = user_info.libraryuseraddress
+        except ObjectDoesNotExist:
+            pass
+    profile = (user_info, user_address)
+    get_cache().set(key, profile, getattr(settings, 'PROFILE_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+    return profile
+
+
+def invalidate_profile(user_id):
+    key = profile_key(user_id)
+    get_cache().delete(key)
+    # the other request can put old version back before this transaction is committed
+    transaction.on_commit(lambda: get_cache().delete(key))
+
+
+def invalidate_profiles(user_ids):
+    keys = [profile_key(user_id) for user_id in user_ids]
+    get_cache().delete_many(keys)
+    transaction.on_commit(lambda: get_cache().delete_many(keys))
+
+
+def save_changed(instance, changed_fields):
+    """Saves only the changed columns, nothing is written when nothing is changed."""
+    if changed_fields:
+        instance.save(update_fields=changed_fields)
@@ -0,0 +1,288 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from threading import RLock
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Article, ScienceBook, FictionBook
+from .pagination import keyset_page
+
+SEARCH_TABLE = 'accounting_search_index'
+# type code is stored in the lowest bits of the index rowid: rowid = unit_id * ROWID_STEP + type code,
+# so one unit entry can be replaced/removed by rowid lookup instead of full index scan
+UNIT_TYPE_CODES = {'article': 0, 'science_book': 1, 'fiction_book': 2}
+ROWID_STEP = 4
+UNIT_MODELS = {'article': Article, 'science_book': ScienceBook, 'fiction_book': FictionBook}
+# column order is important: it is the same for FTS5 table and bm25() weights
+INDEX_COLUMNS = ('title', 'authors', 'source', 'identifier')
+COLUMN_WEIGHTS = (10.0, 5.0, 2.0, 1.0)    # match in title is more relevant than match in DOI/ISBN
+
+TOKEN_REGEX = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchHit(namedtuple('SearchHit', ['unit_type', 'unit', 'score'])):
+    @property
+    def details_type(self):
+        return self.unit_type + '_details'    # unit_type value for the 'detailed_info' url
+
+    @property
+    def source(self):
+        return getattr(self.unit, 'journal', '') or getattr(self.unit, 'publisher', '')
+
+
+def tokenize(text):
+    return TOKEN_REGEX.findall(str(text).lower())
+
+
+def unit_document(unit, authors=None):
+    """
+    Text columns of the search index for one Article/ScienceBook/FictionBook.
+    'authors' are (name, surname) pairs, if they are known without work_author query.
+    """
+    if authors is None:
+        authors = [(author.author_name, author.author_surname) for author in unit.work_author.all()]
+    authors = ' '.join(name + ' ' + surname for name, surname in authors)
+    return {'title': unit.title,
+            'authors': authors,
+            'source': getattr(unit, 'journal', '') or getattr(unit, 'publisher', ''),
+            'identifier': getattr(unit, 'doi', '') or getattr(unit, 'isbn', '')}
+
+
+def document_rowid(unit_type, unit_id):
+    return unit_id * ROWID_STEP + UNIT_TYPE_CODES[unit_type]
+
+
+def rowid_document(rowid):
+    unit_id, type_code = divmod(rowid, ROWID_STEP)
+    for unit_type, code in UNIT_TYPE_CODES.items():
+        if code == type_code:
+            return unit_type, unit_id
+
+
+def fts_available():
+    """True if SQLite FTS5 index table was created by migration."""
+    return connection.vendor == 'sqlite' and SEARCH_TABLE in connection.introspection.table_names()
+
+
+class SQLiteSearchBackend:
+    """SQLite FTS5 virtual table backend, index is updated in the same transaction as catalog tables."""
+
+    def index(self, unit_type, unit_id, document):
+        self.index_many(unit_type, [(unit_id, document)])
+
+    def index_many(self, unit_type, documents):
+        rows = [[document_rowid(unit_type, unit_id)] + [document[column] for column in INDEX_COLUMNS]
+                for unit_id, document in documents]
+        with connection.cursor() as cursor:
+            cursor.executemany('DELETE FROM ' + SEARCH_TABLE + ' WHERE rowid = %s', [row[:1] for row in rows])
+            cursor.executemany('INSERT INTO ' + SEARCH_TABLE + ' (rowid, ' + ', '.join(INDEX_COLUMNS) + ') '
+                               'VALUES (%s, %s, %s, %s, %s)', rows)
+
+    def remove(self, unit_type, unit_id):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM ' + SEARCH_TABLE + ' WHERE rowid = %s',
+                           [document_rowid(unit_type, unit_id)])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM ' + SEARCH_TABLE)
+
+    def search(self, tokens, unit_type=None, offset=0, limit=20):
+        # every token is a prefix query, tokens are joined with implicit AND
+        match = ' '.join('"' + token + '"*' for token in tokens)
+        sql = ('SELECT rowid, bm25(' + SEARCH_TABLE + ', ' + ', '.join(str(w) for w in COLUMN_WEIGHTS) + ') '
+               'AS score FROM ' + SEARCH_TABLE + ' WHERE ' + SEARCH_TABLE + ' MATCH %s')
+        params = [match]
+        if unit_type:
+            sql += ' AND rowid %% %s = %s'
+            params += [ROWID_STEP, UNIT_TYPE_CODES[unit_type]]
+        sql += ' ORDER BY score, rowid LIMIT %s OFFSET %s'
+        params += [limit, offset]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            # bm25() is negative, the lower the better
+            return [(rowid_document(rowid), -score) for rowid, score in cursor.fetchall()]
+
+
+class InMemorySearchBackend:
+    """
+    Pure Python inverted index for the databases without FTS5.
+    Index lives in the process memory: it is loaded from DB on the first search and then kept in sync by signals.
+    """
+
+    def __init__(self):
+        self._lock = RLock()
+        self._postings = defaultdict(dict)    # token -> {(unit_type, unit_id): weight}
+        self._documents = {}                  # (unit_type, unit_id) -> set of tokens
+        self._vocabulary = []                 # sorted tokens for the prefix lookup
+        self._vocabulary_changed = False
+        self._loaded = False
+
+    def index(self, unit_type, unit_id, document):
+        if not self._loaded:
+            return    # will be read from DB on the first search
+        key = (unit_type, unit_id)
+        weights = {}
+        for column, weight in zip(INDEX_COLUMNS, COLUMN_WEIGHTS):
+            for token in tokenize(document[column]):
+                weights[token] = weights.get(token, 0.0) + weight
+        with self._lock:
+            self._remove_key(key)
+            for token, weight in weights.items():
+                if token not in self._postings:
+                    self._vocabulary_changed = True
+                self._postings[token][key] = weight
+            self._documents[key] = set(weights)
+
+    def index_many(self, unit_type, documents):
+        for unit_id, document in documents:
+            self.index(unit_type, unit_id, document)
+
+    def remove(self, unit_type, unit_id):
+        with self._lock:
+            self._remove_key((unit_type, unit_id))
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            self._vocabulary = []
+            self._vocabulary_changed = False
+            self._loaded = False
+
+    def _remove_key(self, key):
+        for token in self._documents.pop(key, ()):
+            postings = self._postings[token]
+            postings.pop(key, None)
+            if not postings:
+                del self._postings[token]
+                self._vocabulary_changed = True
+
+    def _load(self):
+        self._loaded = True
+        for unit_type, unit_model in UNIT_MODELS.items():
+            cursor = 0
+            while cursor is not None:
+                page, cursor = keyset_page(unit_model.objects.prefetch_related('work__work_author'),
+                                           after=cursor, page_size=1000)
+                for unit in page:
+                    self.index(unit_type, unit.pk, unit_document(unit))
+
+    def _prefix_postings(self, prefix):
+        matched = {}
+        for position in range(bisect_left(self._vocabulary, prefix), len(self._vocabulary)):
+            token = self._vocabulary[position]
+            if not token.startswith(prefix):
+                break
+            for key, weight in self._postings[token].items():
+                matched[key] = max(matched.get(key, 0.0), weight)
+        return matched
+
+    def search(self, tokens, unit_type=None, offset=0, limit=20):
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if self._vocabulary_changed:
+                self._vocabulary = sorted(self._postings)
+                self._vocabulary_changed = False
+            scores = None
+            # the rarest token first: intersection never grows
+            for postings in sorted((self._prefix_postings(token) for token in tokens), key=len):
+                if scores is None:
+                    scores = dict(postings)
+                else:
+                    scores = {key: score + postings[key] for key, score in scores.items() if key in postings}
+                if not scores:
+                    return []
+        hits = [(key, score) for key, score in scores.items() if unit_type is None or key[0] == unit_type]
+        hits.sort(key=lambda hit: (-hit[1], document_rowid(*hit[0])))
+        return hits[offset:offset + limit]
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        backend_name = getattr(settings, 'CATALOG_SEARCH_BACKEND', 'auto')
+        if backend_name == 'sqlite' or (backend_name == 'auto' and fts_available()):
+            _backend = SQLiteSearchBackend()
+        else:
+            _backend = InMemorySearchBackend()
+    return _backend
+
+
+def reset_backend():
+    global _backend
+    _backend = None
+
+
+def update_unit(unit_type, unit_id):
+    """Re-reads unit with its authors from DB and replaces its index entry."""
+    unit = UNIT_MODELS[unit_type].objects.prefetch_related('work__work_author').filter(pk=unit_id).first()
+    if unit is None:
+        get_backend().remove(unit_type, unit_id)
+    else:
+        get_backend().index(unit_type, unit_id, unit_document(unit))
+
+
+def update_units(unit_type, unit_ids):
+    """Batch version of update_unit(): units with their authors are read by one batch of queries."""
+    unit_ids = set(unit_ids)
+    units = UNIT_MODELS[unit_type].objects.prefetch_related('work__work_author').filter(pk__in=unit_ids)
+    documents = [(unit.pk, unit_document(unit)) for unit in units]
+    backend = get_backend()
+    backend.index_many(unit_type, documents)
+    for unit_id in unit_ids - {unit_id for unit_id, document in documents}:
+        backend.remove(unit_type, unit_id)
+
+
+def index_units(unit_type, documents):
+    """Adds index entries for the units created without signals (bulk_create), documents are (unit_id, document)."""
+    get_backend().index_many(unit_type, documents)
+
+
+def remove_unit(unit_type, unit_id):
+    get_backend().remove(unit_type, unit_id)
+
+
+def rebuild_index(batch_size=1000):
+    backend = get_backend()
+    backend.clear()
+    if isinstance(backend, InMemorySearchBackend):
+        return    # loaded lazily on the next search
+    for unit_type, unit_model in UNIT_MODELS.items():
+        cursor = 0
+        while cursor is not None:
+            page, cursor = keyset_page(unit_model.objects.prefetch_related('work__work_author'),
+                                       after=cursor, page_size=batch_size)
+            backend.index_many(unit_type, [(unit.pk, unit_document(unit)) for unit in page])
+
+
+def search_catalog(query, unit_type=None, page=1, page_size=20):
+    """
+    Ranked catalog search. Returns (hits list of SearchHit, has next page flag).
+    Index gives only ids and scores, units with authors are loaded with one batch of queries per unit type.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return [], False
+    offset = (page - 1) * page_size
+    ranked = get_backend().search(tokens, unit_type=unit_type, offset=offset, limit=page_size + 1)
+    has_next = len(ranked) > page_size
+    ranked = ranked[:page_size]
+
+    ids_by_type = defaultdict(list)
+    for (hit_type, unit_id), score in ranked:
+        ids_by_type[hit_type].append(unit_id)
+    units = {}
+    for hit_type, unit_ids in ids_by_type.items():
+        for unit in UNIT_MODELS[hit_type].objects.filter(pk__in=unit_ids).prefetch_related('work__work_author'):
+            units[(hit_type, unit.pk)] = unit
+
+    # units removed in a rolled back transaction can stay in the in-memory index, they are skipped here
+    hits = [SearchHit(key[0], units[key], score) for key, score in ranked if key in units]
+    return hits, has_next
@@ -0,0 +1,158 @@
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import bibliography, database, detail_cache, holds, profiles, search, stats
+from .address_lookup import ADDRESS_INDEXES
+from .catalog_changes import unit_changed, units_changed, work_units
+from .models import Author, Work, Article, ScienceBook, FictionBook, LibraryUnit, CitiesList, StreetsList, \
+    LibraryUserInfo, LibraryUserAddress
+
+ADDRESS_PARTS = {CitiesList: 'city', StreetsList: 'street'}
+
+
+@receiver(connection_created)
+def connection_tuning(sender, connection, **kwargs):
+    database.apply_sqlite_pragmas(connection)
+
+
+@receiver(request_started)
+def connection_health_check(sender, **kwargs):
+    # connected after close_old_connections(): obsolete connections are already closed
+    database.check_connections()
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=ScienceBook)
+@receiver(post_save, sender=FictionBook)
+def unit_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return    # fixture loading
+    unit_changed(sender.work_type, instance.pk)
+
+
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=ScienceBook)
+@receiver(post_delete, sender=FictionBook)
+def unit_deleted(sender, instance, **kwargs):
+    search.remove_unit(sender.work_type, instance.pk)
+    detail_cache.invalidate_details(sender.work_type, instance.pk)
+    # common part of the work isn't needed without extension, queryset delete() of extensions is covered as well
+    Work.all_objects.filter(pk=instance.work_id).delete()
+
+
+@receiver(post_save, sender=Work)
+def work_saved(sender, instance, created, raw=False, **kwargs):
+    # new work has no extension yet, work saved by extension save() is handled by unit_saved()
+    if raw or created or getattr(instance, '_saved_with_extension', False):
+        return
+    units_changed(work_units(Work.objects.filter(pk=instance.pk)))
+
+
+@receiver(m2m_changed, sender=Work.work_author.through)
+def work_authors_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if not reverse:
+        # work.work_author.add(...)
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            units_changed(work_units(Work.objects.filter(pk=instance.pk)))
+        return
+    # author.works.add(...): pk_set contains work ids, for clear() they are known only before it
+    if action == 'pre_clear':
+        instance._cleared_units = work_units(instance.works.all())
+    elif action in ('post_add', 'post_remove'):
+        units_changed(work_units(Work.objects.filter(pk__in=pk_set)))
+    elif action == 'post_clear':
+        units_changed(getattr(instance, '_cleared_units', ()))
+
+
+@receiver(m2m_changed, sender=Work.work_author.through)
+def work_authors_bibliography(sender, instance, action, reverse, pk_set, **kwargs):
+    # pk_set contains author ids for work.work_author changes and work ids for author.works changes
+    if action == 'pre_clear' and not reverse:
+        instance._cleared_author_ids = bibliography.work_author_ids([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        bibliography.refresh_authors([instance.pk] if reverse else pk_set)
+    elif action == 'post_clear':
+        bibliography.refresh_authors([instance.pk] if reverse else getattr(instance, '_cleared_author_ids', ()))
+
+
+@receiver(post_save, sender=Work)
+def work_bibliography_saved(sender, instance, created, raw=False, **kwargs):
+    # publishing year can be changed, new work has no authors yet
+    if not raw and not created:
+        bibliography.refresh_works([instance.pk])
+
+
+@receiver(pre_delete, sender=Work)
+def work_deleting(sender, instance, **kwargs):
+    # through table rows are deleted by cascade without m2m_changed
+    instance._deleted_author_ids = bibliography.work_author_ids([instance.pk])
+
+
+@receiver(post_delete, sender=Work)
+def work_deleted(sender, instance, **kwargs):
+    bibliography.refresh_authors(getattr(instance, '_deleted_author_ids', ()))
+
+
+@receiver(post_save, sender=Author)
+def author_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return    # new author has no works yet
+    units_changed(work_units(instance.works.all()))
+
+
+@receiver(pre_delete, sender=Author)
+def author_deleting(sender, instance, **kwargs):
+    # through table rows are deleted by cascade without m2m_changed, so works are remembered before it
+    instance._deleted_units = work_units(instance.works.all())
+
+
+@receiver(post_delete, sender=Author)
+def author_deleted(sender, instance, **kwargs):
+    units_changed(getattr(instance, '_deleted_units', ()))
+
+
+@receiver(post_save, sender=LibraryUnit)
+def library_unit_saved(sender, instance, created, raw=False, **kwargs):
+    # availability changes of existing copies are counted by accounting.loans
+    if created and not raw:
+        stats.copy_added(instance.work_id, instance.unit_available)
+        if instance.unit_available:
+            holds.assign_copy(instance.pk, instance.work_id)
+
+
+@receiver(post_delete, sender=LibraryUnit)
+def library_unit_deleted(sender, instance, **kwargs):
+    stats.copy_removed(instance.work_id, instance.unit_available)
+
+
+@receiver(post_save, sender=CitiesList)
+@receiver(post_save, sender=StreetsList)
+def address_name_saved(sender, instance, created, **kwargs):
+    if created:
+        ADDRESS_INDEXES[ADDRESS_PARTS[sender]].added(instance)
+    else:
+        ADDRESS_INDEXES[ADDRESS_PARTS[sender]].invalidate()
+        # renamed city/street is shown in the cached profiles of its residents
+        lookup = ADDRESS_PARTS[sender] + '_name'
+        profiles.invalidate_profiles(LibraryUserAddress.objects.filter(**{lookup: instance})
+                                     .values_list('library_user__library_user_id', flat=True))
+
+
+@receiver(post_delete, sender=CitiesList)
+@receiver(post_delete, sender=StreetsList)
+def address_name_deleted(sender, instance, **kwargs):
+    ADDRESS_INDEXES[ADDRESS_PARTS[sender]].invalidate()
+
+
+@receiver(post_save, sender=LibraryUserInfo)
+@receiver(post_delete, sender=LibraryUserInfo)
+def user_info_changed(sender, instance, **kwargs):
+    profiles.invalidate_profile(instance.library_user_id)
+
+
+@receiver(post_save, sender=LibraryUserAddress)
+@receiver(post_delete, sender=LibraryUserAddress)
+def user_address_changed(sender, instance, **kwargs):
+    profiles.invalidate_profile(instance.library_user.library_user_id)
@@ -0,0 +1,28 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend with OPTIONS['transaction_mode'] (the same option is built in since Django 5.1).
+    Django begins atomic blocks by plain BEGIN (DEFERRED): the transaction which read and then writes
+    gets "database is locked" at once if another writer committed meanwhile, busy_timeout doesn't help.
+    BEGIN IMMEDIATE takes the write lock first, so concurrent writers wait for each other up to busy_timeout.
+    """
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('transaction_mode', None)    # not a sqlite3.connect() argument
+        return kwargs
+
+    @property
+    def transaction_mode(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode', 'DEFERRED').upper()
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured('transaction_mode must be one of ' + ', '.join(TRANSACTION_MODES) + '.')
+        return mode
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN ' + self.transaction_mode)
@@ -0,0 +1,107 @@
+import datetime
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import LibraryUnit, UnitStatus, WorkStats, DailyLoanStats, UserLoanStats
+
+
+def increment(model, key, **deltas):
+    """
+    Adds deltas to the counters of one summary row by UPDATE ... SET x = x + delta,
+    so concurrent loan transactions don't lose increments. The row is created by the first event.
+    """
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**key).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **deltas)
+    except IntegrityError:    # created by concurrent transaction
+        model.objects.filter(**key).update(**updates)
+
+
+def copy_added(work_id, available=True):
+    increment(WorkStats, {'work_id': work_id}, copies_total=1, copies_available=int(available))
+
+
+def copy_removed(work_id, available=True):
+    # no increment(): stats row of the deleted work can be already deleted by cascade
+    WorkStats.objects.filter(work_id=work_id).update(copies_total=F('copies_total') - 1,
+                                                     copies_available=F('copies_available') - int(available))
+
+
+def loan_issued(loan, work_id):
+    """Called in the issue transaction: counters change only if the loan is committed."""
+    increment(WorkStats, {'work_id': work_id}, copies_available=-1, loans_total=1)
+    increment(DailyLoanStats, {'day': timezone.localdate(loan.date_issue)}, issued=1)
+    increment(UserLoanStats, {'library_user_id': loan.library_user_id}, active_loans=1, loans_total=1)
+
+
+def loan_returned(loan, work_id):
+    increment(WorkStats, {'work_id': work_id}, copies_available=1)
+    increment(DailyLoanStats, {'day': timezone.localdate(loan.date_return_actual)}, returned=1)
+    increment(UserLoanStats, {'library_user_id': loan.library_user_id}, active_loans=-1)
+
+
+def _bulk_create(model, objects, batch_size=1000):
+    objects = iter(objects)
+    batch = list(islice(objects, batch_size))
+    while batch:
+        model.objects.bulk_create(batch)
+        batch = list(islice(objects, batch_size))
+
+
+def rebuild_stats():
+    """Recomputes all summary tables from LibraryUnit and UnitStatus by GROUP BY queries."""
+    with transaction.atomic():
+        WorkStats.objects.all().delete()
+        DailyLoanStats.objects.all().delete()
+        UserLoanStats.objects.all().delete()
+
+        work_stats = {}
+        for values in LibraryUnit.objects.order_by().values('work')\
+                .annotate(total=Count('pk'), available=Count('pk', filter=Q(unit_available=True))):
+            work_stats[values['work']] = WorkStats(work_id=values['work'], copies_total=values['total'],
+                                                   copies_available=values['available'])
+        for values in UnitStatus.objects.order_by().values('library_unit__work').annotate(loans=Count('pk')):
+            stats = work_stats.setdefault(values['library_unit__work'],
+                                          WorkStats(work_id=values['library_unit__work']))
+            stats.loans_total = values['loans']
+        _bulk_create(WorkStats, work_stats.values())
+
+        daily_stats = {}
+        for values in UnitStatus.objects.annotate(day=TruncDate('date_issue')).order_by().values('day')\
+                .annotate(loans=Count('pk')):
+            daily_stats[values['day']] = DailyLoanStats(day=values['day'], issued=values['loans'])
+        for values in UnitStatus.objects.filter(date_return_actual__isnull=False)\
+                .annotate(day=TruncDate('date_return_actual')).order_by().values('day').annotate(loans=Count('pk')):
+            daily_stats.setdefault(values['day'], DailyLoanStats(day=values['day'])).returned = values['loans']
+        _bulk_create(DailyLoanStats, daily_stats.values())
+
+        _bulk_create(UserLoanStats, (UserLoanStats(library_user_id=values['library_user'],
+                                                   active_loans=values['active'], loans_total=values['loans'])
+                                     for values in UnitStatus.objects.order_by().values('library_user')
+                                     .annotate(loans=Count('pk'),
+                                               active=Count('pk', filter=Q(date_return_actual__isnull=True)))))
+
+
+def work_availability(work_id):
+    """(available, total) copies of the work, one primary key lookup."""
+    stats = WorkStats.objects.filter(work_id=work_id).values_list('copies_available', 'copies_total').first()
+    return stats or (0, 0)
+
+
+def dashboard(days=30, top=10, today=None):
+    """Dashboard data, every part is an index range read of limited size."""
+    today = today or timezone.localdate()
+    return {'daily': list(DailyLoanStats.objects.filter(day__gt=today - datetime.timedelta(days=days))
+                          .order_by('-day')),
+            'most_borrowed': list(WorkStats.objects.select_related('work')
+                                  .filter(loans_total__gt=0, work__deleted_at__isnull=True)
+                                  .order_by('-loans_total')[:top]),
+            'most_active_users': list(UserLoanStats.objects.select_related('library_user')
+                                      .filter(active_loans__gt=0).order_by('-active_loans')[:top])}
@@ -1,3 +1,971 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import os
+import tempfile
+from functools import partial
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from elibrary.database import database_settings
+
+from . import bibliography, dedupe, deletion, detail_cache, holds, loans, mail_outbox, metrics, pagination, search, stats
+from .address_lookup import ADDRESS_INDEXES
+from .asgi import BoundedThreadPoolApplication, StreamingASGIHandler
+from .benchmarks.concurrency import asgi_scope
+from .benchmarks.data import CatalogGenerator
+from .overdue_notices import send_overdue_notices
+from .benchmarks.explain import explain_hot_queries
+from .benchmarks.runner import run_benchmarks, compare
+from .benchmarks.writers import compare_sqlite_profiles
+from .catalog_io import export_lines
+from .models import Author, Work, Article, ScienceBook, FictionBook, LibraryUnit, MailOutbox, CitiesList, StreetsList, \
+    LibraryUserInfo, LibraryUserAddress, WorkStats, DailyLoanStats, UserLoanStats, Hold, UnitStatus, AuthorBibliography
+
+
+class CommonInfoPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='reader_password!')
+        for number in range(7):
+            article = Article.objects.create(title='Article ' + str(number), journal='Journal', pages='1-10',
+                                             publishing_year=datetime.date(2020, 1, 1), doi='doi/' + str(number))
+            article.work_author.add(Author.objects.create(author_name='Name', author_surname=str(number)),
+                                    Author.objects.create(author_name='Other', author_surname=str(number)))
+
+    def setUp(self):
+        cache.clear()    # rendered rows
+        self.client.force_login(self.user)
+
+    def test_pages_follow_cursor(self):
+        url = reverse('common_info', args=['articles'])
+        response = self.client.get(url, {'page_size': 3})
+        self.assertEqual(self.row_titles(response), ['Article 0', 'Article 1', 'Article 2'])
+        self.assertEqual(response.context['next_cursor'], Article.objects.get(work__title='Article 2').pk)
+
+        response = self.client.get(url, {'page_size': 3, 'after': response.context['next_cursor']})
+        self.assertEqual(self.row_titles(response), ['Article 3', 'Article 4', 'Article 5'])
+
+        response = self.client.get(url, {'page_size': 3, 'after': response.context['next_cursor']})
+        self.assertEqual(self.row_titles(response), ['Article 6'])
+        self.assertIsNone(response.context['next_cursor'])
+
+    @staticmethod
+    def row_titles(response):
+        titles = ['Article ' + str(number) for number in range(7)]
+        return [title for row in response.context['rows'] for title in titles if '>' + title + '<' in row]
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        url = reverse('common_info', args=['articles'])
+        self.client.get(url, {'page_size': 1})    # warm up session and user loading
+        # session, user, page ETag, page rows, authors prefetch
+        with self.assertNumQueries(5):
+            self.client.get(url, {'page_size': 2})
+        with self.assertNumQueries(5):
+            self.client.get(url, {'page_size': 7})
+        with self.assertNumQueries(4):    # all rows are cached, no authors prefetch
+            self.client.get(url, {'page_size': 7})
+
+
+class CatalogSearchTest(TestCase):
+    def setUp(self):
+        search.reset_backend()
+        self.addCleanup(search.reset_backend)
+        self.author = Author.objects.create(author_name='Ada', author_surname='Lovelace')
+        self.article = Article.objects.create(title='Notes on the analytical engine', journal='Scientific memoirs',
+                                              pages='1-70', publishing_year=datetime.date(1843, 1, 1),
+                                              doi='10.1000/engine')
+        self.article.work_author.add(self.author)
+        self.book = ScienceBook.objects.create(title='Engine design', publisher='Lovelace press',
+                                               publishing_year=datetime.date(2000, 1, 1), isbn='978-0')
+
+    def hit_titles(self, query, **kwargs):
+        hits, has_next = search.search_catalog(query, **kwargs)
+        return [hit.unit.title for hit in hits]
+
+    def check_search(self):
+        # title match is ranked higher than publisher match
+        self.assertEqual(self.hit_titles('lovel'), ['Notes on the analytical engine', 'Engine design'])
+        self.assertEqual(self.hit_titles('engine', unit_type='science_book'), ['Engine design'])
+        self.assertEqual(self.hit_titles('ada engine'), ['Notes on the analytical engine'])
+        self.assertEqual(self.hit_titles('10.1000/engine'), ['Notes on the analytical engine'])
+
+        # index follows author changes and deletes through signals
+        self.author.author_surname = 'Byron'
+        self.author.save()
+        self.assertEqual(self.hit_titles('byron'), ['Notes on the analytical engine'])
+        self.article.work_author.clear()
+        self.assertEqual(self.hit_titles('byron'), [])
+        self.book.delete()
+        self.assertEqual(self.hit_titles('engine'), ['Notes on the analytical engine'])
+
+    def test_sqlite_backend(self):
+        self.assertIsInstance(search.get_backend(), search.SQLiteSearchBackend)
+        self.check_search()
+
+    @override_settings(CATALOG_SEARCH_BACKEND='memory')
+    def test_in_memory_backend(self):
+        search.reset_backend()    # catalog created in setUp is loaded on the first search
+        self.assertIsInstance(search.get_backend(), search.InMemorySearchBackend)
+        self.check_search()
+
+    def test_search_view_pages(self):
+        user = User.objects.create_user(username='reader', password='reader_password!')
+        self.client.force_login(user)
+        response = self.client.get(reverse('catalog_search'), {'q': 'engine', 'page_size': 1})
+        self.assertEqual(len(response.context['hits']), 1)
+        self.assertTrue(response.context['has_next'])
+        response = self.client.get(reverse('catalog_search'), {'q': 'engine', 'page_size': 1, 'page': 2})
+        self.assertFalse(response.context['has_next'])
+
+
+class WorkTest(TestCase):
+    def setUp(self):
+        self.author = Author.objects.create(author_name='Ada', author_surname='Lovelace')
+        self.article = Article.objects.create(title='Notes', journal='Memoirs', pages='1-70',
+                                              publishing_year=datetime.date(1843, 1, 1), doi='10.1/a')
+        self.book = FictionBook.objects.create(title='Engine')
+        self.article.work_author.add(self.author)
+        self.book.work_author.add(self.author)
+
+    def test_works_of_all_types_in_one_query(self):
+        with self.assertNumQueries(1):
+            works = list(Work.objects.by_author(self.author).recent())
+        self.assertEqual([work.title for work in works], ['Notes', 'Engine'])
+        self.assertEqual(works[0].extension, self.article)
+
+    def test_extension_delete_removes_work_and_copies(self):
+        LibraryUnit.objects.create(work=self.book.work)
+        self.book.delete()
+        self.assertEqual(list(Work.objects.values_list('title', flat=True)), ['Notes'])
+        self.assertFalse(LibraryUnit.objects.exists())
+
+
+class SoftDeleteTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='reader_password!')
+        self.client.force_login(self.user)
+        self.shared_author = Author.objects.create(author_name='Ada', author_surname='Lovelace')
+        self.articles = []
+        for number in range(2):
+            article = Article.objects.create(title='Engine notes ' + str(number), journal='Memoirs', pages='1-70',
+                                             doi='10.1/' + str(number))
+            article.work_author.add(self.shared_author,
+                                    Author.objects.create(author_name='Own', author_surname=str(number)))
+            library_unit = LibraryUnit.objects.create(work=article.work)
+            for loan_number in range(2):
+                loans.return_unit(loans.issue_unit(library_unit.pk, self.user).library_unit_id)
+            self.articles.append(article)
+        self.other = FictionBook.objects.create(title='Engine')
+        self.other.work_author.add(self.shared_author)
+
+    def test_delete_view_hides_unit_at_once(self):
+        article = self.articles[0]
+        response = self.client.get(reverse('delete_library_unit', args=['delete_article', article.pk]))
+        self.assertContains(response, 'Engine notes 0')
+        self.assertFalse(Article.objects.filter(pk=article.pk).exists())
+        self.assertEqual(list(self.shared_author.works.order_by('pk').values_list('title', flat=True)),
+                         ['Engine notes 1', 'Engine'])
+        self.assertIsNotNone(Work.all_objects.get(pk=article.work_id).deleted_at)
+        self.assertEqual(UnitStatus.objects.filter(library_unit__work=article.work_id).count(), 2)
+        hits, has_next = search.search_catalog('notes')
+        self.assertEqual([hit.unit.title for hit in hits], ['Engine notes 1'])
+
+    def test_issued_work_is_not_deleted_or_purged(self):
+        article = self.articles[0]
+        library_unit = LibraryUnit.objects.get(work=article.work)
+        loans.issue_unit(library_unit.pk, self.user)
+        response = self.client.get(reverse('delete_library_unit', args=['delete_article', article.pk]))
+        self.assertContains(response, 'has issued copies')
+        self.assertTrue(Article.objects.filter(pk=article.pk).exists())
+
+        # tombstone with the copy issued before the check: the loan is kept
+        Work.objects.filter(pk=article.work_id).update(deleted_at=timezone.now())
+        self.assertEqual(deletion.purge_deleted(), (0, 0, 0, 1))
+        self.assertEqual(UnitStatus.objects.filter(library_unit=library_unit).count(), 3)
+
+    def test_deleted_work_copies_are_not_issued_or_held(self):
+        article = self.articles[0]
+        library_unit = LibraryUnit.objects.get(work=article.work)
+        deletion.soft_delete_unit(article)
+        self.assertFalse(LibraryUnit.objects.get(pk=library_unit.pk).unit_available)
+        with self.assertRaises(loans.LoanError):
+            loans.issue_unit(library_unit.pk, self.user)
+        with self.assertRaises(holds.HoldError):
+            holds.place_hold(article.work_id, self.user)
+
+    def test_purge_deleted_in_chunks(self):
+        for article in self.articles:
+            deletion.soft_delete_unit(article)
+
+        self.assertEqual(deletion.purge_deleted(chunk_size=1), (2, 4, 2, 0))
+        self.assertFalse(Work.all_objects.filter(deleted_at__isnull=False).exists())
+        self.assertEqual(Article._base_manager.count(), 0)
+        self.assertFalse(LibraryUnit.objects.exists())
+        self.assertFalse(UnitStatus.objects.exists())
+        self.assertFalse(WorkStats.objects.exclude(work=self.other.work).exists())
+        # author of the remaining work is kept
+        self.assertEqual(list(Author.objects.values_list('author_surname', flat=True)), ['Lovelace'])
+        self.assertEqual(UserLoanStats.objects.get(library_user=self.user).active_loans, 0)
+        self.assertEqual(deletion.purge_deleted(), (0, 0, 0, 0))
+
+
+class AuthorPagesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='reader_password!')
+        self.client.force_login(self.user)
+        self.author = Author.objects.create(author_name='Ada', author_surname='Lovelace')
+
+    def summary(self, author=None):
+        return AuthorBibliography.objects.filter(author=author or self.author)\
+            .values_list('articles', 'science_books', 'fiction_books', 'works_total', 'latest_year').first()
+
+    def test_summary_follows_work_changes(self):
+        article = Article.objects.create(title='Notes', journal='Memoirs', pages='1-70', doi='10.1/a',
+                                         publishing_year=datetime.date(1843, 1, 1))
+        article.work_author.add(self.author)
+        book = FictionBook.objects.create(title='Engine')
+        self.author.works.add(book.work)
+        self.assertEqual(self.summary(), (1, 0, 1, 2, datetime.date(1843, 1, 1)))
+
+        article.publishing_year = datetime.date(1850, 1, 1)
+        article.save()
+        self.assertEqual(self.summary()[4], datetime.date(1850, 1, 1))
+        book.work_author.clear()
+        self.assertEqual(self.summary(), (1, 0, 0, 1, datetime.date(1850, 1, 1)))
+        deletion.soft_delete_unit(article)
+        self.assertEqual(self.summary(), (0, 0, 0, 0, None))
+
+        summaries = list(AuthorBibliography.objects.order_by('author').values())
+        bibliography.rebuild_bibliographies()
+        self.assertEqual(list(AuthorBibliography.objects.order_by('author').values('author', 'works_total')),
+                         [{'author': row['author_id'], 'works_total': row['works_total']} for row in summaries])
+
+    def test_pages_have_stable_query_count(self):
+        def add_authors(count):
+            for number in range(count):
+                author = Author.objects.create(author_name='Name', author_surname='Surname' + str(number))
+                book = ScienceBook.objects.create(title='Book ' + str(number), publisher='P', isbn=str(number))
+                book.work_author.add(author, self.author)
+
+        add_authors(1)
+        with CaptureQueriesContext(connection) as first_list:
+            self.client.get(reverse('author_list'))
+        with CaptureQueriesContext(connection) as first_detail:
+            self.client.get(reverse('author_detail', args=[self.author.pk]))
+        add_authors(5)
+        with CaptureQueriesContext(connection) as second_list:
+            response = self.client.get(reverse('author_list'), {'surname': 'Sur'})
+        self.assertEqual(len(response.context['authors']), 6)
+        with CaptureQueriesContext(connection) as second_detail:
+            response = self.client.get(reverse('author_detail', args=[self.author.pk]))
+        self.assertEqual(len(first_list), len(second_list))
+        self.assertEqual(len(first_detail), len(second_detail))
+        self.assertEqual(len(response.context['works']), 6)
+        self.assertContains(response, 'science books: 6')
+        self.assertEqual(self.client.get(reverse('author_detail', args=[0])).status_code, 404)
+
+
+class DedupeAuthorsTest(TestCase):
+    def test_similar_names_are_blocked_and_scored(self):
+        self.assertEqual(dedupe.normalize(' Jöhn-Paul  O. '), 'john paul o')
+        self.assertEqual(dedupe.soundex('smith'), dedupe.soundex('smyth'))
+        self.assertEqual(dedupe.soundex('tymczak'), 'T522')
+        self.assertEqual(dedupe.block_key('j', 'smith'), dedupe.block_key('john', 'smyth'))
+        self.assertGreaterEqual(dedupe.similarity(('j', 'smith'), ('john', 'smith')), dedupe.DEFAULT_THRESHOLD)
+        self.assertLess(dedupe.similarity(('jane', 'smith'), ('john', 'smith')), dedupe.DEFAULT_THRESHOLD)
+
+    def test_merge_moves_works_to_kept_author(self):
+        john = Author.objects.create(author_name='John', author_surname='Smith')
+        initial = Author.objects.create(author_name='J.', author_surname='Smith')
+        lower = Author.objects.create(author_name='john', author_surname='smith')
+        jane = Author.objects.create(author_name='Jane', author_surname='Smith')
+        book = ScienceBook.objects.create(title='Forges', publisher='P', isbn='1')
+        book.work_author.add(john, lower)
+        novel = FictionBook.objects.create(title='Anvil')
+        novel.work_author.add(initial, jane)
+
+        # 'J.' is as similar to 'Jane' as to 'John', it's left alone
+        self.assertEqual(dedupe.merge_plan(), [(john.pk, [lower.pk])])
+        with self.assertNumQueries(1):
+            names = dedupe.author_names([(john.pk, [lower.pk]), (jane.pk, [initial.pk])])
+        self.assertEqual(names[lower.pk], 'john smith')
+        self.assertEqual(len(names), 4)
+        output = io.StringIO()
+        call_command('dedupe_authors', '--apply', stdout=output)
+        self.assertIn('1 duplicate authors merged', output.getvalue())
+        self.assertEqual(set(Author.objects.values_list('pk', flat=True)), {john.pk, initial.pk, jane.pk})
+        self.assertEqual(list(book.work.work_author.all()), [john])
+
+        dedupe.apply_plan([(john.pk, [initial.pk])])
+        self.assertEqual(set(novel.work.work_author.all()), {john, jane})
+        self.assertEqual(AuthorBibliography.objects.get(author=john).works_total, 2)
+        self.assertFalse(AuthorBibliography.objects.filter(author=initial).exists())
+        hits, has_next = search.search_catalog('john anvil')
+        self.assertEqual([hit.unit.pk for hit in hits], [novel.pk])
+
+
+class AuthorEditTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='reader_password!')
+        self.client.force_login(self.user)
+
+    def create_article(self, title, authors_number):
+        article = Article.objects.create(title=title, journal='Journal', pages='1-2',
+                                         publishing_year=datetime.date(2020, 1, 1), doi='10.1/' + title)
+        article.work_author.add(*[Author.objects.create(author_name='Name', author_surname=title + str(number))
+                                  for number in range(authors_number)])
+        return article
+
+    def post_edit(self, article, rows):
+        data = {'title': article.title, 'journal': article.journal, 'impact_factor': 1, 'volume': 1,
+                'article_number': 1, 'pages': article.pages, 'publishing_year': '2020-01-01', 'doi': article.doi,
+                'authors-TOTAL_FORMS': len(rows), 'authors-INITIAL_FORMS': article.work_author.count(),
+                'authors-MIN_NUM_FORMS': 0, 'authors-MAX_NUM_FORMS': 1000}
+        for number, row in enumerate(rows):
+            for key, value in row.items():
+                data['authors-' + str(number) + '-' + key] = value
+        return self.client.post(reverse('edit_info', args=['edit_article', article.pk]), data)
+
+    def edit_rows(self, article):
+        """Renames the first author, removes the second one and adds a new author."""
+        rows = [{'id': author.pk, 'author_name': author.author_name, 'author_surname': author.author_surname}
+                for author in article.work_author.order_by('pk')]
+        rows[0]['author_name'] = 'Renamed'
+        rows[1]['DELETE'] = 'on'
+        return rows + [{'author_name': 'New', 'author_surname': article.title}]
+
+    def test_edit_by_author_id(self):
+        namesake = Author.objects.create(author_name='Name', author_surname='First1')
+        article = self.create_article('First', 3)
+        first, second, third = article.work_author.order_by('pk')
+        response = self.post_edit(article, self.edit_rows(article))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(sorted(str(author) for author in article.work_author.all()),
+                         ['Name First2', 'New First', 'Renamed First0'])
+        self.assertEqual(Author.objects.get(pk=namesake.pk).author_name, 'Name')    # not touched
+        self.assertTrue(Author.objects.filter(pk=second.pk).exists())    # only unlinked from the work
+
+    def test_query_count_does_not_depend_on_authors_number(self):
+        counts = []
+        for title, authors_number in (('Small', 5), ('Large', 50)):
+            article = self.create_article(title, authors_number)
+            rows = self.edit_rows(article)
+            with CaptureQueriesContext(connection) as queries:
+                self.post_edit(article, rows)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+def create_library_unit(title='Unit'):
+    article = Article.objects.create(title=title, publishing_year=datetime.date(2020, 1, 1))
+    return LibraryUnit.objects.create(work=article.work)
+
+
+class LoanServiceTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='reader_password!')
+        self.library_unit = create_library_unit()
+
+    def test_issue_return_renew(self):
+        now = timezone.now()
+        loan = loans.issue_unit(self.library_unit.pk, self.user, loan_days=7, now=now)
+        self.assertFalse(LibraryUnit.objects.get(pk=self.library_unit.pk).unit_available)
+        self.assertEqual(list(loans.current_loans(self.user)), [loan])
+        with self.assertRaises(loans.LoanError):
+            loans.issue_unit(self.library_unit.pk, self.user)
+
+        # overdue loan is renewed starting from now
+        later = now + datetime.timedelta(days=10)
+        self.assertEqual(list(loans.overdue_loans(later)), [loan])
+        loan = loans.renew_loan(loan.pk, loan_days=7, now=later)
+        self.assertEqual(loan.date_return_nominal, later + datetime.timedelta(days=7))
+        self.assertEqual(list(loans.overdue_loans(later)), [])
+
+        loans.return_unit(self.library_unit.pk, now=later)
+        self.assertTrue(LibraryUnit.objects.get(pk=self.library_unit.pk).unit_available)
+        self.assertEqual(list(loans.current_loans(self.user)), [])
+        with self.assertRaises(loans.LoanError):
+            loans.return_unit(self.library_unit.pk)
+        with self.assertRaises(loans.LoanError):
+            loans.renew_loan(loan.pk)
+
+
+class LoanStatsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='reader_password!', is_staff=True)
+        self.library_unit = create_library_unit('Popular')
+        LibraryUnit.objects.create(work=self.library_unit.work)    # second copy
+
+    def counters(self):
+        work_stats = WorkStats.objects.get(work=self.library_unit.work)
+        user_stats = UserLoanStats.objects.get(library_user=self.user)
+        return ((work_stats.copies_total, work_stats.copies_available, work_stats.loans_total),
+                (user_stats.active_loans, user_stats.loans_total),
+                list(DailyLoanStats.objects.order_by('day').values_list('day', 'issued', 'returned')))
+
+    def test_counters_follow_loans_and_match_rebuild(self):
+        now = timezone.now()
+        loans.issue_unit(self.library_unit.pk, self.user, now=now - datetime.timedelta(days=1))
+        loans.return_unit(self.library_unit.pk, now=now)
+        loans.issue_unit(self.library_unit.pk, self.user, now=now)
+        self.assertEqual(stats.work_availability(self.library_unit.work_id), (1, 2))
+        incremental = self.counters()
+        self.assertEqual(incremental[:2], ((2, 1, 2), (1, 2)))
+        self.assertEqual([(issued, returned) for day, issued, returned in incremental[2]], [(1, 0), (1, 1)])
+
+        call_command('rebuild_stats', stdout=io.StringIO())
+        self.assertEqual(self.counters(), incremental)
+
+    def test_dashboard(self):
+        loans.issue_unit(self.library_unit.pk, self.user)
+        self.client.force_login(self.user)
+        with self.assertNumQueries(5):    # session, user and one query per dashboard table
+            response = self.client.get(reverse('stats_dashboard'))
+        self.assertContains(response, 'Popular')
+
+
+class HoldTest(TestCase):
+    def setUp(self):
+        self.reader, self.first, self.second = [User.objects.create_user(username=name, password='reader_password!',
+                                                                         email=name + '@example.com')
+                                                for name in ('reader', 'first', 'second')]
+        self.library_unit = create_library_unit('Popular')
+        self.work_id = self.library_unit.work_id
+        self.now = timezone.now()
+        loans.issue_unit(self.library_unit.pk, self.reader, now=self.now)
+
+    def test_returned_copy_goes_to_queue_head(self):
+        normal = holds.place_hold(self.work_id, self.first, now=self.now)
+        high = holds.place_hold(self.work_id, self.second, priority=Hold.PRIORITY_HIGH,
+                                now=self.now + datetime.timedelta(minutes=1))
+        with self.assertRaises(holds.HoldError):
+            holds.place_hold(self.work_id, self.first)
+
+        loans.return_unit(self.library_unit.pk, now=self.now)
+        high.refresh_from_db()
+        self.assertEqual((high.status, high.library_unit_id), (Hold.STATUS_READY, self.library_unit.pk))
+        self.assertEqual(stats.work_availability(self.work_id), (0, 1))
+        self.assertEqual(MailOutbox.objects.get().to, 'second@example.com')
+        with self.assertRaises(loans.LoanError):    # copy is kept for the hold owner
+            loans.issue_unit(self.library_unit.pk, self.first)
+
+        loans.issue_unit(self.library_unit.pk, self.second)
+        high.refresh_from_db()
+        normal.refresh_from_db()
+        self.assertEqual((high.status, normal.status), (Hold.STATUS_FULFILLED, Hold.STATUS_WAITING))
+
+    def test_expired_pickup_goes_to_next_hold(self):
+        first_hold = holds.place_hold(self.work_id, self.first, now=self.now)
+        second_hold = holds.place_hold(self.work_id, self.second, now=self.now + datetime.timedelta(minutes=1))
+        loans.return_unit(self.library_unit.pk, now=self.now)
+
+        with mock.patch('django.utils.timezone.now', return_value=self.now + datetime.timedelta(days=4)):
+            call_command('process_holds', stdout=io.StringIO())
+        first_hold.refresh_from_db()
+        second_hold.refresh_from_db()
+        self.assertEqual(first_hold.status, Hold.STATUS_EXPIRED)
+        self.assertEqual((second_hold.status, second_hold.library_unit_id), (Hold.STATUS_READY, self.library_unit.pk))
+
+        holds.cancel_hold(second_hold.pk)
+        self.assertTrue(LibraryUnit.objects.get(pk=self.library_unit.pk).unit_available)
+        self.assertEqual(stats.work_availability(self.work_id), (1, 1))
+
+
+class OverdueNoticeTest(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.first, self.second, self.punctual = [User.objects.create_user(username=name, password='reader_password!',
+                                                                           email=name + '@example.com')
+                                                  for name in ('first', 'second', 'punctual')]
+        past = self.now - datetime.timedelta(days=30)
+        for number, user in enumerate([self.first, self.first, self.first, self.second]):
+            loans.issue_unit(create_library_unit('Book ' + str(number)).pk, user, loan_days=14, now=past)
+        loans.issue_unit(create_library_unit('Fresh').pk, self.punctual, now=self.now)
+
+    def test_one_digest_per_user_once(self):
+        self.assertEqual(send_overdue_notices(now=self.now, chunk_size=2), (2, 4, 0))
+        digests = {message.to: message.body for message in MailOutbox.objects.all()}
+        self.assertEqual(sorted(digests), ['first@example.com', 'second@example.com'])
+        self.assertEqual([title in digests['first@example.com'] for title in ('Book 0', 'Book 1', 'Book 2')],
+                         [True, True, True])
+
+        call_command('send_overdue_notices', stdout=io.StringIO())
+        self.assertEqual(MailOutbox.objects.count(), 2)
+
+        # renewed loan is notified again after the new return date
+        loan = loans.current_loans(self.second).get()
+        loans.renew_loan(loan.pk, loan_days=1, now=self.now)
+        self.assertEqual(send_overdue_notices(now=self.now + datetime.timedelta(days=2)), (1, 1, 0))
+
+    def test_loans_of_user_without_email_wait_for_it(self):
+        self.second.email = ''
+        self.second.save()
+        self.assertEqual(send_overdue_notices(now=self.now), (1, 3, 1))
+        self.second.email = 'second@example.com'
+        self.second.save()
+        self.assertEqual(send_overdue_notices(now=self.now), (1, 1, 0))
+        self.assertEqual(MailOutbox.objects.filter(to='second@example.com').count(), 1)
+
+
+class ImportCatalogTest(TestCase):
+    def write_file(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as stream:
+            stream.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_import_csv_and_jsonl(self):
+        Author.objects.create(author_name='Ada', author_surname='Lovelace')
+        csv_path = self.write_file('.csv', 'title,journal,pages,publishing_year,doi,author_name,author_surname\n'
+                                           'First,Nature,1-2,2020-01-01,10.1/a,Ada,Lovelace\n'
+                                           'Second,Nature,3-4,2020-01-01,10.1/b,"Ada,Alan","Lovelace,Turing"\n'
+                                           'Broken,Nature,3-4,not a date,10.1/c,Ada,Lovelace\n')
+        jsonl_path = self.write_file('.jsonl', '{"unit_type": "fiction_book", "title": "Broken",\n'
+                                               '["not", "an", "object"]\n'
+                                               '{"unit_type": "article", "title": "Negative", "journal": "J", '
+                                               '"pages": "1", "publishing_year": "2020-01-01", "doi": "d", '
+                                               '"volume": -1}\n'
+                                               '{"unit_type": "fiction_book", "title": "Third", '
+                                               '"author_name": ["Alan"], "author_surname": ["Turing"]}\n')
+        stderr = io.StringIO()
+        call_command('import_catalog', csv_path, jsonl_path, unit_type='article', batch_size=2,
+                     stdout=io.StringIO(), stderr=stderr)
+
+        self.assertIn('Line 4 skipped', stderr.getvalue())
+        self.assertIn('Line 1 skipped: Malformed JSON', stderr.getvalue())
+        self.assertIn('Line 2 skipped: Record must be an object.', stderr.getvalue())
+        self.assertIn('Line 3 skipped: Ensure this value is greater than or equal to 0.', stderr.getvalue())
+        self.assertEqual(Author.objects.count(), 2)    # no duplicates of the existing and new authors
+        second = Article.objects.get(work__title='Second')
+        self.assertEqual(sorted(str(author) for author in second.work_author.all()), ['Ada Lovelace', 'Alan Turing'])
+        self.assertEqual(FictionBook.objects.get(work__title='Third').work_author.get().author_surname, 'Turing')
+        hits, has_next = search.search_catalog('turing')
+        self.assertEqual(sorted(hit.unit.title for hit in hits), ['Second', 'Third'])
+
+    def test_import_after_soft_delete_of_last_work(self):
+        deletion.soft_delete_unit(FictionBook.objects.create(title='Deleted'))
+        jsonl_path = self.write_file('.jsonl', '{"unit_type": "fiction_book", "title": "Imported"}\n')
+        call_command('import_catalog', jsonl_path, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(list(FictionBook.objects.values_list('work__title', flat=True)), ['Imported'])
+        self.assertEqual(Work.all_objects.count(), 2)
+
+
+class ExportCatalogTest(TestCase):
+    def setUp(self):
+        self.article = Article.objects.create(title='First', journal='Nature', pages='1-2',
+                                              publishing_year=datetime.date(2020, 1, 1), doi='10.1/a')
+        self.article.work_author.add(Author.objects.create(author_name='Ada', author_surname='Lovelace'),
+                                     Author.objects.create(author_name='Alan', author_surname='Turing'))
+        FictionBook.objects.create(title='Third')
+
+    def test_export_round_trip(self):
+        stdout = io.StringIO()
+        call_command('export_catalog', format='jsonl', chunk_size=1, stdout=stdout)
+        rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([(row['unit_type'], row['title']) for row in rows],
+                         [('article', 'First'), ('fiction_book', 'Third')])
+        self.assertEqual(rows[0]['author_surname'], 'Lovelace,Turing')
+        self.assertEqual(rows[0]['publishing_year'], '2020-01-01')
+
+    def test_streaming_csv_view(self):
+        user = User.objects.create_user(username='reader', password='reader_password!')
+        self.client.force_login(user)
+        response = self.client.get(reverse('catalog_export', args=['article']))
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'unit_type,id,title,publishing_year,journal,impact_factor,volume,'
+                                   'article_number,pages,doi,author_name,author_surname')
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(self.client.get(reverse('catalog_export', args=['unknown'])).status_code, 404)
+
+
+class DetailCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='reader_password!')
+        self.client.force_login(self.user)
+        self.author = Author.objects.create(author_name='Ada', author_surname='Lovelace')
+        self.book = FictionBook.objects.create(title='Engine')
+        self.book.work_author.add(self.author)
+        self.url = reverse('detailed_info', args=['fiction_book_details', self.book.pk])
+
+    def test_warm_page_has_no_catalog_queries(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(2):    # session and user only
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Ada Lovelace')
+
+    def test_invalidation_by_signals(self):
+        self.client.get(self.url)
+        self.author.author_surname = 'Byron'
+        self.author.save()
+        self.assertContains(self.client.get(self.url), 'Ada Byron')
+
+        self.book.work_author.add(Author.objects.create(author_name='Alan', author_surname='Turing'))
+        self.assertContains(self.client.get(self.url), 'Alan Turing')
+
+        self.book.title = 'Difference engine'
+        self.book.save()
+        self.assertContains(self.client.get(self.url), 'Difference engine')
+
+    def test_listing_rows_are_cached_and_invalidated(self):
+        url = reverse('common_info', args=['fiction_books'])
+        response = self.client.get(url)
+        self.assertContains(response, 'href="' + reverse('edit_info', args=['edit_fiction_book', self.book.pk]) + '"')
+        book = FictionBook.objects.get(pk=self.book.pk)    # updated_at was moved by adding the author
+        self.assertEqual(list(detail_cache.get_rows('fiction_book', [book])), [book.pk])
+
+        self.author.author_surname = 'Byron'
+        self.author.save()
+        self.assertContains(self.client.get(url), 'Ada Byron')
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='reader_password!')
+        self.client.force_login(self.user)
+        self.author = Author.objects.create(author_name='Ada', author_surname='Lovelace')
+        self.book = FictionBook.objects.create(title='Engine')
+        self.book.work_author.add(self.author)
+
+    def test_details_not_modified_until_unit_or_author_change(self):
+        url = reverse('detailed_info', args=['fiction_book_details', self.book.pk])
+        response = self.client.get(url)
+        self.assertTrue(response.has_header('Last-Modified'))
+        etag = response['ETag']
+        with self.assertNumQueries(2):    # session and user, updated_at is stored with the cached page
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        cache.clear()
+        with self.assertNumQueries(3):    # and the updated_at lookup
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.author.author_surname = 'Byron'
+        self.author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Ada Byron')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_listing_page_changes_with_rows(self):
+        url = reverse('common_info', args=['fiction_books'])
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(3):    # session, user and the page aggregate
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.book.title = 'Difference engine'
+        self.book.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Difference engine')
+        etag = response['ETag']
+        deletion.soft_delete_unit(self.book)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class MailOutboxTest(TestCase):
+    def test_signup_only_enqueues(self):
+        city = CitiesList.objects.create(city_name='Minsk')
+        street = StreetsList.objects.create(street_name='Lenina')
+        response = self.client.post(reverse('signup'), {
+            'username': 'new_reader', 'email': 'reader@example.com', 'phone_number': 12345,
+            'pick_city': city.city_name, 'pick_street': street.street_name,
+            'user_building_number': 1, 'user_apartment_number': 2,
+            'password1': 'long_password!1', 'password2': 'long_password!1'})
+        self.assertContains(response, 'Confirm your email address')
+        self.assertEqual(len(mail.outbox), 0)
+        queued = MailOutbox.objects.get()
+        self.assertEqual(queued.to, 'reader@example.com')
+
+        self.assertEqual(mail_outbox.send_batch(), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Account activation.')
+        self.assertEqual(MailOutbox.objects.get().status, MailOutbox.STATUS_SENT)
+        self.assertEqual(mail_outbox.send_batch(), 0)
+
+    def test_password_reset_only_enqueues(self):
+        User.objects.create_user(username='reader', email='reader@example.com', password='reader_password!')
+        self.client.post(reverse('password_reset'), {'email': 'reader@example.com'})
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(MailOutbox.objects.get().to, 'reader@example.com')
+
+    def test_retry_with_backoff(self):
+        mail_outbox.enqueue_mail('Subject', 'Body', ['reader@example.com'])
+        with mock.patch.object(mail_outbox.EmailMessage, 'send', side_effect=OSError('server is down')):
+            self.assertEqual(mail_outbox.send_batch(), 0)
+        message = MailOutbox.objects.get()
+        self.assertEqual((message.status, message.attempts, message.last_error),
+                         (MailOutbox.STATUS_QUEUED, 1, 'server is down'))
+        self.assertGreater(message.next_attempt_at, timezone.now())
+        self.assertEqual(mail_outbox.send_batch(), 0)    # not due yet
+
+        self.assertEqual(mail_outbox.send_batch(now=message.next_attempt_at), 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        metrics.reset_all()
+        self.addCleanup(metrics.reset_all)
+
+    def test_metrics_by_view_name(self):
+        user = User.objects.create_user(username='reader', password='reader_password!')
+        self.client.force_login(user)
+        self.client.get(reverse('common_info', args=['articles']))
+
+        self.assertEqual(self.client.get(reverse('request_metrics')).status_code, 302)    # staff only
+        user.is_staff = True
+        user.save()
+        exposed = self.client.get(reverse('request_metrics')).content.decode()
+        self.assertIn('elibrary_request_duration_seconds_count{view="common_info"} 1', exposed)
+        self.assertIn('elibrary_request_db_queries_bucket{view="common_info",le="5.0"} 1', exposed)
+        self.assertIn('elibrary_request_template_duration_seconds_count{view="common_info"} 1', exposed)
+        self.assertIn('elibrary_response_size_bytes_count{view="common_info"} 1', exposed)
+
+    @override_settings(REQUEST_QUERY_BUDGET=1)
+    def test_query_budget_warning(self):
+        user = User.objects.create_user(username='reader', password='reader_password!')
+        self.client.force_login(user)
+        with self.assertLogs('accounting.middleware', 'WARNING'):
+            self.client.get(reverse('common_info', args=['articles']))
+
+
+class ASGIExportTest(TransactionTestCase):
+    def test_export_is_streamed_to_the_end(self):
+        user = User.objects.create_user(username='reader', password='reader_password!')
+        for number in range(5):
+            book = FictionBook.objects.create(title='Book ' + str(number))
+            book.work_author.add(Author.objects.create(author_name='Name', author_surname=str(number)))
+        client = Client()
+        client.force_login(user)
+        cookie = settings.SESSION_COOKIE_NAME + '=' + client.cookies[settings.SESSION_COOKIE_NAME].value
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        application = BoundedThreadPoolApplication(StreamingASGIHandler(), 2)
+        path = reverse('catalog_export', args=['fiction_book'])
+        # export chunk size 2: cursor iteration and authors queries between the chunks in the streaming thread
+        with mock.patch('accounting.views.export_lines', partial(export_lines, chunk_size=2)):
+            asyncio.run(application(asgi_scope(path, cookie), receive, send))
+        self.assertEqual(messages[0]['status'], 200)
+        lines = b''.join(message.get('body', b'') for message in messages[1:]).decode().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertIn('Book 4', lines[-1])
+        self.assertNotIn('more_body', messages[-1])
+
+
+class BenchmarkTest(TestCase):
+    def test_scenarios_and_baseline_compare(self):
+        generator = CatalogGenerator(authors=20, units_per_type=5, users=3, seed=7)
+        generator.generate()
+        self.assertEqual(Article.objects.count(), 5)
+
+        results = run_benchmarks(generator, iterations=2)
+        self.assertEqual(set(results['scenarios']),
+                         {'listing', 'detail', 'edit', 'add', 'delete', 'signup', 'profile'})
+        self.assertEqual(compare(results, results), [])
+        slower = {'scenarios': {'listing': dict(results['scenarios']['listing'], p95_ms=0.0, queries=0)}}
+        self.assertEqual(len(compare(results, slower)), 2)
+
+
+class ExplainHotQueriesTest(TestCase):
+    def test_hot_paths_are_index_driven(self):
+        generator = CatalogGenerator(authors=20, units_per_type=5, users=3, seed=7)
+        generator.generate()
+        results = explain_hot_queries(generator)
+        self.assertIn('search', results)
+        for name, explained in results.items():
+            self.assertTrue(explained, name)
+            self.assertEqual([query['sql'] for query in explained if query['full_scans']], [], name)
+
+
+class AdminTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='admin_password!', email='')
+        self.client.force_login(self.admin)
+
+    def add_address(self, number):
+        user = User.objects.create_user(username='reader' + str(number), password='reader_password!')
+        LibraryUserAddress.objects.create(
+            library_user=LibraryUserInfo.objects.create(library_user=user, phone_number=number),
+            building_number=1, apartment_number=number,
+            city_name=CitiesList.objects.get_or_create(city_name='City ' + str(number % 2))[0],
+            street_name=StreetsList.objects.get_or_create(street_name='Street ' + str(number % 2))[0])
+
+    def test_changelist_queries_do_not_depend_on_rows(self):
+        url = reverse('admin:accounting_libraryuseraddress_changelist')
+        self.add_address(1)
+        with CaptureQueriesContext(connection) as first:
+            self.assertContains(self.client.get(url), 'reader1')
+        for number in range(2, 6):
+            self.add_address(number)
+        with CaptureQueriesContext(connection) as second:
+            self.assertContains(self.client.get(url), 'reader5')
+        self.assertEqual(len(first), len(second))
+
+    def test_author_autocomplete_by_prefix(self):
+        for name, surname in [('Alan', 'Turing'), ('Ada', 'Lovelace'), ('Saturnin', 'Petrov')]:
+            Author.objects.create(author_name=name, author_surname=surname)
+        response = self.client.get(reverse('admin:accounting_author_autocomplete'), {'term': 'tur'})
+        self.assertEqual([result['text'] for result in response.json()['results']], ['Alan Turing'])
+        response = self.client.get(reverse('admin:accounting_author_autocomplete'), {'term': 'a l'})
+        self.assertEqual([result['text'] for result in response.json()['results']], ['Ada Lovelace'])
+
+    def test_estimated_count_paginator(self):
+        authors = Author.objects.bulk_create([Author(author_name='Name', author_surname=str(number))
+                                              for number in range(5)])
+        Author.objects.filter(author_surname='0').delete()
+        largest_pk = Author.objects.order_by('-pk').values_list('pk', flat=True)[0]
+        with mock.patch.object(pagination, 'ESTIMATE_THRESHOLD', 0), \
+                mock.patch.object(pagination, 'FILTERED_COUNT_LIMIT', 2):
+            self.assertEqual(pagination.EstimatedCountPaginator(Author.objects.order_by('pk'), 2).count, largest_pk)
+            filtered = Author.objects.filter(author_name='Name').order_by('pk')
+            paginator = pagination.EstimatedCountPaginator(filtered, 1, filtered=True)
+            self.assertEqual(paginator.count, 2)
+            self.assertTrue(paginator.count_is_lower_bound)
+            # counted up to the page after the requested one
+            self.assertEqual(pagination.EstimatedCountPaginator(filtered, 1, filtered=True, page_number=3).count, 4)
+        self.assertEqual(pagination.EstimatedCountPaginator(Author.objects.order_by('pk'), 2).count, len(authors) - 1)
+
+    def test_filtered_changelist_pages_after_count_limit(self):
+        for number in range(7):
+            FictionBook.objects.create(title='Engine ' + str(number))
+        url = reverse('admin:accounting_work_changelist')
+        with mock.patch.object(pagination, 'ESTIMATE_THRESHOLD', 0), \
+                mock.patch.object(pagination, 'FILTERED_COUNT_LIMIT', 2), \
+                mock.patch('accounting.admin.WorkAdmin.list_per_page', 2):
+            # deleted_at condition of the manager isn't a user filter: estimate, no limit
+            response = self.client.get(url)
+            self.assertFalse(response.context['cl'].paginator.count_is_lower_bound)
+            self.assertEqual(response.context['cl'].result_count, Work.all_objects.order_by('-pk')[0].pk)
+
+            response = self.client.get(url, {'q': 'engine'})
+            self.assertEqual(response.context['cl'].result_count, 4)
+            self.assertContains(response, 'More than 4 rows match')
+            response = self.client.get(url, {'q': 'engine', 'p': 3})    # the last page, beyond the limit
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([work.title for work in response.context['cl'].result_list], ['Engine 6'])
+
+
+class DatabaseSettingsTest(SimpleTestCase):
+    databases = {'default'}
+
+    def test_profiles_from_environment(self):
+        sqlite = database_settings('/srv', environ={})
+        self.assertEqual(sqlite['NAME'], os.path.join('/srv', 'db.sqlite3'))
+        self.assertEqual(sqlite['OPTIONS'], {'transaction_mode': 'IMMEDIATE'})
+        self.assertGreater(sqlite['CONN_MAX_AGE'], 0)
+        postgresql = database_settings('/srv', environ={'ELIBRARY_DB_ENGINE': 'postgresql', 'ELIBRARY_DB_NAME': 'lib',
+                                                        'ELIBRARY_DB_CONN_MAX_AGE': '30', 'ELIBRARY_DB_POOLER': '1'})
+        self.assertEqual(postgresql['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((postgresql['NAME'], postgresql['CONN_MAX_AGE']), ('lib', 30))
+        self.assertTrue(postgresql['DISABLE_SERVER_SIDE_CURSORS'])
+        with self.assertRaises(ValueError):
+            database_settings('/srv', environ={'ELIBRARY_DB_ENGINE': 'oracle'})
+
+    def test_sqlite_connection_tuning(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            pass
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    def test_parallel_writers_benchmark(self):
+        results = compare_sqlite_profiles(writers=2, readers=1, transactions=5)
+        self.assertEqual(set(results), {'default', 'tuned'})
+        self.assertEqual(results['tuned']['committed'], 10)
+        self.assertEqual(results['tuned']['errors'], 0)
+
+
+class AddressLookupTest(TestCase):
+    def setUp(self):
+        for index in ADDRESS_INDEXES.values():
+            index.invalidate()    # rows of the other tests are rolled back without signals
+
+    def test_prefix_lookup_follows_saves(self):
+        CitiesList.objects.create(city_name='Minsk')
+        CitiesList.objects.create(city_name='Mogilev')
+        CitiesList.objects.create(city_name='Brest')
+        url = reverse('address_lookup', args=['city'])
+        self.assertEqual([city['name'] for city in self.client.get(url, {'q': 'm'}).json()['results']],
+                         ['Minsk', 'Mogilev'])
+        CitiesList.objects.create(city_name='Molodechno')
+        self.assertEqual([city['name'] for city in self.client.get(url, {'q': 'mo'}).json()['results']],
+                         ['Mogilev', 'Molodechno'])
+        self.assertEqual(len(self.client.get(url, {'q': 'm', 'page_size': 1}).json()['results']), 1)
+        self.assertEqual(self.client.get(reverse('address_lookup', args=['country'])).status_code, 404)
+
+    def test_signup_page_has_no_options(self):
+        for number in range(20):
+            StreetsList.objects.create(street_name='Street ' + str(number))
+        response = self.client.get(reverse('signup'))
+        self.assertNotContains(response, 'Street 1')
+
+    def test_add_city_reuses_existing_name(self):
+        user = User.objects.create_user(username='reader', password='reader_password!', email='a@example.com')
+        user_info = LibraryUserInfo.objects.create(library_user=user, phone_number=12345)
+        LibraryUserAddress.objects.create(library_user=user_info, building_number=1, apartment_number=1)
+        city = CitiesList.objects.create(city_name='Minsk')
+        self.client.force_login(user)
+        self.client.post(reverse('profile_edit'), {'email': 'a@example.com', 'phone_number': 12345,
+                                                   'add_city': 'minsk', 'add_street': '',
+                                                   'user_building_number': 1, 'user_apartment_number': 1})
+        self.assertEqual(CitiesList.objects.count(), 1)
+        self.assertEqual(LibraryUserAddress.objects.get().city_name, city)
+
+
+class ProfileTest(TestCase):
+    def setUp(self):
+        cache.clear()    # cached profiles of the other tests' rolled back users
+        self.user = User.objects.create_user(username='reader', password='reader_password!', email='a@example.com')
+        user_info = LibraryUserInfo.objects.create(library_user=self.user, phone_number=12345)
+        LibraryUserAddress.objects.create(library_user=user_info, building_number=1, apartment_number=2,
+                                          city_name=CitiesList.objects.create(city_name='Minsk'),
+                                          street_name=StreetsList.objects.create(street_name='Lenina'))
+        self.client.force_login(self.user)
+
+    def test_one_info_per_user(self):
+        with self.assertRaises(IntegrityError):
+            LibraryUserInfo.objects.create(library_user=self.user, phone_number=2)
+
+    def test_profile_is_one_query_then_cached(self):
+        with self.assertNumQueries(3):    # session, user, profile
+            self.client.get(reverse('profile_details'))
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('profile_details'))
+        self.assertContains(response, 'Minsk')
+
+        city = CitiesList.objects.get(city_name='Minsk')
+        city.city_name = 'Minsk City'
+        city.save()
+        self.assertContains(self.client.get(reverse('profile_details')), 'Minsk City')
+
+    def test_edit_writes_only_changed_columns(self):
+        data = {'email': 'a@example.com', 'phone_number': 12345, 'user_building_number': 1,
+                'user_apartment_number': 2}
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('profile_edit'), data)
+        self.assertEqual([query['sql'] for query in queries if query['sql'].startswith('UPDATE')], [])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('profile_edit'), dict(data, phone_number=54321))
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('SET "phone_number" = 54321', updates[0])
+        self.assertContains(self.client.get(reverse('profile_details')), '54321')
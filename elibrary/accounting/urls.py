@@ -10,6 +10,9 @@ urlpatterns = [
     url(r'^activate/(?P<uidb64>[0-9A-Za-z_\-]+)/(?P<token>[0-9A-Za-z]{1,13}-[0-9A-Za-z]{1,20})/$',
         views.activate,
         name='activate'),
+    path('lookup/<str:address_part>/',
+         views.address_lookup,
+         name='address_lookup'),
     path('profile_details/',
          views.profile_detail,
          name='profile_details'),
@@ -19,6 +22,24 @@ urlpatterns = [
     path('common_info/<str:unit_type>/',
          views.common_library_unit_info,
          name='common_info'),
+    path('search/',
+         views.catalog_search,
+         name='catalog_search'),
+    path('export/<str:unit_type>/',
+         views.catalog_export,
+         name='catalog_export'),
+    path('metrics/',
+         views.request_metrics,
+         name='request_metrics'),
+    path('authors/',
+         views.author_list,
+         name='author_list'),
+    path('authors/<int:author_id>/',
+         views.author_detail,
+         name='author_detail'),
+    path('stats/',
+         views.stats_dashboard,
+         name='stats_dashboard'),
     path('<str:unit_type>/<int:unit_number>/',
          views.library_unit_details,
          name='detailed_info'),
@@ -1,14 +1,29 @@
 from django.shortcuts import render, redirect
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse, Http404, JsonResponse
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.sites.shortcuts import get_current_site
 from django.utils.encoding import force_bytes, force_text
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.template.loader import render_to_string
-from django.core.mail import EmailMessage
+from django.views.decorators.http import condition
 from .tokens import account_activation_token
-from .forms import SignupForm, ProfileInfoEdit, ArticleInfo, FictionBookInfo, ScienceBookInfo
+from .forms import SignupForm, ProfileInfoEdit, ArticleInfo, FictionBookInfo, ScienceBookInfo, CatalogSearchForm, \
+    AuthorFormSet
+from .pagination import get_page_size, get_cursor, get_page_number, keyset_page
+from .search import search_catalog, UNIT_MODELS
+from .catalog_io import export_lines
+from .mail_outbox import enqueue_mail
+from .metrics import expose_all
+from .address_lookup import ADDRESS_INDEXES
+from .detail_cache import DETAIL_UNIT_TYPES, get_details, set_details
+from .catalog_rows import LIST_UNIT_TYPES, render_rows
+from .conditional import page_etag, unit_etag, unit_updated_at
+from .authors import author_ids_by_name, update_work_authors
+from .deletion import DeletionError, soft_delete_unit
+from .profiles import load_profile, save_changed
+from . import stats
 from .models import *
 
 
@@ -24,7 +39,7 @@ def signup(request):
             user_info.save()
             current_city = city_street_checker(form, model_type=CitiesList, address_part='city')
             current_street = city_street_checker(form, model_type=StreetsList, address_part='street')
-            user_address = LibraryUserAddress(library_user=LibraryUserInfo.objects.get(library_user=user),
+            user_address = LibraryUserAddress(library_user=user_info,
                                               city_name=current_city,
                                               street_name=current_street,
                                               building_number=form.cleaned_data.get('user_building_number'),
@@ -39,8 +54,7 @@ def signup(request):
                 'token': account_activation_token.make_token(user),
             })
             to_email = form.cleaned_data.get('email')
-            email = EmailMessage(mail_subject, message, to=[to_email])
-            email.send()
+            enqueue_mail(mail_subject, message, [to_email])    # sent by 'run_mail_worker' command
             return HttpResponse('Confirm your email address to finalize registration process, please!')
     else:
         form = SignupForm()
@@ -48,29 +62,26 @@ def signup(request):
 
 
 def city_street_checker(signup_form, model_type, address_part):
-
-    pick_field = 'pick_' + address_part
-    add_field = 'add_' + address_part
-    field_name = address_part + '_name'
-    pick_field_data = signup_form.cleaned_data.get(pick_field)
-    add_field_data = signup_form.cleaned_data.get(add_field)
-    # city/street name input check
-    if pick_field_data and not add_field_data:
-        selected_city_street = model_type.objects.get(**{field_name: pick_field_data})
-    elif not pick_field_data and add_field_data:
-        city_street_form_info = str(add_field_data.capitalize())
-        # check if user tries to add existing city/street name
-        try:
-            selected_city_street = model_type.objects.get(**{field_name: city_street_form_info})
-        except:
-            new_city = model_type(**{field_name: city_street_form_info})
-            new_city.save()
-            selected_city_street = model_type.objects.get(**{field_name: city_street_form_info})
-    else:
-        # if used both 'pick' and 'add' city, 'pick' will be prioritized
-        selected_city_street = model_type.objects.get(**{field_name: pick_field_data})
-
-    return selected_city_street
+    pick_field_data = signup_form.cleaned_data.get('pick_' + address_part)    # model instance
+    add_field_data = signup_form.cleaned_data.get('add_' + address_part)
+    # if used both 'pick' and 'add' city, 'pick' will be prioritized
+    if pick_field_data:
+        return pick_field_data
+    if add_field_data:
+        # name is unique, so concurrent signups with the same new city get the same row
+        selected_city_street, created = model_type.objects.get_or_create(
+            **{address_part + '_name': str(add_field_data.capitalize())})
+        return selected_city_street
+    return None
+
+
+def address_lookup(request, address_part):
+    # typeahead for the city/street inputs of the signup page, so no login is required
+    if address_part not in ADDRESS_INDEXES:
+        raise Http404('Unknown address part.')
+    limit = get_page_size(request, default=10, maximum=50)
+    found = ADDRESS_INDEXES[address_part].search(request.GET.get('q', ''), limit=limit)
+    return JsonResponse({'results': [{'id': pk, 'name': name} for pk, name in found]})
 
 
 def activate(request, uidb64, token):
@@ -90,42 +101,122 @@ def activate(request, uidb64, token):
 
 @login_required
 def profile_detail(request):
-    user = request.user
-    try:
-        user_info = LibraryUserInfo.objects.get(library_user=user)
-    except:
-        user_info = None
-        print("No info for user "+str(user))
-
-    try:
-        user_address = LibraryUserAddress.objects.get(library_user=user_info)
-    except:
-        user_address = None
-        print("No address info for user "+str(user_info.library_user))
-
+    # info, address, city and street are one cached query (see accounting.profiles)
+    user_info, user_address = load_profile(request.user)
     return render(request, 'profile_details.html', {'user_info': user_info,
                                                     'user_address': user_address})
 
 
 @login_required
+@condition(etag_func=page_etag)    # 304 for the unchanged page without loading or rendering it
 def common_library_unit_info(request, unit_type):
-    all_articles = all_science_books = all_fiction_books = None
-    if unit_type == 'articles':
-        all_articles = Article.objects.all()
-    elif unit_type == 'science_books':
-        all_science_books = ScienceBook.objects.all()
-    elif unit_type == 'fiction_books':
-        all_fiction_books = FictionBook.objects.all()
+    rows = []
+    next_cursor = None
+    page_size = get_page_size(request)
+    cursor = get_cursor(request)
+    if unit_type in LIST_UNIT_TYPES:
+        units, next_cursor = keyset_page(UNIT_MODELS[LIST_UNIT_TYPES[unit_type]].objects.all(),
+                                         after=cursor, page_size=page_size)
+        # rows are rendered (and authors fetched with one batched query) only when they aren't cached
+        rows = render_rows(LIST_UNIT_TYPES[unit_type], units)
+
+    return render(request, 'common_info_view.html', {'rows': rows,
+                                                     'unit_type': unit_type,
+                                                     'page_size': page_size,
+                                                     'cursor': cursor,
+                                                     'next_cursor': next_cursor})
+
+
+@login_required
+def catalog_search(request):
+    hits = []
+    has_next = False
+    query = unit_type = ''
+    page = get_page_number(request)
+    form = CatalogSearchForm(request.GET or None)
+    if form.is_valid():
+        query = form.cleaned_data.get('q')
+        unit_type = form.cleaned_data.get('unit_type')
+        hits, has_next = search_catalog(query, unit_type=unit_type or None,
+                                        page=page, page_size=get_page_size(request, default=20))
+
+    return render(request, 'catalog_search.html', {'form': form,
+                                                   'query': query,
+                                                   'unit_type': unit_type,
+                                                   'hits': hits,
+                                                   'page': page,
+                                                   'has_next': has_next})
+
+
+@login_required
+def catalog_export(request, unit_type):
+    # rows are produced lazily while the response is sent, so the first byte doesn't wait for the whole catalog
+    if unit_type == 'all':
+        unit_types = list(UNIT_MODELS)
+    elif unit_type in UNIT_MODELS:
+        unit_types = [unit_type]
+    else:
+        raise Http404('Unknown unit type.')
+    file_format = 'jsonl' if request.GET.get('format') == 'jsonl' else 'csv'
+    content_type = 'application/x-ndjson' if file_format == 'jsonl' else 'text/csv'
+
+    response = StreamingHttpResponse(export_lines(unit_types, file_format), content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="catalog_' + unit_type + '.' + file_format + '"'
+    return response
+
+
+@staff_member_required
+def request_metrics(request):
+    return HttpResponse(expose_all(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@login_required
+def author_list(request):
+    # bibliography summary is joined, one query per page whatever number of works the authors have
+    page_size = get_page_size(request)
+    cursor = get_cursor(request)
+    surname = request.GET.get('surname', '').strip()
+    authors = Author.objects.select_related('bibliography')
+    if surname:
+        # prefix range of author_surname_idx
+        authors = authors.filter(author_surname__gte=surname, author_surname__lt=surname + '\uffff')
+    authors, next_cursor = keyset_page(authors, after=cursor, page_size=page_size)
+    return render(request, 'author_list.html', {'authors': authors,
+                                                'surname': surname,
+                                                'page_size': page_size,
+                                                'cursor': cursor,
+                                                'next_cursor': next_cursor})
 
-    return render(request, 'common_info_view.html', {'all_articles': all_articles,
-                                                     'all_science_books': all_science_books,
-                                                     'all_fiction_books': all_fiction_books})
+
+@login_required
+def author_detail(request, author_id):
+    author = Author.objects.select_related('bibliography').filter(pk=author_id).first()
+    if author is None:
+        raise Http404('Author does not exist.')
+    page = get_page_number(request)
+    page_size = get_page_size(request, default=20)
+    # works of all types with their extensions by one query, one extra row tells if the next page exists
+    works = list(Work.objects.by_author(author).recent().select_related(*WORK_EXTENSION_ACCESSORS.values())
+                 [(page - 1) * page_size:page * page_size + 1])
+    has_next = len(works) > page_size
+    works = [(work, work.work_type + '_details', work.extension.pk) for work in works[:page_size]]
+    return render(request, 'author_detail.html', {'author': author,
+                                                  'works': works,
+                                                  'page': page,
+                                                  'has_next': has_next})
+
+
+@staff_member_required
+def stats_dashboard(request):
+    # summary counters only, no COUNT/GROUP BY over the loan history
+    return render(request, 'stats_dashboard.html', stats.dashboard(days=30))
 
 
 @login_required
 def profile_edit(request):
-    user_info = LibraryUserInfo.objects.get(library_user=request.user)
-    user_address = LibraryUserAddress.objects.get(library_user=user_info)
+    user_info, user_address = load_profile(request.user)
+    if user_info is None or user_address is None:
+        raise Http404('User has no profile info.')
     initial_data = {'email': request.user.email,
                     'phone_number': user_info.phone_number,
                     'user_building_number': user_address.building_number,
@@ -133,28 +224,33 @@ def profile_edit(request):
 
     if request.method == 'POST':
         form = ProfileInfoEdit(request.POST, initial=initial_data)
-        if form.has_changed():
-            if form.is_valid():
-                changed_fields = form.changed_data
-                for current_field in changed_fields:
-                    new_field_data = form.cleaned_data.get(current_field)
-                    if current_field == 'email':
-                        request.user.email = new_field_data
-                    elif current_field == 'phone_number':
-                        user_info.phone_number = new_field_data
-                    elif current_field == 'add_city':
-                        current_city = city_street_checker(form, model_type=CitiesList, address_part='city')
-                        user_address.city_name = current_city
-                    elif current_field == 'add_street':
-                        current_street = city_street_checker(form, model_type=StreetsList, address_part='street')
-                        user_address.street_name = current_street
-                    elif current_field == 'user_building_number':
-                        user_address.building_number = new_field_data
-                    elif current_field == 'user_apartment_number':
-                        user_address.apartment_number = new_field_data
-            request.user.save()
-            user_info.save()
-            user_address.save()
+        if form.has_changed() and form.is_valid():
+            # only the changed columns of the changed models are written
+            user_fields, info_fields, address_fields = [], [], []
+            for current_field in form.changed_data:
+                new_field_data = form.cleaned_data.get(current_field)
+                if current_field == 'email':
+                    request.user.email = new_field_data
+                    user_fields.append('email')
+                elif current_field == 'phone_number':
+                    user_info.phone_number = new_field_data
+                    info_fields.append('phone_number')
+                elif current_field == 'add_city':
+                    user_address.city_name = city_street_checker(form, model_type=CitiesList, address_part='city')
+                    address_fields.append('city_name')
+                elif current_field == 'add_street':
+                    user_address.street_name = city_street_checker(form, model_type=StreetsList,
+                                                                   address_part='street')
+                    address_fields.append('street_name')
+                elif current_field == 'user_building_number':
+                    user_address.building_number = new_field_data
+                    address_fields.append('building_number')
+                elif current_field == 'user_apartment_number':
+                    user_address.apartment_number = new_field_data
+                    address_fields.append('apartment_number')
+            save_changed(request.user, user_fields)
+            save_changed(user_info, info_fields)    # cached profile is dropped by signals
+            save_changed(user_address, address_fields)
     else:
         form = ProfileInfoEdit(initial=initial_data)
 
@@ -162,104 +258,77 @@ def profile_edit(request):
 
 
 @login_required()
+@condition(etag_func=unit_etag, last_modified_func=unit_updated_at)
 def library_unit_details(request, unit_type, unit_number):
+    # rendered page doesn't depend on the user, so it is cached per unit and dropped by signals on any change
+    cache_unit_type = DETAIL_UNIT_TYPES.get(unit_type)
+    if cache_unit_type:
+        cached = get_details(cache_unit_type, unit_number)
+        if cached is not None:
+            return HttpResponse(cached[1])
+
     current_article = current_science_book = current_fiction_book = None
     if unit_type == 'article_details':
-        current_article = Article.objects.get(pk=unit_number)
+        current_article = Article.objects.prefetch_related('work__work_author').get(pk=unit_number)
     elif unit_type == 'science_book_details':
-        current_science_book = ScienceBook.objects.get(pk=unit_number)
+        current_science_book = ScienceBook.objects.prefetch_related('work__work_author').get(pk=unit_number)
     elif unit_type == 'fiction_book_details':
-        current_fiction_book = FictionBook.objects.get(pk=unit_number)
+        current_fiction_book = FictionBook.objects.prefetch_related('work__work_author').get(pk=unit_number)
 
-    return render(request, 'library_unit_details.html', {'current_article': current_article,
-                                                         'current_science_book': current_science_book,
-                                                         'current_fiction_book': current_fiction_book})
+    content = render_to_string('library_unit_details.html', {'current_article': current_article,
+                                                             'current_science_book': current_science_book,
+                                                             'current_fiction_book': current_fiction_book},
+                               request)
+    current_unit = current_article or current_science_book or current_fiction_book
+    if cache_unit_type:
+        set_details(cache_unit_type, unit_number, current_unit.updated_at, content)
+    return HttpResponse(content)
 
 
 @login_required()
 def library_unit_edit(request, unit_type, unit_number):
     form = None
-    current_unit = None
+    current_unit = form_class = None
 
     if unit_type == 'edit_article':
         current_unit = Article.objects.get(pk=unit_number)
+        form_class = ArticleInfo
     elif unit_type == 'edit_fiction_book':
         current_unit = FictionBook.objects.get(pk=unit_number)
+        form_class = FictionBookInfo
     elif unit_type == 'edit_science_book':
         current_unit = ScienceBook.objects.get(pk=unit_number)
+        form_class = ScienceBookInfo
 
     all_fields = current_unit._meta.get_fields()
     initial_data = {current_field.name: getattr(current_unit, current_field.name) for current_field in all_fields
-                    if current_field.name != 'libraryunit'    # not displayed
-                    and current_field.name != 'id'            # not displayed
-                    and current_field.name != 'work_author'}  # need to prepare
-    # preparing lists with authors names and surnames
-    current_authors = current_unit.work_author.all()
-    author_name = []
-    author_surname = []
-    for each_author in current_authors:
-        author_name.append(each_author.author_name)
-        author_surname.append(each_author.author_surname)
-
-    initial_data.update({'author_name': author_name,
-                         'author_surname': author_surname})    # complete initial library unit dict for the form
+                    if current_field.name != 'work'           # common fields are added below
+                    and current_field.name != 'id'}           # not displayed
+    initial_data.update({field_name: getattr(current_unit, field_name) for field_name in current_unit.work_fields})
+    # authors are edited by formset rows keyed by author id
+    current_authors = list(current_unit.work_author.all())
+    authors_initial = [{'id': author.pk, 'author_name': author.author_name, 'author_surname': author.author_surname}
+                       for author in current_authors]
 
     if request.method == 'POST':
-        if unit_type == 'edit_article':
-            form = ArticleInfo(request.POST, initial=initial_data)
-        elif unit_type == 'edit_fiction_book':
-            form = FictionBookInfo(request.POST, initial=initial_data)
-        elif unit_type == 'edit_science_book':
-            form = ScienceBookInfo(request.POST, initial=initial_data)
-
-        if form.has_changed():
-            if form.is_valid():
-                changed_fields = form.changed_data
-                for field_to_save in changed_fields:
-                    if field_to_save != 'author_name' and field_to_save != 'author_surname':
-                        setattr(current_unit, field_to_save, form.cleaned_data.get(field_to_save))
-                # parse name from form field
-                item = 0
-                db_index = 0
-                for name in form.cleaned_data.get('author_name').split("\'"):
-                    # first is '[', second is name, third is ',' etc.
-                    if item % 2:
-                        current_authors[db_index].author_name = name
-                        db_index += 1
-                    item += 1
-
-                # parse surname from form field
-                item = 0
-                db_index = 0
-                for surname in form.cleaned_data.get('author_surname').split("\'"):
-                    # first is '[', second is name, third is ',' etc.
-                    if item % 2:
-                        current_authors[db_index].author_surname = surname
-                        db_index += 1
-                    item += 1
-
-                # updating authors in the DB
-                for author in range(len(current_authors)):
-                    Author.objects.filter(author_name=author_name[author]).\
-                        filter(author_surname=author_surname[author]).\
-                        update(author_name=current_authors[author].author_name)
-                    Author.objects.filter(author_name=author_name[author]).\
-                        filter(author_surname=author_surname[author]).\
-                        update(author_surname=current_authors[author].author_surname)
-
-            current_unit.save()
-            current_authors.update()
+        form = form_class(request.POST, initial=initial_data, with_authors=False)
+        author_formset = AuthorFormSet(request.POST, initial=authors_initial, prefix='authors')
+        if form.is_valid() and author_formset.is_valid():
+            if form.has_changed():
+                for field_to_save in form.changed_data:
+                    setattr(current_unit, field_to_save, form.cleaned_data.get(field_to_save))
+                current_unit.save()
+            if author_formset.has_changed():
+                update_work_authors(current_unit.work, current_authors, author_formset.cleaned_data)
+            return redirect('edit_info', unit_type=unit_type, unit_number=unit_number)
     else:
-        if unit_type == 'edit_article':
-            form = ArticleInfo(initial=initial_data)
-        elif unit_type == 'edit_fiction_book':
-            form = FictionBookInfo(initial=initial_data)
-        elif unit_type == 'edit_science_book':
-            form = ScienceBookInfo(initial=initial_data)
+        form = form_class(initial=initial_data, with_authors=False)
+        author_formset = AuthorFormSet(initial=authors_initial, prefix='authors')
 
     unit_type_title = unit_type.replace('_', ' ')    # prepare unit_type argument for the page title
     unit_type_title = unit_type_title.title()
     return render(request, 'library_unit_edit.html', {'form': form,
+                                                      'author_formset': author_formset,
                                                       'unit_type': unit_type_title})
 
 
@@ -279,20 +348,13 @@ def library_unit_add(request, unit_type):
 
         if form.is_valid():
             unit_fields = {}
-            new_unit = unit_model(id=unit_model.objects.all().count())
             for current_field in form.fields:
-                # author name, surname parsing and storing
+                # author name, surname parsing
                 if current_field == 'author_name':
                     name_string = form.cleaned_data.get('author_name').split(",")
                     surname_string = form.cleaned_data.get('author_surname').split(",")
-                    i = 0
-                    new_work_authors = []
-                    for one_name in name_string:
-                        new_author = None
-                        new_author = Author(author_name=one_name, author_surname=surname_string[i])
-                        new_work_authors.append(new_author)
-                        new_author.save()   # need to be reviewed! too many DB access
-                        i += 1
+                    # existing authors are reused, (name, surname) lookup is author_surname_idx seek
+                    new_work_authors = author_ids_by_name(zip(name_string, surname_string)).values()
                 # library unit fields preparing for save
                 elif current_field != 'author_name' and current_field != 'author_surname':
                     unit_fields.update({current_field: form.cleaned_data.get(current_field)})
@@ -322,7 +384,13 @@ def library_unit_delete(request, unit_type, unit_number):
     elif unit_type == 'delete_fiction_book':
         current_unit = FictionBook.objects.get(pk=unit_number)
 
+    error = None
     if current_unit:
-        current_unit.delete()
+        # tombstone only, the work with its copies and loan history is removed by 'purge_deleted' command
+        try:
+            soft_delete_unit(current_unit)
+        except DeletionError as exc:
+            error = str(exc)
 
-    return render(request, 'library_unit_delete.html', {'current_unit': current_unit})
+    return render(request, 'library_unit_delete.html', {'current_unit': current_unit,
+                                                        'error': error})
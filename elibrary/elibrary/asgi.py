@@ -9,8 +9,13 @@ https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.conf import settings
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'elibrary.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)    # what get_asgi_application() does, with the streaming safe handler below
+
+from accounting.asgi import BoundedThreadPoolApplication, StreamingASGIHandler    # noqa: E402, apps are loaded
+
+application = BoundedThreadPoolApplication(StreamingASGIHandler(), settings.ASGI_THREADS)
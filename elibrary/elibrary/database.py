@@ -0,0 +1,66 @@
+"""
+Database settings of the elibrary project from the environment variables.
+
+ELIBRARY_DB_ENGINE     'sqlite' (default) or 'postgresql'
+ELIBRARY_DB_NAME       SQLite file path or PostgreSQL database name
+ELIBRARY_DB_HOST, ELIBRARY_DB_PORT, ELIBRARY_DB_USER, ELIBRARY_DB_PASSWORD    PostgreSQL connection
+ELIBRARY_DB_CONN_MAX_AGE    seconds of the persistent connection life, 0 closes it after every request
+ELIBRARY_DB_HEALTH_CHECKS   '1' (default) checks the persistent connection before it is used by the request
+ELIBRARY_DB_POOLER          '1' if PostgreSQL is behind pgbouncer in transaction pooling mode
+ELIBRARY_SQLITE_BUSY_TIMEOUT, ELIBRARY_SQLITE_CACHE_SIZE, ELIBRARY_SQLITE_MMAP_SIZE    SQLite PRAGMA values
+ELIBRARY_SQLITE_TRANSACTION_MODE    BEGIN mode of the SQLite transactions, IMMEDIATE by default
+"""
+
+import os
+
+SQLITE_CONN_MAX_AGE = 60
+POSTGRESQL_CONN_MAX_AGE = 600
+
+
+def env_flag(environ, name, default):
+    return environ.get(name, '1' if default else '0').lower() in ('1', 'true', 'yes', 'on')
+
+
+def database_settings(base_dir, environ=os.environ):
+    """DATABASES['default'] of the configured profile."""
+    engine = environ.get('ELIBRARY_DB_ENGINE', 'sqlite')
+    if engine == 'sqlite':
+        return {
+            'ENGINE': 'accounting.sqlite_backend',    # django.db.backends.sqlite3 with transaction_mode
+            'NAME': environ.get('ELIBRARY_DB_NAME', os.path.join(base_dir, 'db.sqlite3')),
+            # WAL, busy timeout etc. are set by accounting.database.apply_sqlite_pragmas()
+            'CONN_MAX_AGE': int(environ.get('ELIBRARY_DB_CONN_MAX_AGE', SQLITE_CONN_MAX_AGE)),
+            # write transactions take the lock at BEGIN and wait for it by busy_timeout
+            'OPTIONS': {'transaction_mode': environ.get('ELIBRARY_SQLITE_TRANSACTION_MODE', 'IMMEDIATE')},
+        }
+    if engine == 'postgresql':
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': environ.get('ELIBRARY_DB_NAME', 'elibrary'),
+            'USER': environ.get('ELIBRARY_DB_USER', 'elibrary'),
+            'PASSWORD': environ.get('ELIBRARY_DB_PASSWORD', ''),
+            'HOST': environ.get('ELIBRARY_DB_HOST', 'localhost'),
+            'PORT': environ.get('ELIBRARY_DB_PORT', '5432'),
+            # connection is reused by the requests of one worker thread during this time
+            'CONN_MAX_AGE': int(environ.get('ELIBRARY_DB_CONN_MAX_AGE', POSTGRESQL_CONN_MAX_AGE)),
+            # named server side cursors of .iterator() don't survive transaction pooling
+            'DISABLE_SERVER_SIDE_CURSORS': env_flag(environ, 'ELIBRARY_DB_POOLER', False),
+            'OPTIONS': {'connect_timeout': 5},
+        }
+    raise ValueError('Unknown ELIBRARY_DB_ENGINE: ' + engine)
+
+
+def sqlite_pragmas(environ=os.environ):
+    """
+    PRAGMAs for every new SQLite connection. WAL lets readers work during the write transaction,
+    synchronous=NORMAL is safe with WAL (no fsync on every commit, only on checkpoint), busy_timeout makes
+    the concurrent writer wait for the lock instead of "database is locked" error.
+    """
+    return {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'busy_timeout': int(environ.get('ELIBRARY_SQLITE_BUSY_TIMEOUT', 20000)),    # ms
+        'cache_size': int(environ.get('ELIBRARY_SQLITE_CACHE_SIZE', -64000)),    # negative is KiB: 64 MB
+        'mmap_size': int(environ.get('ELIBRARY_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),    # bytes
+        'temp_store': 'memory',
+    }
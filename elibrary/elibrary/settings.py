@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 
 import os
 
+from .database import database_settings, env_flag, sqlite_pragmas
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -23,9 +25,9 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = '1g-6u%l(@p2f_es&6m#0gdtx4@hctvt5^)!z-*l@-e^zss(u3w'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = env_flag(os.environ, 'ELIBRARY_DEBUG', True)    # ELIBRARY_DEBUG=0 in production
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = os.environ.get('ELIBRARY_ALLOWED_HOSTS', '').split()    # required when DEBUG is off
 
 # Email registration configuration
 EMAIL_USE_TLS = True
@@ -47,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'accounting.middleware.RequestMetricsMiddleware',    # first, to measure all other middleware as well
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,12 +61,20 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'elibrary.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    # templates are compiled once per process instead of on every render, changes need a restart
+    TEMPLATE_LOADERS = [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'accounting.template_backend.TimedDjangoTemplates',    # DjangoTemplates + render time metric
         'DIRS': [os.path.join(BASE_DIR, 'templates')],    # add 'templates' dir in the prj root for checking
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,    # filesystem and app directories, cached when DEBUG is off
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -80,13 +91,32 @@ WSGI_APPLICATION = 'elibrary.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
+# profile (SQLite or PostgreSQL) is chosen by the environment variables, see elibrary/database.py
+
 DATABASES = {
+    'default': database_settings(BASE_DIR),
+}
+
+SQLITE_PRAGMAS = sqlite_pragmas()    # applied to every new SQLite connection, see accounting.database
+DATABASE_HEALTH_CHECKS = env_flag(os.environ, 'ELIBRARY_DB_HEALTH_CHECKS', True)    # for persistent connections
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# local-memory cache is per process, any other backend (memcached, database) can be set here
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'elibrary',
     }
 }
 
+CATALOG_CACHE_ALIAS = 'default'    # cache for rendered library unit details
+CATALOG_DETAIL_CACHE_TIMEOUT = 60 * 60 * 24
+PROFILE_CACHE_ALIAS = 'default'    # cache for user info and address of the profile pages
+PROFILE_CACHE_TIMEOUT = 60 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
@@ -132,6 +162,12 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Request metrics: warning is logged for the requests with more DB queries
+REQUEST_QUERY_BUDGET = 50
+
+# ASGI: threads running the views (and so DB connections) per server process, see accounting.asgi
+ASGI_THREADS = int(os.environ.get('ELIBRARY_ASGI_THREADS', 16))
+
 LOGIN_REDIRECT_URL = 'profile_details'
 LOGIN_URL = 'login'
 LOGOUT_URL = 'logout'